@@ -1,16 +1,48 @@
 import streamlit as st
 from database.connection import execute_query
-import bcrypt
+from auth.permissions import has_project_access, invalidate_permissions
+from auth.token_cache import get_verified_user, cache_verified_token, is_revoked, revoke_token
+from auth.password_hasher import (
+    hash_password, verify_password, needs_rehash, check_login_allowed,
+    check_registration_allowed, reset_login_attempts, PasswordHasherBusy, LoginThrottled
+)
 import jwt
 import datetime
 import os
+import logging
 
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt)
+logger = logging.getLogger(__name__)
 
-def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+# Number of reverse proxies in front of the app; X-Forwarded-For is only
+# trusted when this is set, since clients can send the header themselves
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+def get_client_ip():
+    """Best-effort client address of the current Streamlit session"""
+    try:
+        if TRUSTED_PROXY_HOPS > 0:
+            forwarded = st.context.headers.get('X-Forwarded-For')
+            if forwarded:
+                # Each trusted proxy appends one entry; anything to the left
+                # of the entry added by the outermost proxy is client-supplied
+                hops = [h.strip() for h in forwarded.split(',') if h.strip()]
+                if len(hops) >= TRUSTED_PROXY_HOPS:
+                    return hops[-TRUSTED_PROXY_HOPS]
+        return getattr(st.context, 'ip_address', None)
+    except Exception:
+        return None
+
+def rehash_if_needed(user_id, password, hashed):
+    """Upgrade a stored hash to the current cost factor after a successful login"""
+    if not needs_rehash(hashed):
+        return
+    try:
+        execute_query("""
+            UPDATE users SET password_hash = %s WHERE id = %s
+        """, (hash_password(password), user_id))
+        logger.info(f"Rehashed password for user {user_id}")
+    except Exception as e:
+        logger.error(f"Password rehash failed: {str(e)}")
 
 def create_jwt_token(user_id):
     expiration = datetime.datetime.utcnow() + datetime.timedelta(days=1)
@@ -22,23 +54,41 @@ def create_jwt_token(user_id):
 
 def verify_jwt_token(token):
     try:
+        if is_revoked(token):
+            return None
+        secret = os.environ.get('JWT_SECRET', 'your-secret-key')
+        # Skip re-decoding tokens already verified in this process
+        user_id = get_verified_user(token, secret)
+        if user_id is not None:
+            return user_id
         payload = jwt.decode(
             token,
-            os.environ.get('JWT_SECRET', 'your-secret-key'),
+            secret,
             algorithms=['HS256']
         )
+        cache_verified_token(token, secret, payload)
         return payload['user_id']
     except:
         return None
 
+def logout_user(token=None):
+    """Revoke the session token and clear authentication state"""
+    token = token or st.session_state.get('stored_token')
+    if token:
+        revoke_token(token)
+    st.session_state.stored_token = None
+    st.session_state.user_id = None
+
 def register_user(username, password, email):
     try:
+        # Registration hashes too; throttle it like logins so it cannot fill the queue
+        check_registration_allowed(get_client_ip())
         hashed_password = hash_password(password)
         result = execute_query("""
             INSERT INTO users (username, password_hash, email)
             VALUES (%s, %s, %s)
             RETURNING id
-        """, (username, hashed_password.decode('utf-8'), email))
+        """, (username, hashed_password, email))
         
         if result:
             # Assign default team_member role
@@ -47,25 +97,37 @@ def register_user(username, password, email):
                 INSERT INTO user_roles (user_id, role_id)
                 SELECT %s, id FROM roles WHERE name = 'team_member'
             """, (user_id,))
+            invalidate_permissions(user_id)
             return user_id
         return None
+    except (LoginThrottled, PasswordHasherBusy) as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Registration failed: {str(e)}")
         return None
 
 def login_user(username, password):
     try:
+        # Throttle before any bcrypt work so attempts cannot exhaust CPU
+        check_login_allowed(username, get_client_ip())
+        
         result = execute_query("""
             SELECT id, password_hash 
             FROM users 
             WHERE username = %s
-        """, (username,))
+        """, (username,), use_cache=False)
         
         if result and verify_password(password, result[0]['password_hash']):
             user_id = result[0]['id']
+            reset_login_attempts(username)
+            rehash_if_needed(user_id, password, result[0]['password_hash'])
             token = create_jwt_token(user_id)
             return token
         return None
+    except (LoginThrottled, PasswordHasherBusy) as e:
+        st.error(str(e))
+        return None
     except Exception as e:
         st.error(f"Login failed: {str(e)}")
         return None
@@ -85,28 +147,8 @@ def get_user_roles(user_id):
 
 def check_permission(user_id, project_id, required_role=None):
     try:
-        # Check if user is admin
-        admin_check = execute_query("""
-            SELECT 1 FROM user_roles ur
-            JOIN roles r ON ur.role_id = r.id
-            WHERE ur.user_id = %s AND r.name = 'admin'
-        """, (user_id,))
-        
-        if admin_check:
-            return True
-            
-        if required_role:
-            # Check specific role for project
-            return bool(execute_query("""
-                SELECT 1 FROM project_members
-                WHERE project_id = %s AND user_id = %s AND role = %s
-            """, (project_id, user_id, required_role)))
-        else:
-            # Check if user is a member of the project
-            return bool(execute_query("""
-                SELECT 1 FROM project_members
-                WHERE project_id = %s AND user_id = %s
-            """, (project_id, user_id)))
+        # Resolved from the cached permission set, not per-call queries
+        return has_project_access(user_id, project_id, required_role)
     except Exception as e:
         st.error(f"Permission check failed: {str(e)}")
         return False
@@ -0,0 +1,132 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+# bcrypt releases the GIL, so a thread pool keeps hashing off the script thread
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', min(4, os.cpu_count() or 1)))
+MAX_QUEUED_HASHES = int(os.environ.get('BCRYPT_MAX_QUEUE', BCRYPT_WORKERS * 8))
+HASH_TIMEOUT_SECONDS = 30
+
+# Login attempts allowed per sliding window, before any hashing happens
+LOGIN_WINDOW_SECONDS = int(os.environ.get('LOGIN_WINDOW_SECONDS', 300))
+MAX_ATTEMPTS_PER_ACCOUNT = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_ACCOUNT', 10))
+MAX_ATTEMPTS_PER_IP = int(os.environ.get('LOGIN_MAX_ATTEMPTS_PER_IP', 30))
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+class LoginThrottled(Exception):
+    """Raised when an account or client exceeded its login attempts"""
+
+_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+_stats_lock = threading.Lock()
+_stats = {
+    'queued': 0,
+    'running': 0,
+    'completed': 0,
+    'rejected': 0,
+}
+
+_attempts_lock = threading.Lock()
+_attempts = {}
+
+def get_hasher_stats():
+    """Return a snapshot of queue depth and throughput counters"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['workers'] = BCRYPT_WORKERS
+    stats['max_queue'] = MAX_QUEUED_HASHES
+    return stats
+
+def get_queue_depth():
+    """Number of hashing jobs waiting for a worker"""
+    with _stats_lock:
+        return _stats['queued']
+
+def _run(func, *args):
+    """Run a bcrypt call in the pool, rejecting work beyond the queue bound"""
+    with _stats_lock:
+        if _stats['queued'] >= MAX_QUEUED_HASHES:
+            _stats['rejected'] += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+        _stats['queued'] += 1
+
+    def job():
+        with _stats_lock:
+            _stats['queued'] -= 1
+            _stats['running'] += 1
+        try:
+            return func(*args)
+        finally:
+            with _stats_lock:
+                _stats['running'] -= 1
+                _stats['completed'] += 1
+
+    return _executor.submit(job).result(timeout=HASH_TIMEOUT_SECONDS)
+
+def hash_password(password, rounds=None):
+    """Hash a password with the configured cost factor; returns a str"""
+    salt = bcrypt.gensalt(rounds=rounds or BCRYPT_ROUNDS)
+    hashed = _run(bcrypt.hashpw, password.encode('utf-8'), salt)
+    return hashed.decode('utf-8')
+
+def verify_password(password, hashed):
+    """Check a password against a stored bcrypt hash"""
+    return _run(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+def needs_rehash(hashed):
+    """True when a stored hash was made with a different cost factor"""
+    try:
+        return int(hashed.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
+
+def _prune(window, now):
+    while window and window[0] <= now - LOGIN_WINDOW_SECONDS:
+        window.popleft()
+
+def _record_attempt(keys, message):
+    """Count one attempt against every (key, limit), raising LoginThrottled when any is over"""
+    now = time.time()
+    with _attempts_lock:
+        # Drop idle windows so the table does not grow without bound
+        if len(_attempts) > 10000:
+            for key in list(_attempts):
+                _prune(_attempts[key], now)
+                if not _attempts[key]:
+                    del _attempts[key]
+        for key, limit in keys:
+            window = _attempts.setdefault(key, deque())
+            _prune(window, now)
+            if len(window) >= limit:
+                logger.warning(f"Throttled {key}")
+                raise LoginThrottled(message)
+        for key, _ in keys:
+            _attempts[key].append(now)
+
+def check_login_allowed(username, client_ip=None):
+    """Record a login attempt, raising LoginThrottled when over the limit"""
+    keys = [(f"account:{username.lower()}", MAX_ATTEMPTS_PER_ACCOUNT)]
+    if client_ip:
+        keys.append((f"ip:{client_ip}", MAX_ATTEMPTS_PER_IP))
+    _record_attempt(keys, "Too many login attempts. Please try again later.")
+
+def check_registration_allowed(client_ip=None):
+    """Record a registration, which hashes like a login, against the client's attempts"""
+    if client_ip:
+        _record_attempt(
+            [(f"ip:{client_ip}", MAX_ATTEMPTS_PER_IP)],
+            "Too many registration attempts. Please try again later."
+        )
+
+def reset_login_attempts(username):
+    """Clear an account's attempt history after a successful login"""
+    with _attempts_lock:
+        _attempts.pop(f"account:{username.lower()}", None)
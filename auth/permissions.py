@@ -0,0 +1,114 @@
+from database.connection import execute_query
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How often the cache revalidates against the permission_version row, which
+# triggers bump in the same transaction as any user_roles / project_members change
+VERSION_CHECK_SECONDS = 5
+# Upper bound on entry age in case the version check is unavailable
+PERMISSION_TTL_SECONDS = 300
+MAX_CACHED_USERS = 10000
+
+_lock = threading.Lock()
+_cache = {}
+_version = {'value': None, 'checked_at': 0.0}
+
+def invalidate_permissions(user_id=None):
+    """Drop cached permissions for one user, or for everyone"""
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(user_id, None)
+
+def _revalidate():
+    """Clear the cache when roles or memberships changed in any process"""
+    now = time.time()
+    with _lock:
+        if now - _version['checked_at'] < VERSION_CHECK_SECONDS:
+            return
+        # Claimed under the lock; the query itself runs outside it
+        _version['checked_at'] = now
+    try:
+        result = execute_query(
+            "SELECT version FROM permission_version",
+            use_cache=False
+        )
+    except Exception as e:
+        logger.warning(f"Permission version check failed: {str(e)}")
+        return
+    if not result:
+        logger.warning("Permission version unavailable; relying on PERMISSION_TTL_SECONDS")
+        return
+    version = result[0]['version']
+    with _lock:
+        if version != _version['value']:
+            if _version['value'] is not None:
+                _cache.clear()
+            _version['value'] = version
+
+def load_permissions(user_id):
+    """Load global roles and project memberships for a user in one query"""
+    result = execute_query("""
+        SELECT
+            COALESCE((
+                SELECT array_agg(r.name)
+                FROM user_roles ur
+                JOIN roles r ON ur.role_id = r.id
+                WHERE ur.user_id = %s
+            ), '{}') as roles,
+            COALESCE((
+                SELECT json_object_agg(pm.project_id, pm.role)
+                FROM project_members pm
+                WHERE pm.user_id = %s
+            ), '{}'::json) as projects
+    """, (user_id, user_id), use_cache=False)
+
+    if not result:
+        return None
+
+    row = result[0]
+    return {
+        'roles': frozenset(row['roles'] or []),
+        # json_object_agg keys are strings; project ids are ints everywhere else
+        'projects': {int(pid): role for pid, role in (row['projects'] or {}).items()},
+    }
+
+def get_user_permissions(user_id):
+    """Return the cached permission set for a user, loading it on a miss"""
+    _revalidate()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry and time.time() - entry[0] < PERMISSION_TTL_SECONDS:
+            return entry[1]
+        loaded_at_version = _version['value']
+
+    permissions = load_permissions(user_id)
+    if permissions is None:
+        # Do not cache a failed load as "no access"
+        return {'roles': frozenset(), 'projects': {}}
+    with _lock:
+        if _version['value'] != loaded_at_version:
+            # Permissions changed while loading; this result may predate the change
+            return permissions
+        if len(_cache) >= MAX_CACHED_USERS:
+            _cache.clear()
+        _cache[user_id] = (time.time(), permissions)
+    return permissions
+
+def has_project_access(user_id, project_id, required_role=None):
+    """Admins pass; otherwise the user needs membership (with the given role)"""
+    permissions = get_user_permissions(user_id)
+    if 'admin' in permissions['roles']:
+        return True
+    role = permissions['projects'].get(int(project_id))
+    if required_role:
+        return role == required_role
+    return role is not None
+
+def is_project_admin(user_id, project_id):
+    """True for global admins and project_admin members"""
+    return has_project_access(user_id, project_id, 'project_admin')
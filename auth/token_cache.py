@@ -0,0 +1,76 @@
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_TOKENS = 1024
+# Tokens without an exp claim are re-verified at least this often
+NO_EXP_TTL_SECONDS = 300
+# Revocations of tokens without exp are remembered this long
+REVOCATION_TTL_SECONDS = 7 * 24 * 3600
+
+_lock = threading.Lock()
+_verified = OrderedDict()
+_revoked = {}
+
+def token_digest(token):
+    """Digest used to key tokens without keeping the raw token in memory"""
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    return hashlib.sha256(token).hexdigest()
+
+def _cache_key(token, secret):
+    # Include the secret so tokens verified under one key never satisfy another
+    return hashlib.sha256(secret.encode('utf-8') + b'.' + token_digest(token).encode('utf-8')).hexdigest()
+
+def _prune_revoked(now):
+    for digest in [d for d, expires in _revoked.items() if expires <= now]:
+        del _revoked[digest]
+
+def is_revoked(token):
+    """Check the in-process revocation list"""
+    now = time.time()
+    with _lock:
+        expires = _revoked.get(token_digest(token))
+        return expires is not None and expires > now
+
+def revoke_token(token, exp=None):
+    """Revoke a token immediately and drop it from the verified cache"""
+    now = time.time()
+    digest = token_digest(token)
+    with _lock:
+        _prune_revoked(now)
+        _revoked[digest] = exp or now + REVOCATION_TTL_SECONDS
+        for key in [k for k, v in _verified.items() if v[2] == digest]:
+            del _verified[key]
+    logger.info("Token revoked")
+
+def get_verified_user(token, secret):
+    """Return the cached user_id for a verified, unexpired, unrevoked token, or None"""
+    now = time.time()
+    key = _cache_key(token, secret)
+    with _lock:
+        entry = _verified.get(key)
+        if not entry:
+            return None
+        user_id, valid_until, digest = entry
+        if valid_until <= now or digest in _revoked:
+            del _verified[key]
+            return None
+        _verified.move_to_end(key)
+        return user_id
+
+def cache_verified_token(token, secret, payload):
+    """Remember a token whose signature and claims were just verified"""
+    now = time.time()
+    exp = payload.get('exp')
+    valid_until = float(exp) if exp else now + NO_EXP_TTL_SECONDS
+    key = _cache_key(token, secret)
+    with _lock:
+        _verified[key] = (payload['user_id'], valid_until, token_digest(token))
+        _verified.move_to_end(key)
+        while len(_verified) > MAX_CACHED_TOKENS:
+            _verified.popitem(last=False)
@@ -0,0 +1,252 @@
+from database.connection import execute_query
+from utils.file_handler import get_content_path
+from datetime import date, datetime, timedelta
+import argparse
+import hashlib
+import json
+import logging
+import os
+import random
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Every generated project and user name starts with this so runs can be dropped
+BENCH_PREFIX = 'bench'
+STATUSES = ["To Do", "In Progress", "Done", "Canceled"]
+PRIORITIES = ["Low", "Medium", "High"]
+WORDS = [
+    "api", "billing", "dashboard", "export", "login", "mobile", "onboarding",
+    "report", "search", "settings", "sync", "upload", "invoice", "audit",
+]
+FILE_TYPES = [("png", "image/png"), ("pdf", "application/pdf"), ("txt", "text/plain")]
+
+def _table_exists(name):
+    result = execute_query("SELECT to_regclass(%s) IS NOT NULL as present", (name,), use_cache=False)
+    return bool(result and result[0]['present'])
+
+def _phrase(rng, words=3):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+def _insert_projects(rng, seed, count, now):
+    names, descriptions, deadlines, created = [], [], [], []
+    for i in range(count):
+        names.append(f"{BENCH_PREFIX}-{seed}-{i} {_phrase(rng, 2)}")
+        descriptions.append(_phrase(rng, 8))
+        deadlines.append(now.date() + timedelta(days=rng.randint(7, 365)))
+        created.append(now - timedelta(days=rng.randint(0, 720), seconds=rng.randint(0, 86400)))
+    result = execute_query("""
+        INSERT INTO projects (name, description, deadline, created_at)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::date[], %s::timestamp[])
+        RETURNING id, name
+    """, (names, descriptions, deadlines, created), use_cache=False) or []
+    by_name = {row['name']: row['id'] for row in result}
+    return [by_name[name] for name in names]
+
+def _insert_tasks(rng, project_id, count, now):
+    titles, comments, statuses, priorities, due_dates, assignees, created = [], [], [], [], [], [], []
+    for i in range(count):
+        # The #{i} prefix keeps titles unique within the project so ids can be mapped back
+        titles.append(f"#{i} {_phrase(rng)}")
+        comments.append(_phrase(rng, 12))
+        statuses.append(rng.choice(STATUSES))
+        priorities.append(rng.choice(PRIORITIES))
+        due_dates.append(now.date() + timedelta(days=rng.randint(-60, 120)) if rng.random() < 0.8 else None)
+        assignees.append(f"user{rng.randint(1, 50)}" if rng.random() < 0.7 else None)
+        created.append(now - timedelta(days=rng.randint(0, 90), seconds=rng.randint(0, 86400)))
+    result = execute_query("""
+        INSERT INTO tasks (project_id, title, comment, status, priority, due_date, assignee, created_at)
+        SELECT %s, * FROM unnest(
+            %s::text[], %s::text[], %s::text[], %s::text[], %s::date[], %s::text[], %s::timestamp[]
+        )
+        RETURNING id, title
+    """, (project_id, titles, comments, statuses, priorities, due_dates, assignees, created), use_cache=False) or []
+    by_title = {row['title']: row['id'] for row in result}
+    return [by_title[title] for title in titles]
+
+def _insert_dependencies(rng, task_ids, max_dependencies):
+    """Each task depends only on tasks created before it, so the graph is a DAG"""
+    task_col, depends_col = [], []
+    for i, task_id in enumerate(task_ids):
+        for j in rng.sample(range(i), min(i, rng.randint(0, max_dependencies))):
+            task_col.append(task_id)
+            depends_col.append(task_ids[j])
+    if task_col:
+        execute_query("""
+            INSERT INTO task_dependencies (task_id, depends_on_id)
+            SELECT * FROM unnest(%s::int[], %s::int[])
+        """, (task_col, depends_col), use_cache=False)
+    return len(task_col)
+
+def _insert_subtasks(rng, task_ids, max_subtasks):
+    parents, titles, descriptions, completed = [], [], [], []
+    for task_id in task_ids:
+        for i in range(rng.randint(0, max_subtasks)):
+            parents.append(task_id)
+            titles.append(f"Step {i + 1}: {_phrase(rng)}")
+            descriptions.append(_phrase(rng, 6))
+            completed.append(rng.random() < 0.4)
+    if parents:
+        execute_query("""
+            INSERT INTO subtasks (parent_task_id, title, description, completed)
+            SELECT * FROM unnest(%s::int[], %s::text[], %s::text[], %s::boolean[])
+        """, (parents, titles, descriptions, completed), use_cache=False)
+    return len(parents)
+
+def _insert_attachments(rng, seed, task_ids, ratio):
+    """Attach small files to a share of tasks, reusing some content to exercise dedup"""
+    attached = [task_id for task_id in task_ids if rng.random() < ratio]
+    if not attached:
+        return 0
+    pool = max(1, len(attached) // 2)
+    blobs = {}
+    task_col, names, paths, types, sizes, hashes = [], [], [], [], [], []
+    for task_id in attached:
+        extension, file_type = rng.choice(FILE_TYPES)
+        content = f"{BENCH_PREFIX}-{seed}-{rng.randrange(pool)}-{extension}".encode('utf-8') * 16
+        content_hash = hashlib.sha256(content).hexdigest()
+        path = get_content_path(content_hash)
+        if content_hash not in blobs:
+            blobs[content_hash] = (path, len(content))
+            # Real files, so the reconciler does not treat the rows as orphans
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as f:
+                    f.write(content)
+        task_col.append(task_id)
+        names.append(f"{_phrase(rng, 2).replace(' ', '_')}.{extension}")
+        paths.append(path)
+        types.append(file_type)
+        sizes.append(len(content))
+        hashes.append(content_hash)
+
+    execute_query("""
+        INSERT INTO attachment_blobs (content_hash, file_path, file_size)
+        SELECT * FROM unnest(%s::text[], %s::text[], %s::bigint[])
+        ON CONFLICT (content_hash) DO NOTHING
+    """, (list(blobs), [b[0] for b in blobs.values()], [b[1] for b in blobs.values()]), use_cache=False)
+    execute_query("""
+        INSERT INTO file_attachments (task_id, filename, file_path, file_type, file_size, content_hash)
+        SELECT * FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::int[], %s::text[])
+    """, (task_col, names, paths, types, sizes, hashes), use_cache=False)
+    return len(task_col)
+
+def _insert_history(rng, task_ids, per_task, now):
+    """Write status/priority diffs spread over the past months straight into task_history"""
+    task_col, changes, changed_at = [], [], []
+    for task_id in task_ids:
+        status = rng.choice(STATUSES)
+        for _ in range(rng.randint(0, per_task * 2)):
+            new_status = rng.choice([s for s in STATUSES if s != status])
+            diff = {'status': [status, new_status]}
+            if rng.random() < 0.3:
+                diff['priority'] = rng.sample(PRIORITIES, 2)
+            task_col.append(task_id)
+            changes.append(json.dumps(diff))
+            changed_at.append(now - timedelta(days=rng.randint(0, 365), seconds=rng.randint(0, 86400)))
+            status = new_status
+    if not task_col:
+        return 0
+    execute_query(
+        "SELECT ensure_task_history_partitions(%s, 2) as created",
+        (min(changed_at).date(),),
+        use_cache=False,
+        commit=True
+    )
+    execute_query("""
+        INSERT INTO task_history (task_id, changes, changed_at)
+        SELECT * FROM unnest(%s::int[], %s::jsonb[], %s::timestamp[])
+    """, (task_col, changes, changed_at), use_cache=False)
+    return len(task_col)
+
+def _insert_users(rng, seed, count, project_ids):
+    """Create users and put some of them in projects, when the auth tables exist"""
+    if not count or not _table_exists('users'):
+        return 0
+    usernames = [f"{BENCH_PREFIX}_{seed}_{i}_{rng.choice(WORDS)}" for i in range(count)]
+    emails = [f"{name}@example.com" for name in usernames]
+    result = execute_query("""
+        INSERT INTO users (username, password_hash, email)
+        SELECT u, '!', e FROM unnest(%s::text[], %s::text[]) AS t(u, e)
+        ON CONFLICT DO NOTHING
+        RETURNING id
+    """, (usernames, emails), use_cache=False) or []
+    user_ids = [row['id'] for row in result]
+
+    if user_ids and project_ids and _table_exists('project_members'):
+        members, projects = [], []
+        for project_id in project_ids:
+            for user_id in rng.sample(user_ids, min(len(user_ids), rng.randint(1, 10))):
+                members.append(user_id)
+                projects.append(project_id)
+        execute_query("""
+            INSERT INTO project_members (project_id, user_id, role)
+            SELECT p, u, 'team_member' FROM unnest(%s::int[], %s::int[]) AS t(p, u)
+            ON CONFLICT DO NOTHING
+        """, (projects, members), use_cache=False)
+    return len(user_ids)
+
+def generate_dataset(projects=10, tasks_per_project=200, seed=42, max_dependencies=3,
+                     max_subtasks=4, attachment_ratio=0.3, history_per_task=5, users=1000):
+    """Create a reproducible dataset; the same seed always yields the same rows.
+
+    Returns a summary with the generated project ids and row counts.
+    """
+    rng = random.Random(seed)
+    # Timestamps are offsets from today's midnight, so a seed always yields
+    # the same layout relative to the day the dataset is generated
+    now = datetime.combine(date.today(), datetime.min.time())
+    summary = {'seed': seed, 'project_ids': [], 'tasks': 0, 'dependencies': 0,
+               'subtasks': 0, 'attachments': 0, 'history': 0, 'users': 0}
+
+    project_ids = _insert_projects(rng, seed, projects, now)
+    summary['project_ids'] = project_ids
+    for project_id in project_ids:
+        task_ids = _insert_tasks(rng, project_id, tasks_per_project, now)
+        summary['tasks'] += len(task_ids)
+        summary['dependencies'] += _insert_dependencies(rng, task_ids, max_dependencies)
+        summary['subtasks'] += _insert_subtasks(rng, task_ids, max_subtasks)
+        summary['attachments'] += _insert_attachments(rng, seed, task_ids, attachment_ratio)
+        summary['history'] += _insert_history(rng, task_ids, history_per_task, now)
+    summary['users'] = _insert_users(rng, seed, users, project_ids)
+
+    logger.info(f"Generated dataset: {json.dumps({k: v for k, v in summary.items() if k != 'project_ids'})}")
+    return summary
+
+def drop_dataset(seed=None):
+    """Delete generated projects (tasks cascade) and users; all seeds when seed is None"""
+    from utils.file_handler import collect_garbage
+
+    pattern = f"{BENCH_PREFIX}-{seed}-%" if seed is not None else f"{BENCH_PREFIX}-%"
+    execute_query("DELETE FROM projects WHERE name LIKE %s", (pattern,), use_cache=False)
+    if _table_exists('users'):
+        user_pattern = f"{BENCH_PREFIX}\\_{seed}\\_%" if seed is not None else f"{BENCH_PREFIX}\\_%"
+        execute_query("DELETE FROM users WHERE username LIKE %s", (user_pattern,), use_cache=False)
+    # Drop the blobs and files nothing references any more
+    collect_garbage()
+
+def get_dataset_project_ids(seed):
+    """Ids of the projects generated with a seed, in generation order"""
+    result = execute_query(
+        "SELECT id FROM projects WHERE name LIKE %s ORDER BY id",
+        (f"{BENCH_PREFIX}-{seed}-%",),
+        use_cache=False
+    ) or []
+    return [row['id'] for row in result]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a seeded benchmark dataset")
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=200, help="tasks per project")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--history', type=int, default=5, help="average history rows per task")
+    parser.add_argument('--drop', action='store_true', help="delete the dataset for --seed instead")
+    args = parser.parse_args()
+
+    if args.drop:
+        drop_dataset(args.seed)
+    else:
+        drop_dataset(args.seed)
+        generate_dataset(projects=args.projects, tasks_per_project=args.tasks, seed=args.seed,
+                         history_per_task=args.history, users=args.users)
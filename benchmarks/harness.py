@@ -0,0 +1,107 @@
+import streamlit as st
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+def clear_query_cache():
+    """Drop the session query cache so every timed call reaches the database"""
+    try:
+        st.session_state.pop('query_cache', None)
+    except Exception:
+        # No session state outside a Streamlit runtime
+        pass
+
+def expire_query_cache():
+    """Age every cached entry past its TTL, so versioned entries revalidate on the next call"""
+    try:
+        for entry in st.session_state.get('query_cache', {}).values():
+            entry['timestamp'] = 0
+    except Exception:
+        pass
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def count_rows(result):
+    """Rows returned by a target: lists count their items, (rows, cursor) tuples their rows"""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, (list, dict)):
+        return len(result)
+    return 1 if result else 0
+
+def time_call(name, func, iterations=50, warmup=3, setup=None):
+    """Time func(i) for each iteration i and summarize latency and throughput.
+
+    setup() runs untimed before every call; by default it clears the query
+    cache. Failed calls (exceptions or None results) are counted, not timed.
+    """
+    setup = setup or clear_query_cache
+    for i in range(warmup):
+        setup()
+        func(-1 - i)
+
+    samples, rows, errors = [], 0, 0
+    for i in range(iterations):
+        setup()
+        started = time.perf_counter()
+        try:
+            result = func(i)
+        except Exception as e:
+            logger.error(f"Benchmark {name} failed: {str(e)}")
+            errors += 1
+            continue
+        elapsed = time.perf_counter() - started
+        if result is None:
+            errors += 1
+            continue
+        samples.append(elapsed)
+        rows += count_rows(result)
+
+    total = sum(samples)
+    report = {
+        'name': name,
+        'iterations': iterations,
+        'errors': errors,
+        'p50_ms': None,
+        'p95_ms': None,
+        'p99_ms': None,
+        'mean_ms': None,
+        'rows': rows,
+        'rows_per_sec': round(rows / total, 1) if total else None,
+    }
+    if samples:
+        report.update({
+            'p50_ms': round(percentile(samples, 50) * 1000, 3),
+            'p95_ms': round(percentile(samples, 95) * 1000, 3),
+            'p99_ms': round(percentile(samples, 99) * 1000, 3),
+            'mean_ms': round(total / len(samples) * 1000, 3),
+        })
+    logger.info(f"{name}: p50={report['p50_ms']}ms p95={report['p95_ms']}ms "
+                f"p99={report['p99_ms']}ms rows/s={report['rows_per_sec']} errors={errors}")
+    return report
+
+def compare_results(baseline, current, threshold=0.2):
+    """Pair benchmarks by name; flag those whose p95 grew by more than threshold"""
+    before = {r['name']: r for r in baseline.get('results', [])}
+    changes = []
+    for result in current.get('results', []):
+        old = before.get(result['name'])
+        if not old or not old.get('p95_ms') or not result.get('p95_ms'):
+            continue
+        ratio = result['p95_ms'] / old['p95_ms']
+        changes.append({
+            'name': result['name'],
+            'p50_ms': (old['p50_ms'], result['p50_ms']),
+            'p95_ms': (old['p95_ms'], result['p95_ms']),
+            'ratio': round(ratio, 3),
+            'regressed': ratio > 1 + threshold,
+        })
+    return changes
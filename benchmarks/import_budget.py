@@ -0,0 +1,84 @@
+import ast
+import json
+import logging
+import os
+import subprocess
+import sys
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PACKAGES = ('auth', 'components', 'database', 'utils')
+
+def startup_modules(path=os.path.join(ROOT, 'main.py')):
+    """App modules main.py imports at module level, i.e. on every rerun"""
+    with open(path) as f:
+        tree = ast.parse(f.read())
+    names = []
+    # Only top-level statements; imports inside branches are loaded on demand
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            names.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            names.append(node.module)
+    return [n for n in dict.fromkeys(names) if n.split('.')[0] in APP_PACKAGES]
+
+# Modules main.py imports on every rerun before anything is rendered
+STARTUP_MODULES = startup_modules()
+# Heavy libraries only the analytics, timeline and task list views need
+FORBIDDEN_MODULES = ['plotly', 'pandas']
+# Extra import time allowed for the startup modules on top of streamlit itself
+IMPORT_BUDGET_SECONDS = float(os.environ.get('IMPORT_BUDGET_SECONDS', 1.5))
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+for name in {modules!r}:
+    __import__(name)
+elapsed = time.perf_counter() - started
+print(json.dumps({{'seconds': elapsed, 'modules': sorted(sys.modules)}}))
+"""
+
+def _measure(modules):
+    """Import modules in a fresh interpreter; returns (seconds, loaded module names)"""
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE.format(modules=modules)],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result['seconds'], set(result['modules'])
+
+def check_import_budget(budget_seconds=IMPORT_BUDGET_SECONDS):
+    """Check startup imports stay under budget and never load plotly or pandas.
+
+    Streamlit's own import cost and modules are measured first and
+    subtracted, so only what this app's modules add is checked.
+    """
+    base_seconds, base_modules = _measure(['streamlit'])
+    seconds, modules = _measure(['streamlit'] + STARTUP_MODULES)
+    added = modules - base_modules
+    app_seconds = seconds - base_seconds
+
+    heavy = sorted(
+        name for name in added
+        if name.split('.')[0] in FORBIDDEN_MODULES
+    )
+    report = {
+        'streamlit_seconds': round(base_seconds, 3),
+        'app_seconds': round(app_seconds, 3),
+        'budget_seconds': budget_seconds,
+        'modules_added': len(added),
+        'heavy_modules': heavy,
+        'passed': not heavy and app_seconds <= budget_seconds,
+    }
+    if heavy:
+        logger.error(f"Startup imports load heavy modules: {', '.join(heavy[:10])}")
+    if app_seconds > budget_seconds:
+        logger.error(f"Startup imports took {app_seconds:.3f}s, budget is {budget_seconds:.3f}s")
+    return report
+
+if __name__ == "__main__":
+    report = check_import_budget()
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['passed'] else 1)
@@ -0,0 +1,248 @@
+from database.connection import execute_query, register_query_listener
+from benchmarks.data_generator import generate_dataset, drop_dataset, get_dataset_project_ids, BENCH_PREFIX
+from benchmarks.harness import percentile
+from benchmarks.query_budget import QueryCounter
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+
+logging.basicConfig(level=logging.WARNING)
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_SCRIPT = os.path.join(ROOT_DIR, 'main.py')
+LOAD_SEED = 4300
+LOAD_TASK_TITLE = 'load test task'
+RUN_TIMEOUT_SECONDS = 120
+# How often the driver samples open connections from pg_stat_activity
+CONNECTION_SAMPLE_SECONDS = 0.5
+
+def _timed(at):
+    """Run the app script once; returns (seconds, ok)"""
+    started = time.perf_counter()
+    at.run()
+    return time.perf_counter() - started, not at.exception
+
+def _find(widgets, key):
+    return [w for w in widgets if w.key == key]
+
+def _open_app():
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(APP_SCRIPT, default_timeout=RUN_TIMEOUT_SECONDS)
+    return at, [('load', *_timed(at))]
+
+def _select_project(at, rng, seed, project_ids):
+    """Search for a generated project in the sidebar and click it"""
+    index = rng.randrange(len(project_ids))
+    samples = []
+    at.text_input(key="project_search").input(f"{BENCH_PREFIX}-{seed}-{index} ")
+    samples.append(('search_projects', *_timed(at)))
+    buttons = _find(at.button, f"project_search_{project_ids[index]}")
+    if not buttons:
+        return samples + [('select_project', 0.0, False)]
+    buttons[0].click()
+    samples.append(('select_project', *_timed(at)))
+    return samples
+
+def _switch_view(at, view):
+    # The view radio only renders on the run a project is clicked, so switch through session state
+    at.session_state['current_view'] = view
+    return [(f"view_{view.lower()}", *_timed(at))]
+
+def _change_status(at, rng):
+    selects = [w for w in at.selectbox if w.key and re.fullmatch(r"status_\d+", w.key)]
+    if not selects:
+        return []
+    select = rng.choice(selects)
+    options = [o for o in select.options if o != select.value]
+    if not options:
+        return []
+    select.set_value(rng.choice(options))
+    return [('change_status', *_timed(at))]
+
+def _create_task(at, user, iteration):
+    samples = []
+    add = [b for b in at.button if b.label == "➕ Add New Task"]
+    if not add:
+        return [('create_task', 0.0, False)]
+    add[0].click()
+    samples.append(('open_task_form', *_timed(at)))
+    titles = _find(at.text_input, "task_title")
+    submit = [b for b in at.button if b.label == "Create Task"]
+    if not titles or not submit:
+        return samples + [('create_task', 0.0, False)]
+    titles[0].input(f"{LOAD_TASK_TITLE} {user}-{iteration}")
+    submit[0].click()
+    samples.append(('create_task', *_timed(at)))
+    return samples
+
+def simulate_user(user, seed, project_ids, iterations, think_time):
+    """Click through the app like one user; returns [(action, seconds, ok)]"""
+    rng = random.Random(seed * 100000 + user)
+    samples = []
+
+    def think():
+        if think_time:
+            time.sleep(rng.uniform(0, think_time))
+
+    try:
+        at, opened = _open_app()
+        samples += opened
+        for iteration in range(iterations):
+            think()
+            samples += _select_project(at, rng, seed, project_ids)
+            think()
+            samples += _switch_view(at, 'Board')
+            think()
+            samples += _change_status(at, rng)
+            think()
+            samples += _create_task(at, user, iteration)
+            think()
+            samples += _switch_view(at, 'Analytics')
+    except Exception as e:
+        logger.error(f"Simulated user {user} failed: {str(e)}")
+        samples.append(('session', 0.0, False))
+    return samples
+
+def _run_worker(user, seed, project_ids, iterations, think_time, start_delay):
+    """Run one simulated user in this worker process.
+
+    AppTest sets and clears Streamlit's process-wide Runtime instance on
+    every run, so concurrent sessions cannot share a process.
+    """
+    counter = QueryCounter()
+    register_query_listener(counter)
+    # Spread session starts over the ramp-up period
+    time.sleep(start_delay)
+    samples = simulate_user(user, seed, project_ids, iterations, think_time)
+    return {
+        'samples': samples,
+        'connections': counter.connections,
+        'queries': len(counter.queries),
+        'cache_hits': counter.cache_hits,
+    }
+
+class ConnectionSampler(threading.Thread):
+    """Tracks the number of open connections to the database while the test runs"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(CONNECTION_SAMPLE_SECONDS):
+            result = execute_query(
+                "SELECT COUNT(*) as open FROM pg_stat_activity WHERE datname = current_database()",
+                use_cache=False
+            )
+            if result:
+                self.samples.append(result[0]['open'])
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+def _summarize(samples, elapsed):
+    by_action = {}
+    for action, seconds, ok in samples:
+        by_action.setdefault(action, []).append((seconds, ok))
+
+    actions = {}
+    for action, runs in sorted(by_action.items()):
+        durations = [seconds for seconds, ok in runs if ok]
+        actions[action] = {
+            'count': len(runs),
+            'errors': sum(1 for _, ok in runs if not ok),
+            'p50_ms': round(percentile(durations, 50) * 1000, 1) if durations else None,
+            'p95_ms': round(percentile(durations, 95) * 1000, 1) if durations else None,
+            'p99_ms': round(percentile(durations, 99) * 1000, 1) if durations else None,
+        }
+    ok_durations = [seconds for _, seconds, ok in samples if ok]
+    return {
+        'actions': actions,
+        'total_actions': len(samples),
+        'errors': sum(1 for _, _, ok in samples if not ok),
+        'throughput_per_sec': round(len(ok_durations) / elapsed, 2) if elapsed else None,
+        'p50_ms': round(percentile(ok_durations, 50) * 1000, 1) if ok_durations else None,
+        'p95_ms': round(percentile(ok_durations, 95) * 1000, 1) if ok_durations else None,
+        'p99_ms': round(percentile(ok_durations, 99) * 1000, 1) if ok_durations else None,
+    }
+
+def cleanup_load_tasks(project_ids):
+    """Delete the tasks simulated users created"""
+    execute_query(
+        "DELETE FROM tasks WHERE project_id = ANY(%s) AND title LIKE %s",
+        (list(project_ids), f"{LOAD_TASK_TITLE}%"),
+        use_cache=False
+    )
+
+def run_load_test(users=100, processes=None, iterations=3, think_time=1.0, ramp_seconds=10.0,
+                  seed=LOAD_SEED, projects=20, tasks_per_project=100):
+    """Simulate concurrent sessions against main.py and report throughput and latency.
+
+    Each user is one Streamlit AppTest session in its own worker process;
+    at most `processes` users (default: all of them) run at the same time.
+    """
+    project_ids = get_dataset_project_ids(seed)
+    if not project_ids:
+        drop_dataset(seed)
+        project_ids = generate_dataset(projects=projects, tasks_per_project=tasks_per_project, seed=seed)['project_ids']
+
+    processes = max(1, min(processes or users, users))
+
+    sampler = ConnectionSampler()
+    sampler.start()
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    # A fresh process per user, so no Streamlit state carries over between sessions
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, max_tasks_per_child=1) as pool:
+        futures = [
+            pool.submit(_run_worker, user, seed, project_ids, iterations, think_time,
+                        # Only the first wave ramps up; later users start as workers free up
+                        ramp_seconds * user / processes if user < processes else 0)
+            for user in range(users)
+        ]
+        workers = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+    sampler.stop()
+    cleanup_load_tasks(project_ids)
+
+    report = _summarize([s for worker in workers for s in worker['samples']], elapsed)
+    report.update({
+        'users': users,
+        'processes': processes,
+        'iterations': iterations,
+        'seconds': round(elapsed, 1),
+        'db_connections_opened': sum(worker['connections'] for worker in workers),
+        'db_queries': sum(worker['queries'] for worker in workers),
+        'cache_hits': sum(worker['cache_hits'] for worker in workers),
+        'db_connections_peak': max(sampler.samples) if sampler.samples else None,
+        'db_connections_mean': round(sum(sampler.samples) / len(sampler.samples), 1) if sampler.samples else None,
+    })
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent-session load test for main.py")
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--processes', type=int, help="concurrent sessions, one process each (default: --users)")
+    parser.add_argument('--iterations', type=int, default=3, help="scenario loops per user")
+    parser.add_argument('--think-time', type=float, default=1.0, help="max seconds between actions")
+    parser.add_argument('--ramp', type=float, default=10.0, help="seconds over which users start")
+    parser.add_argument('--seed', type=int, default=LOAD_SEED)
+    parser.add_argument('--output', help="write the report to this JSON file")
+    args = parser.parse_args()
+
+    report = run_load_test(users=args.users, processes=args.processes, iterations=args.iterations,
+                           think_time=args.think_time, ramp_seconds=args.ramp, seed=args.seed)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,162 @@
+from database.connection import register_query_listener, unregister_query_listener
+from benchmarks.data_generator import generate_dataset, drop_dataset, get_dataset_project_ids
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Statements and connections one cold render of each view may issue,
+# whatever the number of tasks in the project (versioned caches add one
+# data_version read each, except the board, whose query returns it)
+VIEW_BUDGETS = {
+    'board': {'queries': 5, 'connections': 5},
+    'task_list': {'queries': 3, 'connections': 3},
+    'analytics': {'queries': 3, 'connections': 3},
+    'sidebar': {'queries': 2, 'connections': 2},
+}
+LATENCY_BUDGET_SECONDS = float(os.environ.get('VIEW_LATENCY_BUDGET_SECONDS', 2.0))
+# Small and large projects; query counts must not grow with task count
+PROJECT_SIZES = {'small': 10, 'large': 300}
+BUDGET_SEED = 4200
+RENDER_TIMEOUT_SECONDS = 60
+
+# AppTest runs each of these as a standalone script, so they import what they use
+
+def _board_script():
+    import streamlit as st
+    from components.board_view import render_board
+    render_board(st.session_state.bench_project_id)
+
+def _task_list_script():
+    import streamlit as st
+    from components.task_list import render_task_list
+    render_task_list(st.session_state.bench_project_id)
+
+def _analytics_script():
+    import streamlit as st
+    from components.analytics import render_analytics
+    render_analytics(st.session_state.bench_project_id)
+
+def _sidebar_script():
+    from components.project_form import list_projects
+    list_projects()
+
+VIEW_SCRIPTS = {
+    'board': _board_script,
+    'task_list': _task_list_script,
+    'analytics': _analytics_script,
+    'sidebar': _sidebar_script,
+}
+
+class QueryCounter:
+    """Counts statements, connections and cache hits reported by the query listeners"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.queries = []
+            self.connections = 0
+            self.cache_hits = 0
+
+    def __call__(self, event, details):
+        with self._lock:
+            if event == 'query':
+                self.queries.append(details['query'])
+            elif event == 'connect':
+                self.connections += 1
+            elif event == 'cache_hit':
+                self.cache_hits += 1
+
+def _ensure_project(seed, tasks):
+    """One-project dataset with the given number of tasks; returns its id"""
+    project_ids = get_dataset_project_ids(seed)
+    if not project_ids:
+        drop_dataset(seed)
+        project_ids = generate_dataset(projects=1, tasks_per_project=tasks, seed=seed, users=50)['project_ids']
+    return project_ids[0]
+
+def _reset_caches():
+    """Start every render cold: no st.cache_data entries, no in-process templates"""
+    import streamlit as st
+    from components.board_templates import invalidate_template_cache
+    st.cache_data.clear()
+    invalidate_template_cache()
+
+def render_view(view, project_id, counter):
+    """Render a view once in a fresh AppTest session; returns the measurements"""
+    from streamlit.testing.v1 import AppTest
+
+    _reset_caches()
+    at = AppTest.from_function(VIEW_SCRIPTS[view], default_timeout=RENDER_TIMEOUT_SECONDS)
+    at.session_state['bench_project_id'] = project_id
+    counter.reset()
+    started = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - started
+    return {
+        'queries': len(counter.queries),
+        'connections': counter.connections,
+        'cache_hits': counter.cache_hits,
+        'seconds': round(elapsed, 3),
+        'exceptions': [str(e.value) for e in at.exception],
+        'statements': list(counter.queries),
+    }
+
+def check_query_budgets(seed=BUDGET_SEED, budgets=VIEW_BUDGETS, latency_budget=LATENCY_BUDGET_SECONDS):
+    """Render every view for a small and a large project and check its budget.
+
+    A view fails when it exceeds its statement or connection budget, when
+    its statement count differs between project sizes (an N+1), when it
+    takes longer than the latency budget, or when it raises.
+    """
+    projects = {
+        size: _ensure_project(seed + i, tasks)
+        for i, (size, tasks) in enumerate(PROJECT_SIZES.items())
+    }
+    counter = QueryCounter()
+    register_query_listener(counter)
+    report = {'passed': True, 'views': {}}
+    try:
+        for view, budget in budgets.items():
+            runs = {size: render_view(view, project_id, counter) for size, project_id in projects.items()}
+            failures = []
+            for size, run in runs.items():
+                if run['queries'] > budget['queries']:
+                    failures.append(f"{size}: {run['queries']} statements > {budget['queries']}")
+                if run['connections'] > budget['connections']:
+                    failures.append(f"{size}: {run['connections']} connections > {budget['connections']}")
+                if run['seconds'] > latency_budget:
+                    failures.append(f"{size}: {run['seconds']}s > {latency_budget}s")
+                if run['exceptions']:
+                    failures.append(f"{size}: raised {run['exceptions'][0]}")
+            counts = {run['queries'] for run in runs.values()}
+            if len(counts) > 1:
+                failures.append(f"statement count grows with task count: {sorted(counts)}")
+
+            report['views'][view] = {'budget': budget, 'runs': runs, 'failures': failures}
+            if failures:
+                report['passed'] = False
+                logger.error(f"View {view} over budget: {'; '.join(failures)}")
+            else:
+                logger.info(f"View {view} within budget")
+    finally:
+        unregister_query_listener(counter)
+    return report
+
+if __name__ == "__main__":
+    report = check_query_budgets()
+    verbose = '--verbose' in sys.argv
+    for view in report['views'].values():
+        for run in view['runs'].values():
+            if not verbose:
+                run.pop('statements')
+    print(json.dumps(report, indent=2, default=str))
+    sys.exit(0 if report['passed'] else 1)
@@ -0,0 +1,157 @@
+from database.connection import execute_query
+from benchmarks.data_generator import generate_dataset, drop_dataset, get_dataset_project_ids
+from benchmarks.harness import time_call, compare_results, expire_query_cache
+from datetime import datetime, timedelta
+import argparse
+import json
+import logging
+import os
+import random
+import subprocess
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def _project_task_ids(project_id):
+    result = execute_query(
+        "SELECT id FROM tasks WHERE project_id = %s ORDER BY id",
+        (project_id,),
+        use_cache=False
+    ) or []
+    return [row['id'] for row in result]
+
+def read_benchmarks(project_ids, rng):
+    """(name, func, setup) for the queries behind each view"""
+    from components.board_view import get_board_tasks
+    from components.project_form import search_projects
+    from components.analytics import get_project_metrics
+    from components.task_list import get_task_list
+    from components.team_management import search_available_users
+
+    def pick(i):
+        return project_ids[i % len(project_ids)]
+
+    return [
+        ('board_tasks', lambda i: get_board_tasks(pick(i)), None),
+        # Unchanged data: one version read instead of the board query
+        ('board_tasks_revalidate', lambda i: get_board_tasks(project_ids[0]), expire_query_cache),
+        ('list_projects', lambda i: search_projects(), None),
+        ('list_projects_search', lambda i: search_projects(term=rng.choice(['dash', 'api', 'sync'])), None),
+        ('project_metrics', lambda i: get_project_metrics(pick(i)), None),
+        ('task_list', lambda i: get_task_list(pick(i)), None),
+        ('search_available_users', lambda i: search_available_users(pick(i), 'bench'), None),
+    ]
+
+def write_benchmarks(project_ids, rng):
+    """(name, func, setup) for the statements behind the board's write actions"""
+    from components.board_view import update_task_assignee, delete_task
+
+    task_ids = _project_task_ids(project_ids[0])
+    created = []
+
+    def create_task(i):
+        # Same statement as the task form
+        result = execute_query('''
+            INSERT INTO tasks (project_id, title, comment, status, priority, due_date, assignee)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            RETURNING id, title;
+        ''', (project_ids[0], f"bench write {i}", "benchmark", "To Do", "Medium",
+              datetime.now().date() + timedelta(days=7), None))
+        if result:
+            created.append(result[0]['id'])
+        return result
+
+    def update_status(i):
+        return execute_query(
+            "UPDATE tasks SET status = %s WHERE id = %s RETURNING id",
+            (rng.choice(["To Do", "In Progress", "Done"]), rng.choice(task_ids))
+        )
+
+    def update_assignee(i):
+        task_id = rng.choice(task_ids)
+        return [task_id] if update_task_assignee(task_id, f"user{i}") else None
+
+    def remove_task(i):
+        # Deletes the tasks create_task made; warmup calls get none
+        if i < 0 or not created:
+            return []
+        task_id = created.pop()
+        return [task_id] if delete_task(task_id) else None
+
+    return [
+        ('create_task', create_task, None),
+        ('update_status', update_status, None),
+        ('update_assignee', update_assignee, None),
+        ('delete_task', remove_task, None),
+    ]
+
+def run_benchmarks(seed=42, projects=10, tasks_per_project=200, iterations=50, regenerate=False, include_writes=True):
+    """Run every benchmark against the seeded dataset and return the results document"""
+    project_ids = get_dataset_project_ids(seed)
+    if regenerate or not project_ids:
+        drop_dataset(seed)
+        project_ids = generate_dataset(projects=projects, tasks_per_project=tasks_per_project, seed=seed)['project_ids']
+
+    rng = random.Random(seed)
+    benchmarks = read_benchmarks(project_ids, rng)
+    if include_writes:
+        benchmarks += write_benchmarks(project_ids, rng)
+
+    results = [
+        time_call(name, func, iterations=iterations, setup=setup)
+        for name, func, setup in benchmarks
+    ]
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'dataset': {'seed': seed, 'projects': len(project_ids), 'tasks_per_project': tasks_per_project},
+        'iterations': iterations,
+        'results': results,
+    }
+
+def save_results(document, path=None):
+    """Write results as JSON; defaults to results/<timestamp>-<commit>.json"""
+    if not path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        path = os.path.join(RESULTS_DIR, f"{stamp}-{document.get('commit') or 'local'}.json")
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2)
+    logger.info(f"Benchmark results written to {path}")
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the app's hot queries")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--projects', type=int, default=10)
+    parser.add_argument('--tasks', type=int, default=200, help="tasks per project")
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--regenerate', action='store_true', help="recreate the dataset first")
+    parser.add_argument('--reads-only', action='store_true', help="skip the write benchmarks")
+    parser.add_argument('--output', help="results file path")
+    parser.add_argument('--compare', help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    document = run_benchmarks(seed=args.seed, projects=args.projects, tasks_per_project=args.tasks,
+                              iterations=args.iterations, regenerate=args.regenerate,
+                              include_writes=not args.reads_only)
+    save_results(document, args.output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for change in compare_results(baseline, document):
+            flag = "REGRESSED" if change['regressed'] else "ok"
+            print(f"{change['name']:<24} p95 {change['p95_ms'][0]:>9.3f} -> {change['p95_ms'][1]:>9.3f} ms "
+                  f"(x{change['ratio']}) {flag}")
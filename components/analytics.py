@@ -1,15 +1,11 @@
 import streamlit as st
-from database.connection import execute_query
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-from datetime import datetime, timedelta
+from database.connection import execute_query, cache_query, get_project_data_version
 import logging
-from functools import lru_cache
+from utils.profiling import profiled, profile_component
 
 logger = logging.getLogger(__name__)
 
-@st.cache_data(ttl=300)
+@cache_query(ttl_seconds=300, version=get_project_data_version)
 def get_project_metrics(project_id):
     """Get all project metrics in a single optimized query"""
     try:
@@ -63,15 +59,21 @@ def get_project_metrics(project_id):
             CROSS JOIN LATERAL (SELECT * FROM completion_trend) ct
             GROUP BY tm.total_tasks, tm.completed_tasks, tm.high_priority, 
                      tm.pending_high_priority, tm.status_distribution, tm.priority_distribution
-        """, (project_id, project_id, project_id))
+        """, (project_id, project_id, project_id), use_cache=False)
         
         return result[0] if result else None
     except Exception as e:
         logger.error(f"Error getting project metrics: {str(e)}")
         return None
 
+@profiled(attributes=lambda project_id, *args, **kwargs: {'project_id': project_id})
 def render_analytics(project_id):
     """Render analytics dashboard with optimized loading and caching"""
+    # Plotting libraries are heavy; load them only when analytics is shown
+    import plotly.express as px
+    import plotly.graph_objects as go
+    import pandas as pd
+    
     st.write("## Project Analytics")
     
     # Load metrics with caching
@@ -106,7 +108,7 @@ def render_analytics(project_id):
                             key='status_dist_toggle')
     
     if show_status:
-        with st.container():
+        with st.container(), profile_component('analytics.status_chart'):
             status_dist = pd.DataFrame([
                 {'status': k, 'count': v} 
                 for k, v in metrics['status_distribution'].items()
@@ -125,7 +127,7 @@ def render_analytics(project_id):
                               key='priority_dist_toggle')
     
     if show_priority:
-        with st.container():
+        with st.container(), profile_component('analytics.priority_chart'):
             priority_dist = pd.DataFrame([
                 {'priority': k, 'count': v} 
                 for k, v in metrics['priority_distribution'].items()
@@ -144,7 +146,7 @@ def render_analytics(project_id):
                            key='completion_trend_toggle')
     
     if show_trend and metrics['completion_trend']:
-        with st.container():
+        with st.container(), profile_component('analytics.completion_trend_chart'):
             df_trend = pd.DataFrame(metrics['completion_trend'])
             fig_trend = go.Figure()
             fig_trend.add_trace(go.Scatter(x=df_trend['date'], y=df_trend['total'], 
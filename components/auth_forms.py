@@ -1,16 +1,14 @@
 import streamlit as st
 from database.connection import execute_query
-import bcrypt
+from auth.password_hasher import (
+    hash_password, verify_password, check_login_allowed, check_registration_allowed,
+    reset_login_attempts, PasswordHasherBusy, LoginThrottled
+)
+from auth.auth_handler import get_client_ip, rehash_if_needed
+from auth.token_cache import get_verified_user, cache_verified_token, is_revoked
 import jwt
 import os
 
-def hash_password(password):
-    salt = bcrypt.gensalt()
-    return bcrypt.hashpw(password.encode('utf-8'), salt)
-
-def verify_password(password, hashed):
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
-
 def create_jwt_token(user_id):
     try:
         return jwt.encode(
@@ -24,7 +22,15 @@ def create_jwt_token(user_id):
 
 def verify_jwt_token(token):
     try:
-        payload = jwt.decode(token, os.environ['JWT_SECRET'], algorithms=['HS256'])
+        if is_revoked(token):
+            return None
+        secret = os.environ['JWT_SECRET']
+        # Skip re-decoding tokens already verified in this process
+        user_id = get_verified_user(token, secret)
+        if user_id is not None:
+            return user_id
+        payload = jwt.decode(token, secret, algorithms=['HS256'])
+        cache_verified_token(token, secret, payload)
         return payload['user_id']
     except:
         return None
@@ -60,6 +66,11 @@ def render_auth_forms():
             
             if submitted:
                 if username and password:
+                    try:
+                        check_login_allowed(username, get_client_ip())
+                    except LoginThrottled as e:
+                        st.error(str(e))
+                        st.stop()
                     result = execute_query("""
                         SELECT u.id, u.password_hash, array_agg(r.name) as roles
                         FROM users u
@@ -67,10 +78,18 @@ def render_auth_forms():
                         LEFT JOIN roles r ON ur.role_id = r.id
                         WHERE u.username = %s
                         GROUP BY u.id, u.password_hash
-                    """, (username,))
+                    """, (username,), use_cache=False)
                     
-                    if result and verify_password(password, result[0]['password_hash']):
+                    try:
+                        valid = bool(result) and verify_password(password, result[0]['password_hash'])
+                    except PasswordHasherBusy as e:
+                        st.error(str(e))
+                        st.stop()
+                    
+                    if valid:
                         user_id = result[0]['id']
+                        reset_login_attempts(username)
+                        rehash_if_needed(user_id, password, result[0]['password_hash'])
                         st.session_state.user_id = user_id
                         
                         # Store token if remember me is checked
@@ -100,6 +119,11 @@ def render_auth_forms():
                     if new_password != confirm_password:
                         st.error("Passwords do not match")
                     else:
+                        try:
+                            check_registration_allowed(get_client_ip())
+                        except LoginThrottled as e:
+                            st.error(str(e))
+                            st.stop()
                         try:
                             # Start transaction
                             conn = execute_query("BEGIN")
@@ -109,7 +133,7 @@ def render_auth_forms():
                                 INSERT INTO users (username, password_hash, email)
                                 VALUES (%s, %s, %s)
                                 RETURNING id
-                            """, (new_username, hashed_password.decode('utf-8'), new_email))
+                            """, (new_username, hashed_password, new_email))
                             
                             if result:
                                 user_id = result[0]['id']
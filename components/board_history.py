@@ -0,0 +1,163 @@
+import streamlit as st
+from database.connection import execute_query
+from database.schema import history_ready
+from datetime import datetime, date
+import logging
+import json
+from components.board_templates import get_project_columns
+
+logger = logging.getLogger(__name__)
+
+def get_board_as_of(project_id, as_of):
+    """Reconstruct a project's tasks as they were at `as_of`.
+
+    Starts from the latest checkpoint at or before as_of, adds the tasks
+    whose creation was recorded after it, and applies the newest diff per
+    task and column up to as_of; tasks whose deletion is among those diffs
+    are dropped. Tasks created before creation was recorded start from
+    their current row with diffs made after as_of rolled back. Live tasks
+    are never joined, so tasks deleted since still show. Everything is
+    resolved in one SQL statement.
+    """
+    try:
+        rows = execute_query("""
+            WITH cp AS (
+                SELECT id, taken_at
+                FROM task_checkpoints
+                WHERE project_id = %(project_id)s AND taken_at <= %(as_of)s
+                ORDER BY taken_at DESC
+                LIMIT 1
+            ),
+            since AS (
+                SELECT COALESCE((SELECT taken_at FROM cp), '-infinity'::timestamp) as taken_at
+            ),
+            created AS (
+                SELECT DISTINCT h.task_id
+                FROM task_history h, since
+                WHERE h.changes ? '_created'
+                AND (h.changes -> 'project_id' ->> 1)::int = %(project_id)s
+                AND h.changed_at > since.taken_at AND h.changed_at <= %(as_of)s
+            ),
+            candidates AS (
+                SELECT s.task_id, s.state, TRUE as from_history
+                FROM task_checkpoint_states s
+                JOIN cp ON s.checkpoint_id = cp.id
+                UNION ALL
+                SELECT c.task_id, '{}'::jsonb, TRUE
+                FROM created c
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM task_checkpoint_states s
+                    JOIN cp ON s.checkpoint_id = cp.id
+                    WHERE s.task_id = c.task_id
+                )
+                UNION ALL
+                SELECT t.id, to_jsonb(t), FALSE
+                FROM tasks t, since
+                WHERE t.project_id = %(project_id)s
+                AND t.created_at <= %(as_of)s
+                AND t.created_at > since.taken_at
+                AND NOT EXISTS (
+                    SELECT 1 FROM task_history h
+                    WHERE h.task_id = t.id AND h.changes ? '_created'
+                )
+            ),
+            applied AS (
+                SELECT DISTINCT ON (h.task_id, kv.key) h.task_id, kv.key, kv.value -> 1 as value
+                FROM task_history h
+                JOIN candidates c ON c.task_id = h.task_id
+                CROSS JOIN since
+                CROSS JOIN LATERAL jsonb_each(h.changes) kv
+                WHERE h.changed_at > since.taken_at AND h.changed_at <= %(as_of)s
+                ORDER BY h.task_id, kv.key, h.changed_at DESC, h.id DESC
+            ),
+            rolled_back AS (
+                SELECT DISTINCT ON (h.task_id, kv.key) h.task_id, kv.key, kv.value -> 0 as value
+                FROM task_history h
+                JOIN candidates c ON c.task_id = h.task_id AND NOT c.from_history
+                CROSS JOIN LATERAL jsonb_each(h.changes) kv
+                WHERE h.changed_at > %(as_of)s
+                ORDER BY h.task_id, kv.key, h.changed_at, h.id
+            ),
+            rolled_back_by_task AS (
+                SELECT task_id, jsonb_object_agg(key, value) as changes
+                FROM rolled_back
+                GROUP BY task_id
+            ),
+            applied_by_task AS (
+                SELECT task_id, jsonb_object_agg(key, value) as changes
+                FROM applied
+                GROUP BY task_id
+            ),
+            states AS (
+                SELECT c.task_id,
+                       c.state
+                       || COALESCE(r.changes, '{}'::jsonb)
+                       || COALESCE(a.changes, '{}'::jsonb)
+                       as state
+                FROM candidates c
+                LEFT JOIN rolled_back_by_task r ON r.task_id = c.task_id
+                LEFT JOIN applied_by_task a ON a.task_id = c.task_id
+            )
+            SELECT task_id, state
+            FROM states
+            WHERE (state ->> 'project_id')::int = %(project_id)s
+            AND NOT COALESCE((state ->> '_deleted')::boolean, FALSE)
+            ORDER BY state ->> 'created_at' DESC
+        """, {'project_id': project_id, 'as_of': as_of})
+
+        tasks = []
+        for row in rows or []:
+            state = row['state'] if isinstance(row['state'], dict) else json.loads(row['state'])
+            state['id'] = row['task_id']
+            if state.get('due_date'):
+                state['due_date'] = date.fromisoformat(state['due_date'][:10])
+            tasks.append(state)
+        return tasks
+    except Exception as e:
+        logger.error(f"Error reconstructing board for project {project_id}: {str(e)}")
+        return None
+
+def render_board_as_of(project_id, as_of):
+    """Render a read-only board as it was at `as_of`"""
+    st.write(f"## Board as of {as_of.strftime('%d/%m/%Y %H:%M')}")
+    st.caption("Read-only view reconstructed from task history, including tasks deleted since.")
+
+    tasks = get_board_as_of(project_id, as_of)
+    if tasks is None:
+        st.error("Failed to reconstruct the board. Please try again.")
+        return
+    if not tasks:
+        st.info("No tasks existed at that time.")
+        return
+
+    columns = get_project_columns(project_id)
+    for task in tasks:
+        if task.get('status') not in columns:
+            columns.append(task.get('status'))
+
+    cols = st.columns(len(columns))
+    for col, status in zip(cols, columns):
+        with col:
+            status_tasks = [t for t in tasks if t.get('status') == status]
+            st.write(f"### {status} ({len(status_tasks)})")
+            for task in status_tasks:
+                with st.container():
+                    st.markdown(f"**{task.get('title')}**")
+                    if task.get('comment'):
+                        st.write(task['comment'])
+                    due = task['due_date'].strftime('%d/%m/%Y') if task.get('due_date') else 'Not set'
+                    st.caption(f"Priority: {task.get('priority')} · Due: {due} · Assignee: {task.get('assignee') or '—'}")
+
+def render_history_controls():
+    """Render the 'view as of' toggle; returns the chosen datetime or None"""
+    # Hidden until the history migrations have been applied
+    if not history_ready():
+        return None
+    if not st.toggle("🕒 View board as of a past time", key="board_as_of_enabled"):
+        return None
+    col1, col2 = st.columns(2)
+    with col1:
+        as_of_date = st.date_input("Date", key="board_as_of_date")
+    with col2:
+        as_of_time = st.time_input("Time", key="board_as_of_time")
+    return datetime.combine(as_of_date, as_of_time)
@@ -2,6 +2,8 @@ import streamlit as st
 from database.connection import execute_query
 import logging
 import json
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -9,6 +11,64 @@ DEFAULT_TEMPLATES = {
     "Basic Kanban": ["To Do", "In Progress", "Done"]
 }
 
+# Columns for projects without a template
+DEFAULT_BOARD_COLUMNS = ["To Do", "In Progress", "Done", "Canceled"]
+
+# Templates change rarely; keep them in-process and reload periodically
+# so edits from other processes still show up
+TEMPLATE_CACHE_TTL_SECONDS = 300
+_template_cache = {'loaded_at': 0.0, 'by_name': {}, 'by_id': {}}
+_template_lock = threading.Lock()
+
+def invalidate_template_cache():
+    """Force the next template lookup to reload from the database"""
+    with _template_lock:
+        _template_cache['loaded_at'] = 0.0
+
+def _load_templates():
+    """Return (by_name, by_id) template dicts, reloading when stale"""
+    with _template_lock:
+        if time.time() - _template_cache['loaded_at'] < TEMPLATE_CACHE_TTL_SECONDS:
+            return _template_cache['by_name'], _template_cache['by_id']
+
+    templates = execute_query("SELECT id, name, columns FROM board_templates", use_cache=False)
+    if templates is None:
+        raise Exception("Failed to load board templates")
+
+    by_name, by_id = {}, {}
+    for template in templates:
+        try:
+            columns = json.loads(template['columns']) if isinstance(template['columns'], str) else template['columns']
+            by_name[template['name']] = columns
+            by_id[template['id']] = columns
+        except Exception as e:
+            logger.error(f"Error parsing template columns: {str(e)}")
+
+    with _template_lock:
+        _template_cache.update(loaded_at=time.time(), by_name=by_name, by_id=by_id)
+    return by_name, by_id
+
+def get_template_id(name):
+    """Look up a template id by name"""
+    result = execute_query("SELECT id FROM board_templates WHERE name = %s", (name,))
+    return result[0]['id'] if result else None
+
+def get_project_columns(project_id):
+    """Board columns for a project, from its template or the defaults"""
+    try:
+        result = execute_query(
+            "SELECT board_template_id FROM projects WHERE id = %s",
+            (project_id,)
+        )
+        template_id = result[0]['board_template_id'] if result else None
+        if template_id:
+            _, by_id = _load_templates()
+            if by_id.get(template_id):
+                return list(by_id[template_id])
+    except Exception as e:
+        logger.error(f"Error loading project columns: {str(e)}")
+    return list(DEFAULT_BOARD_COLUMNS)
+
 def save_board_template(name, columns):
     """Save a board template to the database"""
     try:
@@ -33,6 +93,7 @@ def save_board_template(name, columns):
             VALUES (%s, %s)
             RETURNING id
         """, (name, columns_json))
+        invalidate_template_cache()
         return (result[0]['id'], "Template saved successfully") if result else (None, "Failed to save template")
     except Exception as e:
         logger.error(f"Error saving template: {str(e)}")
@@ -41,16 +102,8 @@ def save_board_template(name, columns):
 def get_board_templates():
     """Get all saved board templates"""
     try:
-        templates = execute_query("SELECT id, name, columns FROM board_templates")
-        template_dict = {}
-        if templates:
-            for template in templates:
-                try:
-                    columns = json.loads(template['columns']) if isinstance(template['columns'], str) else template['columns']
-                    template_dict[template['name']] = columns
-                except Exception as e:
-                    logger.error(f"Error parsing template columns: {str(e)}")
-        return template_dict
+        by_name, _ = _load_templates()
+        return dict(by_name)
     except Exception as e:
         logger.error(f"Error fetching templates: {str(e)}")
         return {}
@@ -136,38 +189,36 @@ def delete_template(name):
             "DELETE FROM board_templates WHERE name = %s",
             (name,)
         )
-        return True
+        invalidate_template_cache()
+        return result is not None
     except Exception as e:
         logger.error(f"Error deleting template: {str(e)}")
         return False
 
-def apply_template_to_project(project_id, template_columns):
-    """Apply a template's columns to tasks in a project"""
+def apply_template_to_project(project_id, template_columns, template_id=None):
+    """Apply a template's columns to tasks in a project.
+
+    Statuses matching a column case-insensitively are renamed to it, any
+    other status moves to the first column, and the project records the
+    template - all in one statement.
+    """
     try:
-        # Start transaction
-        execute_query("BEGIN")
-        
-        # Get current task statuses
-        current_tasks = execute_query(
-            "SELECT id, status FROM tasks WHERE project_id = %s",
-            (project_id,)
-        )
-        
-        # Map old statuses to new ones
-        if current_tasks:
-            old_statuses = list(set(task['status'] for task in current_tasks))
-            # Map tasks to closest matching new status or first status
-            for status in old_statuses:
-                if status not in template_columns:
-                    execute_query("""
-                        UPDATE tasks 
-                        SET status = %s 
-                        WHERE project_id = %s AND status = %s
-                    """, (template_columns[0], project_id, status))
-        
-        execute_query("COMMIT")
-        return True
+        result = execute_query("""
+            WITH assigned AS (
+                UPDATE projects
+                SET board_template_id = COALESCE(%s, board_template_id)
+                WHERE id = %s
+            )
+            UPDATE tasks
+            SET status = COALESCE(
+                (SELECT c FROM unnest(%s::text[]) AS c WHERE lower(c) = lower(tasks.status) LIMIT 1),
+                %s
+            )
+            WHERE project_id = %s
+            AND (status IS NULL OR NOT (status = ANY(%s::text[])))
+        """, (template_id, project_id, list(template_columns), template_columns[0],
+              project_id, list(template_columns)))
+        return result is not None
     except Exception as e:
-        execute_query("ROLLBACK")
         logger.error(f"Error applying template: {str(e)}")
         return False
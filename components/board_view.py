@@ -1,7 +1,15 @@
 import streamlit as st
-from database.connection import execute_query
-from utils.file_handler import save_uploaded_file, get_task_attachments
+from database.connection import execute_query, cache_query, get_project_data_version
+from utils.file_handler import collect_garbage
+from utils.thumbnails import get_thumbnail
+from utils.attachment_server import get_download_url
 from components.task_form import create_task_form
+from components.board_history import render_history_controls, render_board_as_of
+from components.board_templates import (
+    get_board_templates, get_project_columns, get_template_id,
+    apply_template_to_project, DEFAULT_BOARD_COLUMNS
+)
+from utils.profiling import profiled, profile_component
 import logging
 import time
 
@@ -12,12 +20,6 @@ def delete_task(task_id):
     try:
         execute_query("BEGIN")
         
-        # Delete from task_history first
-        execute_query("""
-            DELETE FROM task_history 
-            WHERE task_id = %s
-        """, (task_id,))
-        
         # Delete task dependencies
         execute_query("""
             DELETE FROM task_dependencies 
@@ -39,6 +41,8 @@ def delete_task(task_id):
         
         if result:
             execute_query("COMMIT")
+            # Release attachment blobs no longer referenced by any task
+            collect_garbage()
             # Clear cache after successful deletion
             if 'query_cache' in st.session_state:
                 st.session_state.query_cache.clear()
@@ -114,7 +118,26 @@ def update_task_assignee(task_id, assignee):
         logger.error(f"Error updating task assignee: {str(e)}")
         return False
 
-def render_task_card(task, is_deleted=False):
+def render_template_picker(project_id):
+    """Let the user switch the project's board template"""
+    with st.expander("⚙️ Board template"):
+        templates = get_board_templates()
+        if not templates:
+            st.info("No board templates available.")
+            return
+        name = st.selectbox("Template", list(templates), key=f"board_template_{project_id}")
+        st.caption(" → ".join(templates[name]))
+        if st.button("Apply template", key=f"apply_template_{project_id}"):
+            if apply_template_to_project(project_id, templates[name], get_template_id(name)):
+                if 'query_cache' in st.session_state:
+                    st.session_state.query_cache.clear()
+                st.success(f"Applied template '{name}'")
+                st.rerun()
+            else:
+                st.error("Failed to apply template")
+
+@profiled(attributes=lambda task, *args, **kwargs: {'task_id': task['id'], 'status': task['status']})
+def render_task_card(task, is_deleted=False, columns=None):
     with st.container():
         col1, col2, col3 = st.columns([4, 1, 1])
         
@@ -147,10 +170,13 @@ def render_task_card(task, is_deleted=False):
             st.write(f"**Due Date:** {task['due_date'].strftime('%d/%m/%Y') if task['due_date'] else 'Not set'}")
         with col3:
             if not is_deleted:
+                status_options = list(columns or DEFAULT_BOARD_COLUMNS)
+                if task['status'] not in status_options:
+                    status_options.append(task['status'])
                 new_status = st.selectbox(
                     "Status",
-                    ["To Do", "In Progress", "Done", "Canceled"],
-                    index=["To Do", "In Progress", "Done", "Canceled"].index(task['status']),
+                    status_options,
+                    index=status_options.index(task['status']),
                     key=f"status_{task['id']}"
                 )
                 if new_status != task['status']:
@@ -223,10 +249,32 @@ def render_task_card(task, is_deleted=False):
                     st.session_state[f"edit_mode_{task['id']}"] = False
                     st.rerun()
 
+        # Attachments section, images shown as cached thumbnails
+        if task.get('attachments'):
+            st.write("**Attachments:**")
+            for attachment in task['attachments']:
+                download_url = get_download_url(attachment['id'])
+                # Never wait on generation during a rerun; until the thumbnail
+                # exists the attachment is shown as a plain link
+                thumbnail = get_thumbnail(attachment, 'card', wait=False)
+                if thumbnail:
+                    st.image(thumbnail, caption=attachment['filename'])
+                    # Expander bodies run even when collapsed, so the same applies here
+                    with st.expander("View larger"):
+                        detail = get_thumbnail(attachment, 'detail', wait=False)
+                        if detail:
+                            st.image(detail)
+                        else:
+                            st.caption("Larger preview is being generated.")
+                        st.markdown(f"[Open original]({download_url})")
+                else:
+                    st.markdown(f"- 📎 [{attachment['filename']}]({download_url})")
+
         # Dependencies section
         if not is_deleted:
             st.write("**Dependencies:**")
-            dependencies = get_task_dependencies(task['id'])
+            # Board tasks carry their dependencies and subtasks; query only for other callers
+            dependencies = task['dependencies'] if 'dependencies' in task else get_task_dependencies(task['id'])
             if dependencies:
                 for dep in dependencies:
                     st.markdown(f"- {dep['title']} ({dep['status']}) - {dep['priority']} priority")
@@ -235,7 +283,7 @@ def render_task_card(task, is_deleted=False):
 
             # Subtasks section
             st.write("**Subtasks:**")
-            subtasks = get_task_subtasks(task['id'])
+            subtasks = task['subtasks'] if 'subtasks' in task else get_task_subtasks(task['id'])
             if subtasks:
                 for subtask in subtasks:
                     col1, col2, col3 = st.columns([3, 1, 1])
@@ -263,11 +311,73 @@ def render_task_card(task, is_deleted=False):
             else:
                 st.write("*No subtasks*")
 
+def _board_data_version(tasks):
+    """Data version read by the board query itself; None for an empty board"""
+    return tasks[0]['data_version'] if tasks else None
+
+# Revalidated cheaply against the project's data version, so the TTL can be short
+@cache_query(ttl_seconds=30, version=get_project_data_version, result_version=_board_data_version)
+def get_board_tasks(project_id):
+    """Fetch a project's tasks with dependencies, subtasks, attachments and per-status counts"""
+    return execute_query("""
+        SELECT t.*, 
+            p.data_version,
+            COUNT(*) OVER (PARTITION BY t.status) as status_count,
+            (
+                SELECT json_agg(json_build_object(
+                    'id', dt.id,
+                    'title', dt.title,
+                    'status', dt.status,
+                    'priority', dt.priority
+                ) ORDER BY dt.created_at DESC)
+                FROM task_dependencies d
+                JOIN tasks dt ON d.depends_on_id = dt.id
+                WHERE d.task_id = t.id
+            ) as dependencies,
+            (
+                SELECT json_agg(json_build_object(
+                    'id', s.id,
+                    'title', s.title,
+                    'description', s.description,
+                    'status', s.status,
+                    'completed', s.completed
+                ) ORDER BY s.created_at)
+                FROM subtasks s
+                WHERE s.parent_task_id = t.id
+            ) as subtasks,
+            (
+                SELECT json_agg(json_build_object(
+                    'id', fa.id,
+                    'filename', fa.filename,
+                    'file_path', fa.file_path,
+                    'file_type', fa.file_type,
+                    'file_size', fa.file_size,
+                    'content_hash', fa.content_hash
+                ) ORDER BY fa.created_at DESC)
+                FROM file_attachments fa
+                WHERE fa.task_id = t.id
+            ) as attachments
+        FROM tasks t
+        JOIN projects p ON p.id = t.project_id
+        WHERE t.project_id = %s AND t.deleted_at IS NULL
+        ORDER BY t.created_at DESC
+    """, (project_id,), use_cache=False)
+
+@profiled(attributes=lambda project_id, *args, **kwargs: {'project_id': project_id})
 def render_board(project_id):
     """Render project board with tasks grouped by status"""
     try:
         st.write("## Project Board")
         
+        # Historical, read-only board reconstructed from task_history
+        as_of = render_history_controls()
+        if as_of:
+            render_board_as_of(project_id, as_of)
+            return
+        
+        columns = get_project_columns(project_id)
+        render_template_picker(project_id)
+        
         # Add new task button
         if st.button("➕ Add New Task"):
             st.session_state.show_task_form = True
@@ -288,40 +398,24 @@ def render_board(project_id):
                     st.rerun()
 
         # Fetch and display tasks
-        tasks = execute_query("""
-            SELECT t.*, 
-                array_agg(DISTINCT jsonb_build_object(
-                    'id', d.id,
-                    'title', dt.title,
-                    'status', dt.status
-                )) FILTER (WHERE d.id IS NOT NULL) as dependencies,
-                array_agg(DISTINCT jsonb_build_object(
-                    'id', s.id,
-                    'title', s.title,
-                    'description', s.description,
-                    'completed', s.completed
-                )) FILTER (WHERE s.id IS NOT NULL) as subtasks
-            FROM tasks t
-            LEFT JOIN task_dependencies d ON t.id = d.task_id
-            LEFT JOIN tasks dt ON d.depends_on_id = dt.id
-            LEFT JOIN subtasks s ON t.id = s.parent_task_id
-            WHERE t.project_id = %s AND t.deleted_at IS NULL
-            GROUP BY t.id
-            ORDER BY t.created_at DESC
-        """, (project_id,))
+        with profile_component('get_board_tasks'):
+            tasks = get_board_tasks(project_id)
 
         if tasks:
-            task_groups = {"To Do": [], "In Progress": [], "Done": [], "Canceled": []}
+            # Columns come from the project's template; unknown statuses get their own column
+            task_groups = {status: [] for status in columns}
             for task in tasks:
-                task_groups[task['status']].append(task)
+                task_groups.setdefault(task['status'], []).append(task)
+            board_columns = list(task_groups)
 
             cols = st.columns(len(task_groups))
             for i, (status, status_tasks) in enumerate(task_groups.items()):
                 with cols[i]:
-                    st.write(f"### {status}")
+                    count = status_tasks[0]['status_count'] if status_tasks else 0
+                    st.write(f"### {status} ({count})")
                     for task in status_tasks:
                         with st.container():
-                            render_task_card(task)
+                            render_task_card(task, columns=board_columns)
         else:
             st.info("No active tasks found. Create your first task to get started!")
 
@@ -1,5 +1,6 @@
 import streamlit as st
 from database.connection import execute_query
+from utils.profiling import profiled
 import logging
 import time
 from datetime import datetime
@@ -88,43 +89,199 @@ def create_project_form():
                 return False
     return False
 
-def list_projects():
-    """List all projects"""
+SIDEBAR_PAGE_SIZE = 20
+RECENT_PROJECTS_LIMIT = 5
+SIDEBAR_COLUMNS = "p.id, p.name, p.deadline, p.created_at, p.total_tasks, p.completed_tasks"
+
+def search_projects(term=None, after=None, limit=SIDEBAR_PAGE_SIZE):
+    """Search active projects by name with keyset pagination.
+
+    `after` is the (created_at, id) of the last project on the previous page.
+    Returns (projects, next_cursor); next_cursor is None on the last page.
+    """
     try:
-        projects = execute_query('''
-            SELECT p.*,
-                   COUNT(t.id) as total_tasks,
-                   COUNT(CASE WHEN t.status = 'Done' THEN 1 END) as completed_tasks
+        query = f"""
+            SELECT {SIDEBAR_COLUMNS}
             FROM projects p
-            LEFT JOIN tasks t ON p.id = t.project_id AND t.deleted_at IS NULL
             WHERE p.deleted_at IS NULL
-            GROUP BY p.id
-            ORDER BY p.created_at DESC
-        ''')
+        """
+        params = []
+        
+        if term:
+            escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            query += " AND p.name ILIKE %s"
+            params.append(f"%{escaped}%")
+        if after:
+            query += " AND (p.created_at, p.id) < (%s::timestamp, %s)"
+            params.extend(after)
+            
+        # Fetch one extra row to know whether another page exists
+        query += " ORDER BY p.created_at DESC, p.id DESC LIMIT %s"
+        params.append(limit + 1)
+        
+        projects = execute_query(query, params) or []
+        next_cursor = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            last = projects[-1]
+            next_cursor = (last['created_at'].isoformat(), last['id'])
+        return projects, next_cursor
+    except Exception as e:
+        logger.error(f"Error searching projects: {str(e)}")
+        return [], None
+
+def get_projects_by_ids(project_ids):
+    """Fetch active projects by id, preserving the given order"""
+    if not project_ids:
+        return []
+    try:
+        projects = execute_query(f"""
+            SELECT {SIDEBAR_COLUMNS}
+            FROM projects p
+            WHERE p.id = ANY(%s) AND p.deleted_at IS NULL
+        """, (list(project_ids),)) or []
+        by_id = {project['id']: project for project in projects}
+        return [by_id[pid] for pid in project_ids if pid in by_id]
+    except Exception as e:
+        logger.error(f"Error fetching projects: {str(e)}")
+        return []
+
+def load_pinned_projects(user_id):
+    """Project ids a user pinned, oldest pin first"""
+    try:
+        result = execute_query("""
+            SELECT project_id
+            FROM pinned_projects
+            WHERE user_id = %s
+            ORDER BY pinned_at, project_id
+        """, (user_id,), use_cache=False) or []
+        return [row['project_id'] for row in result]
+    except Exception as e:
+        logger.error(f"Error loading pinned projects: {str(e)}")
+        return []
+
+def set_project_pinned(user_id, project_id, pinned):
+    """Persist a pin or unpin for a user"""
+    try:
+        if pinned:
+            execute_query("""
+                INSERT INTO pinned_projects (user_id, project_id)
+                VALUES (%s, %s)
+                ON CONFLICT DO NOTHING
+            """, (user_id, project_id))
+        else:
+            execute_query("""
+                DELETE FROM pinned_projects
+                WHERE user_id = %s AND project_id = %s
+            """, (user_id, project_id))
+        return True
+    except Exception as e:
+        logger.error(f"Error saving pinned project: {str(e)}")
+        return False
+
+def toggle_pinned_project(project_id):
+    """Pin or unpin a project for this session, persisted for a logged-in user"""
+    pinned = project_id not in st.session_state.pinned_projects
+    if pinned:
+        st.session_state.pinned_projects.append(project_id)
+    else:
+        st.session_state.pinned_projects.remove(project_id)
+    if st.session_state.get('user_id'):
+        set_project_pinned(st.session_state.user_id, project_id, pinned)
+
+def remember_recent_project(project_id):
+    """Move a project to the front of the session's recent list"""
+    recent = [pid for pid in st.session_state.get('recent_projects', []) if pid != project_id]
+    st.session_state.recent_projects = [project_id] + recent[:RECENT_PROJECTS_LIMIT - 1]
+
+def render_project_button(project, section):
+    """Render one sidebar entry; returns the project id when clicked"""
+    project = convert_project_dates(dict(project))
+    selected = None
+    pinned = project['id'] in st.session_state.pinned_projects
+    
+    col1, col2, col3 = st.columns([7, 2, 1])
+    with col1:
+        if st.button(
+            f"{project['name']} ({project['completed_tasks']}/{project['total_tasks']} tasks)",
+            key=f"project_{section}_{project['id']}"
+        ):
+            selected = project['id']
+    with col2:
+        st.markdown(f"Due: {datetime.fromisoformat(project['deadline']).strftime('%d/%m/%Y') if project['deadline'] else 'No deadline'}")
+    with col3:
+        if st.button("📌" if not pinned else "✖", key=f"pin_{section}_{project['id']}",
+                     help="Unpin project" if pinned else "Pin project"):
+            toggle_pinned_project(project['id'])
+            st.rerun()
+    return selected
+
+@profiled()
+def list_projects():
+    """List pinned and recent projects plus a paginated project search"""
+    try:
+        # Pins are loaded once per session and again whenever the user changes
+        user_id = st.session_state.get('user_id')
+        if 'pinned_projects' not in st.session_state or st.session_state.get('pinned_projects_user') != user_id:
+            st.session_state.pinned_projects = load_pinned_projects(user_id) if user_id else []
+            st.session_state.pinned_projects_user = user_id
+        if 'recent_projects' not in st.session_state:
+            st.session_state.recent_projects = []
+        if 'project_page_cursors' not in st.session_state:
+            st.session_state.project_page_cursors = [None]
 
         selected_project = None
 
         st.title("Project Management")
 
+        # Pinned and recent projects in one lookup
+        shortcut_ids = list(dict.fromkeys(st.session_state.pinned_projects + st.session_state.recent_projects))
+        shortcuts = {p['id']: p for p in get_projects_by_ids(shortcut_ids)}
+
+        pinned = [shortcuts[pid] for pid in st.session_state.pinned_projects if pid in shortcuts]
+        if pinned:
+            st.markdown("### Pinned")
+            for project in pinned:
+                selected_project = render_project_button(project, 'pinned') or selected_project
+
+        recent = [shortcuts[pid] for pid in st.session_state.recent_projects
+                  if pid in shortcuts and pid not in st.session_state.pinned_projects]
+        if recent:
+            st.markdown("### Recent")
+            for project in recent:
+                selected_project = render_project_button(project, 'recent') or selected_project
+
         st.markdown("### Active Projects")
+        search_term = st.text_input("Search projects", key="project_search").strip()
+        if st.session_state.get('project_search_last') != search_term:
+            # A new search starts from the first page
+            st.session_state.project_search_last = search_term
+            st.session_state.project_page_cursors = [None]
+
+        cursors = st.session_state.project_page_cursors
+        projects, next_cursor = search_projects(search_term or None, cursors[-1])
+
         if projects:
             for project in projects:
-                project = convert_project_dates(project)
-                with st.container():
-                    col1, col2 = st.columns([8, 2])
-
-                    with col1:
-                        if st.button(
-                            f"{project['name']} ({project['completed_tasks']}/{project['total_tasks']} tasks)",
-                            key=f"project_{project['id']}"
-                        ):
-                            selected_project = project['id']
-
-                    with col2:
-                        st.markdown(f"Due: {datetime.fromisoformat(project['deadline']).strftime('%d/%m/%Y') if project['deadline'] else 'No deadline'}")
+                selected_project = render_project_button(project, 'search') or selected_project
+
+            col1, col2 = st.columns(2)
+            with col1:
+                if len(cursors) > 1 and st.button("← Previous", key="projects_prev_page"):
+                    cursors.pop()
+                    st.rerun()
+            with col2:
+                if next_cursor and st.button("Next →", key="projects_next_page"):
+                    cursors.append(next_cursor)
+                    st.rerun()
+        elif search_term:
+            st.info("No projects match your search.")
         else:
             st.info("Please select or create a project to get started!")
 
+        if selected_project:
+            remember_recent_project(selected_project)
+
         return selected_project
 
     except Exception as e:
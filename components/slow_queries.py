@@ -0,0 +1,69 @@
+import streamlit as st
+from database.connection import execute_query, SLOW_QUERY_THRESHOLD_MS
+import logging
+
+logger = logging.getLogger(__name__)
+
+def get_slow_query_summary(days=7, limit=50):
+    """Slow statements grouped by fingerprint, worst total time first"""
+    try:
+        return execute_query("""
+            SELECT
+                fingerprint,
+                MIN(statement) as statement,
+                COUNT(*) as occurrences,
+                percentile_cont(0.5) WITHIN GROUP (ORDER BY duration_ms) as p50_ms,
+                percentile_cont(0.95) WITHIN GROUP (ORDER BY duration_ms) as p95_ms,
+                MAX(duration_ms) as max_ms,
+                SUM(duration_ms) as total_ms,
+                MAX(captured_at) as last_seen,
+                COUNT(plan) as plans
+            FROM slow_queries
+            WHERE captured_at >= CURRENT_TIMESTAMP - make_interval(days => %s)
+            GROUP BY fingerprint
+            ORDER BY total_ms DESC
+            LIMIT %s
+        """, (days, limit), use_cache=False) or []
+    except Exception as e:
+        logger.error(f"Error loading slow query summary: {str(e)}")
+        return []
+
+def get_slow_query_samples(fingerprint, limit=10):
+    """Most recent captures of one statement, those with plans first"""
+    try:
+        return execute_query("""
+            SELECT id, params, duration_ms, row_count, plan, captured_at
+            FROM slow_queries
+            WHERE fingerprint = %s
+            ORDER BY plan IS NULL, captured_at DESC
+            LIMIT %s
+        """, (fingerprint, limit), use_cache=False) or []
+    except Exception as e:
+        logger.error(f"Error loading slow query samples: {str(e)}")
+        return []
+
+def render_slow_query_report():
+    """Developer report of captured slow statements and their plans"""
+    st.write("## Slow Queries")
+    st.caption(f"Statements slower than {SLOW_QUERY_THRESHOLD_MS:.0f} ms, grouped by fingerprint.")
+
+    days = st.selectbox("Period", [1, 7, 30], index=1, format_func=lambda d: f"Last {d} day{'s' if d > 1 else ''}")
+    summary = get_slow_query_summary(days)
+    if not summary:
+        st.info("No slow queries captured in this period.")
+        return
+
+    for row in summary:
+        title = (f"{row['occurrences']}× · p95 {row['p95_ms']:.0f} ms · max {row['max_ms']:.0f} ms · "
+                 f"{' '.join(row['statement'].split())[:90]}")
+        with st.expander(title):
+            st.code(row['statement'], language='sql')
+            st.write(f"**Fingerprint:** `{row['fingerprint']}` · **Total:** {row['total_ms'] / 1000:.1f} s · "
+                     f"**Last seen:** {row['last_seen'].strftime('%d/%m/%Y %H:%M')}")
+            for sample in get_slow_query_samples(row['fingerprint']):
+                st.write(f"**{sample['captured_at'].strftime('%d/%m/%Y %H:%M:%S')}** · "
+                         f"{sample['duration_ms']:.0f} ms · {sample['row_count'] if sample['row_count'] is not None else '?'} rows")
+                if sample['params'] is not None:
+                    st.caption(f"Parameters: {sample['params']}")
+                if sample['plan']:
+                    st.json(sample['plan'], expanded=False)
@@ -1,6 +1,7 @@
 import streamlit as st
 from database.connection import execute_query
 from utils.file_handler import save_uploaded_file
+from components.board_templates import get_project_columns
 import logging
 import time
 
@@ -46,7 +47,7 @@ def create_task_form(project_id):
             # Task metadata
             col1, col2, col3, col4 = st.columns(4)
             with col1:
-                status = st.selectbox("Status", ["To Do", "In Progress", "Done"])
+                status = st.selectbox("Status", get_project_columns(project_id))
             with col2:
                 priority = st.selectbox("Priority", ["Low", "Medium", "High"])
             with col3:
@@ -1,7 +1,7 @@
 import streamlit as st
-import pandas as pd
-from database.connection import execute_query
+from database.connection import execute_query, cache_query, get_project_data_version
 from datetime import datetime
+from utils.profiling import profiled
 import logging
 
 logger = logging.getLogger(__name__)
@@ -23,6 +23,7 @@ def format_priority(priority):
     """
 
 def format_date(date):
+    import pandas as pd
     if pd.isna(date):
         return ""
     if isinstance(date, str):
@@ -63,18 +64,26 @@ def update_task(task_id, field, value):
         logger.error(f"Error updating task {field}: {str(e)}")
         return False
 
-def render_task_list(project_id):
-    st.write("## Task List")
-    
-    # Get tasks from database
-    tasks = execute_query("""
+@cache_query(ttl_seconds=30, version=get_project_data_version)
+def get_task_list(project_id):
+    """Fetch a project's tasks for the list view"""
+    return execute_query("""
         SELECT 
             t.*,
             COALESCE(t.updated_at, t.created_at) as last_update 
         FROM tasks t
         WHERE t.project_id = %s AND t.deleted_at IS NULL
         ORDER BY t.end_date
-    """, (project_id,))
+    """, (project_id,), use_cache=False)
+
+@profiled(attributes=lambda project_id, *args, **kwargs: {'project_id': project_id})
+def render_task_list(project_id):
+    # Deferred so pandas is only loaded when the task list is shown
+    import pandas as pd
+    st.write("## Task List")
+    
+    # Get tasks from database
+    tasks = get_task_list(project_id)
     
     if tasks:
         df = pd.DataFrame(tasks)
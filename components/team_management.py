@@ -1,5 +1,6 @@
 import streamlit as st
 from database.connection import execute_query
+from auth.permissions import is_project_admin, invalidate_permissions
 import logging
 
 logger = logging.getLogger(__name__)
@@ -17,31 +18,50 @@ def get_project_members(project_id):
         GROUP BY u.id, u.username, u.email, pm.role
     """, (project_id,))
 
-def get_available_users(project_id):
-    """Get users not currently in the project"""
+USER_SEARCH_LIMIT = 20
+# Trigram indexes cannot serve patterns shorter than three characters
+MIN_SEARCH_LENGTH = 3
+
+def search_available_users(project_id, term, limit=USER_SEARCH_LIMIT):
+    """Search users not in the project by username or email (trigram-indexed)"""
+    term = (term or '').strip()
+    if len(term) < MIN_SEARCH_LENGTH:
+        return []
+    
+    # Escape LIKE wildcards so user input is matched literally
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    pattern = f"%{escaped}%"
     return execute_query("""
-        SELECT u.id, u.username, u.email,
-               array_agg(r.name) as roles
+        SELECT u.id, u.username, u.email
         FROM users u
-        LEFT JOIN user_roles ur ON u.id = ur.user_id
-        LEFT JOIN roles r ON ur.role_id = r.id
-        WHERE u.id NOT IN (
-            SELECT user_id FROM project_members WHERE project_id = %s
+        WHERE (u.username ILIKE %s OR u.email ILIKE %s)
+        AND NOT EXISTS (
+            SELECT 1 FROM project_members pm
+            WHERE pm.project_id = %s AND pm.user_id = u.id
         )
-        GROUP BY u.id, u.username, u.email
-    """, (project_id,))
+        ORDER BY u.username
+        LIMIT %s
+    """, (pattern, pattern, project_id, limit), use_cache=False) or []
+
+def add_project_members(project_id, user_ids, role):
+    """Add many users to a project in a single statement"""
+    if not user_ids:
+        return []
+    result = execute_query("""
+        INSERT INTO project_members (project_id, user_id, role)
+        SELECT %s, user_id, %s
+        FROM unnest(%s::int[]) AS user_id
+        ON CONFLICT (project_id, user_id) DO NOTHING
+        RETURNING user_id
+    """, (project_id, role, list(user_ids)))
+    added = [row['user_id'] for row in result or []]
+    for user_id in added:
+        invalidate_permissions(user_id)
+    return added
 
 def check_project_admin(user_id, project_id):
     """Check if user is project admin or has global admin role"""
-    result = execute_query("""
-        SELECT 1 FROM project_members
-        WHERE project_id = %s AND user_id = %s AND role = 'project_admin'
-        UNION
-        SELECT 1 FROM user_roles ur
-        JOIN roles r ON ur.role_id = r.id
-        WHERE ur.user_id = %s AND r.name = 'admin'
-    """, (project_id, user_id, user_id))
-    return bool(result)
+    return is_project_admin(user_id, project_id)
 
 def render_team_management(project_id):
     try:
@@ -76,6 +96,7 @@ def render_team_management(project_id):
                                 SET role = %s
                                 WHERE project_id = %s AND user_id = %s
                             """, (new_role, project_id, member['id']))
+                            invalidate_permissions(member['id'])
                             st.rerun()
                     with col3:
                         if member['id'] != st.session_state.user_id:  # Can't remove yourself
@@ -84,19 +105,25 @@ def render_team_management(project_id):
                                     DELETE FROM project_members
                                     WHERE project_id = %s AND user_id = %s
                                 """, (project_id, member['id']))
+                                invalidate_permissions(member['id'])
                                 st.rerun()
         else:
             st.info("No team members found.")
         
         # Add new team members
         st.write("### Add Team Members")
-        available_users = get_available_users(project_id)
+        search_term = st.text_input(
+            "Search users",
+            key=f"member_search_{project_id}",
+            placeholder=f"Type at least {MIN_SEARCH_LENGTH} characters of a username or email"
+        )
+        candidates = search_available_users(project_id, search_term)
         
-        if available_users:
+        if candidates:
             with st.form("add_member_form"):
-                selected_user = st.selectbox(
-                    "Select User",
-                    options=[(u['id'], f"{u['username']} ({u['email']})") for u in available_users],
+                selected_users = st.multiselect(
+                    "Select Users",
+                    options=[(u['id'], f"{u['username']} ({u['email']})") for u in candidates],
                     format_func=lambda x: x[1]
                 )
                 role = st.selectbox(
@@ -104,15 +131,18 @@ def render_team_management(project_id):
                     ["team_member", "project_admin"]
                 )
                 
-                if st.form_submit_button("Add Member"):
-                    execute_query("""
-                        INSERT INTO project_members (project_id, user_id, role)
-                        VALUES (%s, %s, %s)
-                    """, (project_id, selected_user[0], role))
-                    st.success(f"Added {selected_user[1]} as {role}")
+                if st.form_submit_button("Add Members"):
+                    added = add_project_members(project_id, [u[0] for u in selected_users], role)
+                    if added:
+                        st.success(f"Added {len(added)} member(s) as {role}")
+                        # Clear cache so the member list reflects the additions
+                        if 'query_cache' in st.session_state:
+                            st.session_state.query_cache.clear()
                     st.rerun()
-        else:
-            st.info("No available users to add.")
+            if len(candidates) >= USER_SEARCH_LIMIT:
+                st.caption(f"Showing the first {USER_SEARCH_LIMIT} matches. Refine your search to see others.")
+        elif len(search_term.strip()) >= MIN_SEARCH_LENGTH:
+            st.info("No matching users available to add.")
             
     except Exception as e:
         logger.error(f"Error in team management: {str(e)}")
@@ -1,9 +1,12 @@
 import streamlit as st
-import plotly.figure_factory as ff
 from database.connection import execute_query
 from datetime import datetime
+from utils.profiling import profiled
 
+@profiled(attributes=lambda project_id, *args, **kwargs: {'project_id': project_id})
 def render_timeline(project_id):
+    # Deferred so plotly is only loaded when the timeline is shown
+    import plotly.figure_factory as ff
     st.write("## Project Timeline")
     
     tasks = execute_query("""
@@ -7,12 +7,39 @@ import time
 from functools import wraps
 import hashlib
 import json
+import copy
+import re
+import queue
+import random
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import datetime, date
+from functools import lru_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Statements slower than this are recorded in slow_queries
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 500))
+# Share of captured SELECTs that also get an EXPLAIN (ANALYZE, BUFFERS) plan
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.2))
+# At most one plan per statement fingerprint in this window
+SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS = 300
+# EXPLAIN ANALYZE re-runs the statement; never let it run away
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 30000
+SLOW_QUERY_RETENTION_DAYS = int(os.environ.get('SLOW_QUERY_RETENTION_DAYS', 30))
+# How long past its TTL a cached result may be served while it is refreshed
+STALE_WHILE_REVALIDATE_SECONDS = int(os.environ.get('STALE_WHILE_REVALIDATE_SECONDS', 600))
+# Upper bound for interactive reads unless a view or call sets its own (0 disables)
+DEFAULT_STATEMENT_TIMEOUT_MS = int(os.environ.get('STATEMENT_TIMEOUT_MS', 30000))
+
+_statement_timeout = ContextVar('statement_timeout', default=None)
+_degraded_results = ContextVar('degraded_results', default=None)
+# Set in cache refresh threads, which have no Streamlit session
+_background_refresh = ContextVar('background_refresh', default=False)
+
 class DateTimeEncoder(json.JSONEncoder):
     """Custom JSON encoder for datetime objects"""
     def default(self, obj):
@@ -20,75 +47,392 @@ class DateTimeEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-def get_connection():
+_query_listeners = []
+
+def register_query_listener(listener):
+    """Call listener(event, details) on 'connect', 'close', 'query', 'cache_hit',
+    'cache_miss', 'cache_coalesced', 'cache_revalidated', 'cache_store', 'cache_stale',
+    'batch_start' and 'batch_end'"""
+    _query_listeners.append(listener)
+    return listener
+
+def unregister_query_listener(listener):
+    """Stop notifying a listener added with register_query_listener"""
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+def _notify(event, **details):
+    for listener in tuple(_query_listeners):
+        try:
+            listener(event, details)
+        except Exception as e:
+            logger.warning(f"Query listener failed: {str(e)}")
+
+@lru_cache(maxsize=4096)
+def fingerprint_query(query):
+    """Normalize a statement so calls differing only in literals group together.
+
+    Returns (fingerprint, normalized): a short stable hash and the statement
+    with whitespace collapsed and literals/placeholders replaced by '?'.
+    """
+    normalized = re.sub(r'--[^\n]*', ' ', query)
+    normalized = re.sub(r"'(?:[^']|'')*'", '?', normalized)
+    normalized = re.sub(r'%\(\w+\)s|%s', '?', normalized)
+    normalized = re.sub(r'\b\d+(?:\.\d+)?\b', '?', normalized)
+    normalized = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?)', normalized)
+    normalized = ' '.join(normalized.split())
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+def get_connection(statement_timeout_ms=None):
     try:
         conn = psycopg2.connect(
             host=os.environ['PGHOST'],
             database=os.environ['PGDATABASE'],
             user=os.environ['PGUSER'],
             password=os.environ['PGPASSWORD'],
-            port=os.environ['PGPORT']
+            port=os.environ['PGPORT'],
+            # Set at connect time so the timeout costs no extra round trip
+            options=f"-c statement_timeout={int(statement_timeout_ms)}" if statement_timeout_ms else None
         )
+        _notify('connect')
         return conn
     except Exception as e:
         logger.error(f"Database connection error: {str(e)}")
         return None
 
-def generate_etag(data):
-    """Generate ETag for data"""
-    if isinstance(data, (list, dict)):
-        data = json.dumps(data, sort_keys=True, cls=DateTimeEncoder)
-    return hashlib.md5(str(data).encode()).hexdigest()
+class _Flight:
+    """One running computation of a cache key that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
 
-def cache_query(ttl_seconds=300):
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+# Bumped after every committed write in this process, so reads issued after a
+# write never join a computation that started before it
+_write_generation = 0
+
+def _bump_write_generation():
+    global _write_generation
+    with _in_flight_lock:
+        _write_generation += 1
+
+def _single_flight(key, compute):
+    """Run compute() once per key at a time; concurrent callers share its result.
+    Every caller gets its own copy, so one session mutating its rows never
+    changes what another sees. Returns (result, True if this call ran the computation)"""
+    with _in_flight_lock:
+        key = f"{key}#{_write_generation}"
+        flight = _in_flight.get(key)
+        leader = flight is None
+        if leader:
+            flight = _in_flight[key] = _Flight()
+        else:
+            flight.waiters += 1
+    if not leader:
+        flight.done.wait()
+        if flight.result is not None:
+            return copy.deepcopy(flight.result), False
+        # The leader failed or timed out; its waiters still want the data,
+        # so run the query here instead
+        return compute(), True
+    result = None
+    try:
+        result = compute()
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+            waiters = flight.waiters
+        # Waiters copy from a snapshot the leader's session never holds
+        flight.result = copy.deepcopy(result) if waiters else None
+        flight.done.set()
+    return result, True
+
+def _store_cache_entry(cache, cache_key, result, timestamp, etag=None):
+    cache[cache_key] = {
+        'data': result,
+        'timestamp': timestamp,
+        'etag': etag
+    }
+    _notify('cache_store', key=cache_key, cache_id=id(cache), entries=len(cache))
+
+def _load(entry, flight_key, compute, current_version, result_version=None):
+    """Result for an expired or missing entry; returns (result, etag, changed).
+
+    current_version() reads the cheap change marker of versioned caches. When
+    it still matches the entry's ETag the cached data is returned unchanged.
+    With nothing cached and a result_version, the marker is taken from the
+    result instead, saving the separate read.
     """
-    Cache decorator for database queries with TTL and ETag support
+    if not entry and result_version:
+        result, ran = _single_flight(flight_key, compute)
+        if not ran:
+            _notify('cache_coalesced', key=flight_key)
+        return result, (result_version(result) if result is not None else None), True
+    etag = current_version() if current_version else None
+    if etag is not None and entry and entry.get('etag') == etag:
+        return entry['data'], etag, False
+    # Read before the data, so only computations that started from the same
+    # version are shared and a concurrent write can only make the entry look older
+    key = flight_key if etag is None else f"{flight_key}@{etag}"
+    result, ran = _single_flight(key, compute)
+    if not ran:
+        _notify('cache_coalesced', key=flight_key)
+    return result, etag, True
+
+_refresh_lock = threading.Lock()
+
+def _revalidate(entry, flight_key, compute, current_version):
+    """Refresh a stale entry off the rerun.
+
+    The worker only computes into a local value and hands it over on the
+    entry; the session's own thread swaps it into the cache on its next
+    lookup (see _apply_refresh), so the worker never touches session state.
+    """
+    def refresh():
+        _background_refresh.set(True)
+        started = time.time()
+        try:
+            result, etag, changed = _load(entry, flight_key, compute, current_version)
+        except Exception as e:
+            logger.error(f"Background refresh error for {flight_key}: {str(e)}")
+            result, etag, changed = None, None, True
+        with _refresh_lock:
+            entry['refreshed'] = (result, etag, changed, started)
+
+    entry['refreshing'] = True
+    threading.Thread(target=refresh, name="cache-revalidate", daemon=True).start()
+
+def _apply_refresh(cache, cache_key, entry):
+    """Swap a finished background refresh into the cache; returns the current entry.
+    A write clears the session cache, so refreshes of dropped entries are never put back"""
+    if not entry:
+        return entry
+    with _refresh_lock:
+        refreshed = entry.pop('refreshed', None)
+    if refreshed is None:
+        return entry
+    result, etag, changed, started = refreshed
+    if result is None:
+        entry['refreshing'] = False
+        return entry
+    if not changed:
+        entry = dict(entry, timestamp=started, refreshing=False)
+        cache[cache_key] = entry
+        _notify('cache_revalidated', key=cache_key)
+        return entry
+    _store_cache_entry(cache, cache_key, result, started, etag)
+    return cache[cache_key]
+
+def cache_query(ttl_seconds=300, stale_seconds=STALE_WHILE_REVALIDATE_SECONDS, version=None, result_version=None):
+    """
+    Cache decorator for database queries with TTL and ETag support.
+    For stale_seconds after the TTL an entry is still served while it is
+    refreshed in the background; only older entries make the caller wait.
+    version(*args, **kwargs) may return a cheap change marker for the data
+    (e.g. a project's data_version). It is kept as the entry's ETag, and an
+    expired entry whose marker is unchanged is renewed without re-running
+    the query. result_version(result) may return the same marker when the
+    query reads it in the same statement; a cold miss then skips version().
     """
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             # Create cache key from function name and arguments
             cache_key = f"{func.__name__}_{str(args)}_{str(kwargs)}"
+            # Sessions share in-flight computations of the same call
+            flight_key = f"{func.__module__}.{cache_key}"
+            compute = lambda: func(*args, **kwargs)
+            current_version = (lambda: version(*args, **kwargs)) if version else None
+            
+            # Nested cached calls made by a background refresh have no session to cache in
+            if _background_refresh.get():
+                return compute()
             
             # Initialize cache in session state if needed
             if 'query_cache' not in st.session_state:
                 st.session_state.query_cache = {}
+            cache = st.session_state.query_cache
                 
-            cache_entry = st.session_state.query_cache.get(cache_key)
+            cache_entry = _apply_refresh(cache, cache_key, cache.get(cache_key))
             current_time = time.time()
+            age = current_time - cache_entry['timestamp'] if cache_entry else None
             
             # Return cached result if valid
-            if cache_entry and (current_time - cache_entry['timestamp']) < ttl_seconds:
+            if cache_entry and age < ttl_seconds:
                 logger.info(f"Cache hit for query: {cache_key}")
+                _notify('cache_hit', key=cache_key, args=args)
+                return cache_entry['data']
+            
+            # Serve a recently expired result now and refresh it for the next rerun
+            if cache_entry and age < ttl_seconds + stale_seconds:
+                logger.info(f"Stale cache hit for query: {cache_key}")
+                _notify('cache_hit', key=cache_key, args=args, revalidating=True)
+                if not cache_entry.get('refreshing'):
+                    _revalidate(cache_entry, flight_key, compute, current_version)
                 return cache_entry['data']
             
-            # Execute query and cache result
-            result = func(*args, **kwargs)
+            # Execute query (unless its version is unchanged) and cache result
+            _notify('cache_miss', key=cache_key, args=args)
+            result, etag, changed = _load(cache_entry, flight_key, compute, current_version, result_version)
+            
+            if not changed:
+                logger.info(f"Cache revalidated for query: {cache_key}")
+                cache_entry['timestamp'] = current_time
+                _notify('cache_revalidated', key=cache_key)
+                return result
             
-            # Generate ETag for the result
-            etag = generate_etag(result)
+            if result is None:
+                # Failed or timed out: serve the last good result rather than nothing
+                if cache_entry:
+                    logger.warning(f"Serving stale result for query: {cache_key}")
+                    _notify('cache_stale', key=cache_key, args=args)
+                    degraded = _degraded_results.get()
+                    if degraded is not None:
+                        degraded.append(cache_key)
+                    return cache_entry['data']
+                return None
             
             # Cache the result with metadata
-            st.session_state.query_cache[cache_key] = {
-                'data': result,
-                'timestamp': current_time,
-                'etag': etag
-            }
+            _store_cache_entry(cache, cache_key, result, current_time, etag)
             
             logger.info(f"Cache miss for query: {cache_key}")
             return result
         return wrapper
     return decorator
 
-@cache_query(ttl_seconds=300)
-def execute_query(query, params=None, batch_size=1000):
+_slow_queries = queue.Queue(maxsize=1000)
+_slow_query_worker = None
+_slow_query_lock = threading.Lock()
+_last_explained = {}
+
+def _slow_query_params(query, params):
+    """JSON-safe parameters, withheld for statements touching credentials"""
+    if params is None or re.search(r'password|token|secret', query, re.IGNORECASE):
+        return None
+    return json.dumps(params, default=str)
+
+def _should_explain(query, fingerprint):
+    if not query.strip().upper().startswith(('SELECT', 'WITH')) or not is_read_query(query):
+        return False
+    if random.random() >= SLOW_QUERY_EXPLAIN_SAMPLE_RATE:
+        return False
+    now = time.time()
+    if now - _last_explained.get(fingerprint, 0) < SLOW_QUERY_EXPLAIN_INTERVAL_SECONDS:
+        return False
+    _last_explained[fingerprint] = now
+    return True
+
+def _record_slow_query(conn, query, params, duration, rows):
+    """Explain (when sampled) and store one slow statement on the worker's connection"""
+    fingerprint, normalized = fingerprint_query(query)
+    plan = None
+    if _should_explain(query, fingerprint):
+        try:
+            with conn.cursor() as cur:
+                # Read-only and rolled back, so EXPLAIN ANALYZE cannot change data
+                cur.execute("SET TRANSACTION READ ONLY")
+                cur.execute(f"SET LOCAL statement_timeout = {SLOW_QUERY_EXPLAIN_TIMEOUT_MS}")
+                cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}", params)
+                plan = json.dumps(cur.fetchone()[0])
+        except Exception as e:
+            logger.warning(f"Could not explain slow query {fingerprint}: {str(e)}")
+        finally:
+            conn.rollback()
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO slow_queries (fingerprint, statement, params, duration_ms, row_count, plan)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (fingerprint, normalized, _slow_query_params(query, params), duration * 1000, rows, plan))
+    conn.commit()
+
+def _prune_slow_queries(conn):
+    with conn.cursor() as cur:
+        cur.execute(
+            "DELETE FROM slow_queries WHERE captured_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+            (SLOW_QUERY_RETENTION_DAYS,)
+        )
+    conn.commit()
+
+def _slow_query_loop():
+    """Store captured statements on a dedicated connection, off the request path"""
+    conn = None
+    last_pruned = 0.0
+    while True:
+        query, params, duration, rows = _slow_queries.get()
+        try:
+            if conn is None or conn.closed:
+                conn = get_connection()
+                if conn is None:
+                    continue
+            _record_slow_query(conn, query, params, duration, rows)
+            if time.time() - last_pruned > 3600:
+                _prune_slow_queries(conn)
+                last_pruned = time.time()
+        except Exception as e:
+            logger.warning(f"Could not record slow query: {str(e)}")
+            if conn is not None:
+                conn.close()
+                conn = None
+
+def _capture_slow_query(query, params, duration, rows):
+    """Queue a statement over SLOW_QUERY_THRESHOLD_MS for the capture worker"""
+    global _slow_query_worker
+    if duration * 1000 < SLOW_QUERY_THRESHOLD_MS or 'slow_queries' in query:
+        return
+    if _slow_query_worker is None:
+        with _slow_query_lock:
+            if _slow_query_worker is None:
+                _slow_query_worker = threading.Thread(
+                    target=_slow_query_loop, name="slow-query-capture", daemon=True
+                )
+                _slow_query_worker.start()
+    try:
+        _slow_queries.put_nowait((query, params, duration, rows))
+    except queue.Full:
+        logger.warning("Slow query capture queue is full; dropping statement")
+
+@contextmanager
+def statement_timeout(timeout_ms):
+    """Bound the reads issued inside the block, e.g. for one view"""
+    token = _statement_timeout.set(timeout_ms)
+    try:
+        yield
+    finally:
+        _statement_timeout.reset(token)
+
+def begin_degraded_tracking():
+    """Start collecting reads answered from stale cache during this rerun"""
+    _degraded_results.set([])
+
+def get_degraded_results():
+    """Cache keys served stale during this rerun because their query failed"""
+    return list(_degraded_results.get() or [])
+
+def is_read_query(query):
+    """True for SELECT statements and WITH queries that modify no data"""
+    normalized = query.strip().upper()
+    if normalized.startswith('SELECT'):
+        return True
+    return normalized.startswith('WITH') and not re.search(r'\b(INSERT|UPDATE|DELETE)\b', normalized)
+
+def _execute_query(query, params=None, batch_size=1000, commit=False):
     """
-    Execute database query with caching and batch processing support
+    Execute database query with batch processing support.
+    commit=True runs a SELECT on the write path, for functions that change data.
     """
     conn = None
     cur = None
+    started = None
+    result_rows = None
+    read = is_read_query(query) and not commit
     try:
-        conn = get_connection()
+        # Reads are bounded by a statement timeout; writes always run to completion
+        timeout_ms = (_statement_timeout.get() or DEFAULT_STATEMENT_TIMEOUT_MS) if read else None
+        conn = get_connection(timeout_ms)
         if not conn:
             logger.error("Failed to establish database connection")
             return None
@@ -102,30 +446,37 @@ def execute_query(query, params=None, batch_size=1000):
         else:
             logger.info(f"Executing query: {query}")
             
+        started = time.perf_counter()
         cur.execute(query, params)
         
-        # For SELECT queries with batch processing
-        if query.strip().upper().startswith('SELECT'):
+        # For SELECT queries (including read-only WITH queries) with batch processing
+        if read:
             results = []
             while True:
                 batch = cur.fetchmany(batch_size)
                 if not batch:
                     break
                 results.extend(batch)
+            result_rows = len(results)
             logger.info(f"Query returned {len(results)} rows")
             return results
             
         # For INSERT/UPDATE/DELETE
         else:
             try:
-                if 'RETURNING' in query.upper():
+                # RETURNING clauses and data-changing functions return rows
+                if cur.description is not None:
                     result = cur.fetchall()
+                    result_rows = len(result)
                     if result:
                         conn.commit()
+                        _bump_write_generation()
                         logger.info(f"Query executed successfully, returned: {result}")
                         return result
                 else:
                     conn.commit()
+                    _bump_write_generation()
+                    result_rows = 0
                     logger.info("Query executed successfully")
                     return []
             except Exception as e:
@@ -133,6 +484,12 @@ def execute_query(query, params=None, batch_size=1000):
                 logger.error(f"Query failed: {str(e)}")
                 return None
                 
+    except psycopg2.extensions.QueryCanceledError as e:
+        if conn:
+            conn.rollback()
+        logger.warning(f"Query canceled by statement timeout: {str(e).strip()}")
+        return None
+        
     except Exception as e:
         if conn:
             conn.rollback()
@@ -144,7 +501,67 @@ def execute_query(query, params=None, batch_size=1000):
             cur.close()
         if conn:
             conn.close()
+            _notify('close')
             logger.info("Database connection closed")
+        if started is not None:
+            duration = time.perf_counter() - started
+            # rows stays None when the statement failed
+            _notify('query', query=query, params=params, duration=duration, rows=result_rows)
+            _capture_slow_query(query, params, duration, result_rows)
+
+_cached_execute_query = cache_query(ttl_seconds=300)(_execute_query)
+
+def execute_query(query, params=None, batch_size=1000, use_cache=True, statement_timeout=None, commit=False):
+    """
+    Execute database query, serving SELECT statements from the query cache.
+    Writes always hit the database so repeated INSERT/DELETE statements are
+    never answered with a stale cached result. Pass use_cache=False from
+    code running outside a Streamlit session (background jobs, scripts).
+    statement_timeout (ms) overrides the view/default timeout for a read.
+    commit=True commits a SELECT that calls a data-changing function.
+    """
+    token = _statement_timeout.set(statement_timeout) if statement_timeout else None
+    try:
+        if use_cache and not commit and is_read_query(query):
+            return _cached_execute_query(query, params, batch_size)
+        return _execute_query(query, params, batch_size, commit=commit)
+    finally:
+        if token:
+            _statement_timeout.reset(token)
+
+def get_project_data_version(project_id, *args, **kwargs):
+    """Change marker bumped by triggers on any write to a project's tasks,
+    subtasks, dependencies or attachments; None if it cannot be read"""
+    try:
+        result = execute_query(
+            "SELECT data_version FROM projects WHERE id = %s",
+            (project_id,),
+            use_cache=False
+        )
+        return result[0]['data_version'] if result else None
+    except Exception as e:
+        logger.warning(f"Project data version check failed: {str(e)}")
+        return None
+
+@contextmanager
+def transaction():
+    """Cursor on one connection, committed when the block exits normally.
+    For work that must stay uncommitted while non-database steps run."""
+    conn = get_connection()
+    if not conn:
+        raise RuntimeError("Database connection failed")
+    cur = conn.cursor(cursor_factory=RealDictCursor)
+    try:
+        yield cur
+        conn.commit()
+        _bump_write_generation()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        conn.close()
+        _notify('close')
 
 def batch_execute(queries):
     """
@@ -152,6 +569,8 @@ def batch_execute(queries):
     """
     conn = None
     cur = None
+    ok = False
+    _notify('batch_start', statements=len(queries))
     try:
         conn = get_connection()
         if not conn:
@@ -161,9 +580,15 @@ def batch_execute(queries):
         cur = conn.cursor(cursor_factory=RealDictCursor)
         
         for query, params in queries:
+            started = time.perf_counter()
             cur.execute(query, params)
+            duration = time.perf_counter() - started
+            _notify('query', query=query, params=params, duration=duration, rows=cur.rowcount)
+            _capture_slow_query(query, params, duration, cur.rowcount)
             
         conn.commit()
+        _bump_write_generation()
+        ok = True
         logger.info(f"Batch execution completed successfully: {len(queries)} queries")
         return True
         
@@ -178,3 +603,5 @@ def batch_execute(queries):
             cur.close()
         if conn:
             conn.close()
+            _notify('close')
+        _notify('batch_end', ok=ok)
@@ -0,0 +1,223 @@
+from database.connection import execute_query
+from datetime import date
+import logging
+import os
+import re
+import threading
+import time
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARTITION_PATTERN = re.compile(r'^task_history_y(\d{4})m(\d{2})$')
+MONTHS_AHEAD = 2
+# Partitions older than this are dropped entirely
+RETENTION_MONTHS = int(os.environ.get('TASK_HISTORY_RETENTION_MONTHS', 24))
+# Partitions older than this keep at most one merged diff per task per day
+COMPACT_AFTER_MONTHS = int(os.environ.get('TASK_HISTORY_COMPACT_AFTER_MONTHS', 3))
+# Minimum spacing between checkpoints of a project that keeps changing
+CHECKPOINT_INTERVAL = os.environ.get('TASK_CHECKPOINT_INTERVAL', '1 day')
+MAINTENANCE_INTERVAL_SECONDS = int(os.environ.get('TASK_HISTORY_MAINTENANCE_INTERVAL_SECONDS', 6 * 3600))
+
+_maintenance_thread = None
+_maintenance_lock = threading.Lock()
+
+def _months_ago(months, today=None):
+    """First day of the month `months` months before today's month"""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+def list_partitions():
+    """Return [(partition_name, month_start)] for monthly task_history partitions"""
+    result = execute_query("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = 'task_history'
+    """, use_cache=False) or []
+
+    partitions = []
+    for row in result:
+        match = PARTITION_PATTERN.match(row['relname'])
+        if match:
+            partitions.append((row['relname'], date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+def ensure_partitions(months_ahead=MONTHS_AHEAD):
+    """Create monthly partitions up to months_ahead months in the future"""
+    result = execute_query(
+        "SELECT ensure_task_history_partitions(CURRENT_DATE, %s) as created",
+        (months_ahead,),
+        use_cache=False,
+        commit=True
+    )
+    created = result[0]['created'] if result else 0
+    logger.info(f"Created {created} task_history partitions")
+    return created
+
+def apply_retention(retention_months=RETENTION_MONTHS):
+    """Drop partitions whose whole month is past the retention window"""
+    cutoff = _months_ago(retention_months)
+    dropped = []
+    for name, month_start in list_partitions():
+        if month_start < cutoff:
+            # Name comes from pg_class and matched PARTITION_PATTERN
+            execute_query(f'ALTER TABLE task_history DETACH PARTITION "{name}"')
+            execute_query(f'DROP TABLE IF EXISTS "{name}"')
+            dropped.append(name)
+    if dropped:
+        logger.info(f"Dropped task_history partitions: {dropped}")
+    return dropped
+
+def compact_partition(month_start):
+    """Merge each task's diffs of a day into one diff within a month.
+
+    The merged diff keeps the first old value and last new value of every
+    column, is stamped at the day's last change, and drops columns that
+    ended up unchanged.
+    """
+    month_end = _months_ago(-1, month_start)
+    result = execute_query("""
+        WITH busy_days AS (
+            SELECT task_id, date_trunc('day', changed_at) as day
+            FROM task_history
+            WHERE changed_at >= %s AND changed_at < %s
+            GROUP BY task_id, date_trunc('day', changed_at)
+            HAVING COUNT(*) > 1
+        ),
+        removed AS (
+            DELETE FROM task_history h
+            USING busy_days b
+            WHERE h.changed_at >= %s AND h.changed_at < %s
+            AND h.task_id = b.task_id
+            AND date_trunc('day', h.changed_at) = b.day
+            RETURNING h.id, h.task_id, h.changes, h.changed_at
+        ),
+        merged AS (
+            SELECT
+                r.task_id,
+                date_trunc('day', r.changed_at) as day,
+                kv.key,
+                (array_agg(kv.value -> 0 ORDER BY r.changed_at, r.id))[1] as old_value,
+                (array_agg(kv.value -> 1 ORDER BY r.changed_at DESC, r.id DESC))[1] as new_value
+            FROM removed r
+            CROSS JOIN LATERAL jsonb_each(r.changes) kv
+            GROUP BY r.task_id, date_trunc('day', r.changed_at), kv.key
+        ),
+        last_change AS (
+            SELECT task_id, date_trunc('day', changed_at) as day, MAX(changed_at) as changed_at
+            FROM removed
+            GROUP BY task_id, date_trunc('day', changed_at)
+        ),
+        inserted AS (
+            INSERT INTO task_history (task_id, changes, changed_at)
+            SELECT m.task_id,
+                   jsonb_object_agg(m.key, jsonb_build_array(m.old_value, m.new_value)),
+                   l.changed_at
+            FROM merged m
+            JOIN last_change l ON l.task_id = m.task_id AND l.day = m.day
+            WHERE m.old_value IS DISTINCT FROM m.new_value
+            GROUP BY m.task_id, m.day, l.changed_at
+            RETURNING id
+        )
+        SELECT (SELECT COUNT(*) FROM removed) as removed,
+               (SELECT COUNT(*) FROM inserted) as inserted
+    """, (month_start, month_end, month_start, month_end), use_cache=False)
+    return result[0] if result else None
+
+def compact_old_partitions(compact_after_months=COMPACT_AFTER_MONTHS):
+    """Compact every partition older than the compaction threshold"""
+    cutoff = _months_ago(compact_after_months)
+    for name, month_start in list_partitions():
+        if month_start < cutoff:
+            stats = compact_partition(month_start)
+            if stats and stats['removed']:
+                logger.info(f"Compacted {name}: {stats['removed']} rows into {stats['inserted']}")
+
+def take_checkpoint(project_id):
+    """Snapshot every task of a project; returns the checkpoint id"""
+    result = execute_query("""
+        WITH checkpoint AS (
+            INSERT INTO task_checkpoints (project_id)
+            VALUES (%s)
+            RETURNING id
+        )
+        INSERT INTO task_checkpoint_states (checkpoint_id, task_id, state)
+        SELECT checkpoint.id, t.id, to_jsonb(t)
+        FROM checkpoint
+        JOIN tasks t ON t.project_id = %s
+        RETURNING checkpoint_id
+    """, (project_id, project_id), use_cache=False)
+    return result[0]['checkpoint_id'] if result else None
+
+def take_checkpoints(interval=CHECKPOINT_INTERVAL):
+    """Checkpoint projects with history recorded since their last checkpoint"""
+    projects = execute_query("""
+        SELECT p.id
+        FROM projects p
+        LEFT JOIN LATERAL (
+            SELECT MAX(c.taken_at) as taken_at
+            FROM task_checkpoints c
+            WHERE c.project_id = p.id
+        ) last ON TRUE
+        WHERE p.deleted_at IS NULL
+        AND COALESCE(last.taken_at, '-infinity'::timestamp) < CURRENT_TIMESTAMP - %s::interval
+        AND EXISTS (
+            SELECT 1
+            FROM task_history h
+            JOIN tasks t ON t.id = h.task_id
+            WHERE t.project_id = p.id
+            AND h.changed_at > COALESCE(last.taken_at, '-infinity'::timestamp)
+        )
+    """, (interval,), use_cache=False) or []
+
+    taken = [p['id'] for p in projects if take_checkpoint(p['id'])]
+    if taken:
+        logger.info(f"Took task checkpoints for projects: {taken}")
+    return taken
+
+def apply_checkpoint_retention(retention_months=RETENTION_MONTHS):
+    """Drop checkpoints older than the history retention window"""
+    execute_query(
+        "DELETE FROM task_checkpoints WHERE taken_at < %s",
+        (_months_ago(retention_months),)
+    )
+
+def maintain_task_history():
+    """Partitions, retention, compaction and checkpoints in one pass"""
+    try:
+        ensure_partitions()
+        apply_retention()
+        apply_checkpoint_retention()
+        compact_old_partitions()
+        take_checkpoints()
+        return True
+    except Exception as e:
+        logger.error(f"Task history maintenance failed: {str(e)}")
+        return False
+
+def _run_forever(interval_seconds):
+    while True:
+        maintain_task_history()
+        time.sleep(interval_seconds)
+
+def start_history_maintenance(interval_seconds=MAINTENANCE_INTERVAL_SECONDS):
+    """Start the background task history maintenance thread once per process"""
+    global _maintenance_thread
+    with _maintenance_lock:
+        if _maintenance_thread and _maintenance_thread.is_alive():
+            return _maintenance_thread
+        _maintenance_thread = threading.Thread(
+            target=_run_forever,
+            args=(interval_seconds,),
+            name="task-history-maintenance",
+            daemon=True
+        )
+        _maintenance_thread.start()
+        logger.info(f"Task history maintenance started (every {interval_seconds}s)")
+        return _maintenance_thread
+
+if __name__ == "__main__":
+    maintain_task_history()
@@ -0,0 +1,39 @@
+-- Create attachment_blobs table holding one file per distinct SHA-256 content hash
+CREATE TABLE IF NOT EXISTS attachment_blobs (
+    content_hash CHAR(64) PRIMARY KEY,
+    file_path VARCHAR(255) NOT NULL,
+    file_size BIGINT,
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Link attachments to their blob
+ALTER TABLE file_attachments
+    ADD COLUMN IF NOT EXISTS content_hash CHAR(64) REFERENCES attachment_blobs(content_hash);
+
+CREATE INDEX IF NOT EXISTS idx_file_attachments_content_hash ON file_attachments(content_hash);
+CREATE INDEX IF NOT EXISTS idx_attachment_blobs_unreferenced ON attachment_blobs(content_hash) WHERE ref_count <= 0;
+
+-- Keep ref_count in sync with file_attachments, including cascaded task deletes
+CREATE OR REPLACE FUNCTION update_attachment_ref_count()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' AND NEW.content_hash IS NOT NULL THEN
+        UPDATE attachment_blobs
+        SET ref_count = ref_count + 1
+        WHERE content_hash = NEW.content_hash;
+    ELSIF TG_OP = 'DELETE' AND OLD.content_hash IS NOT NULL THEN
+        UPDATE attachment_blobs
+        SET ref_count = ref_count - 1
+        WHERE content_hash = OLD.content_hash;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS attachment_ref_count_trigger ON file_attachments;
+
+CREATE TRIGGER attachment_ref_count_trigger
+    AFTER INSERT OR DELETE ON file_attachments
+    FOR EACH ROW
+    EXECUTE FUNCTION update_attachment_ref_count();
@@ -0,0 +1,2 @@
+-- Serve task attachment listings from a single index scan
+CREATE INDEX IF NOT EXISTS idx_file_attachments_task_created ON file_attachments(task_id, created_at DESC);
@@ -0,0 +1,28 @@
+-- Global version bumped whenever roles or memberships change, so cached
+-- permission sets can be revalidated with a single sequence read
+CREATE SEQUENCE IF NOT EXISTS permission_version_seq;
+
+CREATE OR REPLACE FUNCTION bump_permission_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM nextval('permission_version_seq');
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS user_roles_permission_version ON user_roles;
+
+CREATE TRIGGER user_roles_permission_version
+    AFTER INSERT OR UPDATE OR DELETE ON user_roles
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_permission_version();
+
+DROP TRIGGER IF EXISTS project_members_permission_version ON project_members;
+
+CREATE TRIGGER project_members_permission_version
+    AFTER INSERT OR UPDATE OR DELETE ON project_members
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_permission_version();
+
+-- Support loading all memberships of a user in one index scan
+CREATE INDEX IF NOT EXISTS idx_project_members_user ON project_members(user_id);
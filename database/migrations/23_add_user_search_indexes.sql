@@ -0,0 +1,8 @@
+-- Trigram indexes for member typeahead search on username and email
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_users_username_trgm ON users USING gin (username gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_users_email_trgm ON users USING gin (email gin_trgm_ops);
+
+-- The project_members unique index lives in migration 34, so it does not
+-- depend on pg_trgm being available
@@ -0,0 +1,56 @@
+-- Denormalized task counters shown in the project sidebar
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS total_tasks INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS completed_tasks INTEGER NOT NULL DEFAULT 0;
+
+-- Create trigger function maintaining the counters from tasks changes
+CREATE OR REPLACE FUNCTION update_project_task_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE projects
+        SET total_tasks = total_tasks - 1,
+            completed_tasks = completed_tasks - (OLD.status IS NOT DISTINCT FROM 'Done')::int
+        WHERE id = OLD.project_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE projects
+        SET total_tasks = total_tasks + 1,
+            completed_tasks = completed_tasks + (NEW.status IS NOT DISTINCT FROM 'Done')::int
+        WHERE id = NEW.project_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS project_task_counters_trigger ON tasks;
+
+CREATE TRIGGER project_task_counters_trigger
+    AFTER INSERT OR DELETE ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION update_project_task_counters();
+
+DROP TRIGGER IF EXISTS project_task_counters_update_trigger ON tasks;
+
+-- Only status or project moves affect the counters
+CREATE TRIGGER project_task_counters_update_trigger
+    AFTER UPDATE OF project_id, status ON tasks
+    FOR EACH ROW
+    WHEN (OLD.project_id IS DISTINCT FROM NEW.project_id OR OLD.status IS DISTINCT FROM NEW.status)
+    EXECUTE FUNCTION update_project_task_counters();
+
+-- Backfill counters for existing projects
+UPDATE projects p
+SET total_tasks = COALESCE(c.total_tasks, 0),
+    completed_tasks = COALESCE(c.completed_tasks, 0)
+FROM projects p2
+LEFT JOIN (
+    SELECT project_id,
+           COUNT(*) as total_tasks,
+           COUNT(*) FILTER (WHERE status = 'Done') as completed_tasks
+    FROM tasks
+    GROUP BY project_id
+) c ON c.project_id = p2.id
+WHERE p.id = p2.id;
+
+-- Sidebar scan of active projects in creation order
+CREATE INDEX IF NOT EXISTS idx_projects_active_created ON projects(created_at DESC) WHERE deleted_at IS NULL;
@@ -0,0 +1,9 @@
+-- Keyset pagination over active projects, newest first
+CREATE INDEX IF NOT EXISTS idx_projects_active_created_id ON projects(created_at DESC, id DESC) WHERE deleted_at IS NULL;
+
+-- Trigram index for sidebar name search
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+CREATE INDEX IF NOT EXISTS idx_projects_name_trgm ON projects USING gin (name gin_trgm_ops) WHERE deleted_at IS NULL;
+
+-- Superseded by the (created_at, id) index above
+DROP INDEX IF EXISTS idx_projects_active_created;
@@ -0,0 +1,120 @@
+-- Create function creating monthly task_history partitions from a start month
+-- up to months_ahead months in the future
+CREATE OR REPLACE FUNCTION ensure_task_history_partitions(start_date DATE, months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', start_date)::date;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        partition_name := format('task_history_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF task_history FOR VALUES FROM (%L) TO (%L)',
+                partition_name, month_start, (month_start + INTERVAL '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month_start := (month_start + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
+
+-- Convert task_history into a table of compact diffs partitioned by month
+DO $$
+DECLARE
+    first_change DATE;
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1
+        FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = 'task_history'
+    ) THEN
+        ALTER TABLE task_history RENAME TO task_history_legacy;
+
+        -- changes maps each changed column to [old value, new value]
+        CREATE TABLE task_history (
+            id BIGSERIAL,
+            task_id INTEGER NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            changes JSONB NOT NULL,
+            changed_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (id, changed_at)
+        ) PARTITION BY RANGE (changed_at);
+
+        CREATE TABLE task_history_default PARTITION OF task_history DEFAULT;
+
+        SELECT date_trunc('month', MIN(changed_at))::date INTO first_change FROM task_history_legacy;
+        PERFORM ensure_task_history_partitions(COALESCE(first_change, CURRENT_DATE), 2);
+
+        -- Legacy rows hold the full row before each update; the state after
+        -- it is the next legacy row, or the current task for the last one
+        INSERT INTO task_history (task_id, changes, changed_at)
+        SELECT o.task_id, d.changes, o.changed_at
+        FROM (
+            SELECT
+                h.task_id,
+                h.changed_at,
+                jsonb_build_object(
+                    'title', h.title, 'comment', h.comment, 'status', h.status,
+                    'priority', h.priority, 'due_date', h.due_date, 'assignee', h.assignee
+                ) as old_state,
+                COALESCE(
+                    LEAD(jsonb_build_object(
+                        'title', h.title, 'comment', h.comment, 'status', h.status,
+                        'priority', h.priority, 'due_date', h.due_date, 'assignee', h.assignee
+                    )) OVER (PARTITION BY h.task_id ORDER BY h.changed_at, h.id),
+                    (SELECT jsonb_build_object(
+                        'title', t.title, 'comment', t.comment, 'status', t.status,
+                        'priority', t.priority, 'due_date', t.due_date, 'assignee', t.assignee
+                    ) FROM tasks t WHERE t.id = h.task_id)
+                ) as new_state
+            FROM task_history_legacy h
+            WHERE h.task_id IS NOT NULL
+        ) o
+        CROSS JOIN LATERAL (
+            SELECT jsonb_object_agg(n.key, jsonb_build_array(ov.value, n.value)) as changes
+            FROM jsonb_each(o.new_state) n
+            JOIN jsonb_each(o.old_state) ov USING (key)
+            WHERE n.value IS DISTINCT FROM ov.value
+        ) d
+        WHERE d.changes IS NOT NULL;
+
+        DROP TABLE task_history_legacy;
+    END IF;
+END $$;
+
+CREATE INDEX IF NOT EXISTS idx_task_history_task_changed ON task_history(task_id, changed_at);
+
+-- Record only the columns an UPDATE actually changed, one INSERT per statement
+CREATE OR REPLACE FUNCTION save_task_history()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO task_history (task_id, changes, changed_at)
+    SELECT n.id, d.changes, CURRENT_TIMESTAMP
+    FROM new_rows n
+    JOIN old_rows o ON o.id = n.id
+    CROSS JOIN LATERAL (
+        SELECT jsonb_object_agg(nv.key, jsonb_build_array(ov.value, nv.value)) as changes
+        FROM jsonb_each(to_jsonb(n)) nv
+        JOIN jsonb_each(to_jsonb(o)) ov USING (key)
+        WHERE nv.value IS DISTINCT FROM ov.value
+        AND nv.key <> 'updated_at'
+    ) d
+    WHERE d.changes IS NOT NULL;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Drop existing trigger if exists
+DROP TRIGGER IF EXISTS task_history_trigger ON tasks;
+
+-- Create statement-level trigger over the transition tables
+CREATE TRIGGER task_history_trigger
+    AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION save_task_history();
@@ -0,0 +1,17 @@
+-- Periodic full snapshots of a project's tasks, bounding how much
+-- task_history a point-in-time board has to scan
+CREATE TABLE IF NOT EXISTS task_checkpoints (
+    id SERIAL PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    taken_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_task_checkpoints_project_taken ON task_checkpoints(project_id, taken_at DESC);
+
+-- task_id is not a foreign key so tasks deleted later stay reconstructable
+CREATE TABLE IF NOT EXISTS task_checkpoint_states (
+    checkpoint_id INTEGER NOT NULL REFERENCES task_checkpoints(id) ON DELETE CASCADE,
+    task_id INTEGER NOT NULL,
+    state JSONB NOT NULL,
+    PRIMARY KEY (checkpoint_id, task_id)
+);
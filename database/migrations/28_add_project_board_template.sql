@@ -0,0 +1,3 @@
+-- Board template applied to each project; NULL means the default columns
+ALTER TABLE projects
+    ADD COLUMN IF NOT EXISTS board_template_id INTEGER REFERENCES board_templates(id) ON DELETE SET NULL;
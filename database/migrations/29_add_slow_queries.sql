@@ -0,0 +1,14 @@
+-- Statements slower than the capture threshold, with a sampled EXPLAIN plan
+CREATE TABLE IF NOT EXISTS slow_queries (
+    id BIGSERIAL PRIMARY KEY,
+    fingerprint VARCHAR(32) NOT NULL,
+    statement TEXT NOT NULL,
+    params JSONB,
+    duration_ms DOUBLE PRECISION NOT NULL,
+    row_count INTEGER,
+    plan JSONB,
+    captured_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_slow_queries_captured ON slow_queries(captured_at DESC);
+CREATE INDEX IF NOT EXISTS idx_slow_queries_fingerprint ON slow_queries(fingerprint, captured_at DESC);
@@ -0,0 +1,57 @@
+-- Per-project change marker, bumped whenever a project's board data changes,
+-- so cached boards, task lists and metrics can be revalidated with one row read
+CREATE SEQUENCE IF NOT EXISTS project_data_version_seq;
+
+ALTER TABLE projects ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0;
+
+-- TG_ARGV[0] names the column referencing the project ('project_id') or the
+-- task ('task_id', 'parent_task_id') of the changed row
+CREATE OR REPLACE FUNCTION bump_project_data_version()
+RETURNS TRIGGER AS $$
+DECLARE
+    refs INTEGER[] := ARRAY[]::INTEGER[];
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        refs := refs || (to_jsonb(OLD) ->> TG_ARGV[0])::INTEGER;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        refs := refs || (to_jsonb(NEW) ->> TG_ARGV[0])::INTEGER;
+    END IF;
+    IF TG_ARGV[0] = 'project_id' THEN
+        UPDATE projects SET data_version = nextval('project_data_version_seq')
+        WHERE id = ANY(refs);
+    ELSE
+        UPDATE projects SET data_version = nextval('project_data_version_seq')
+        WHERE id IN (SELECT project_id FROM tasks WHERE id = ANY(refs));
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS tasks_project_data_version ON tasks;
+
+CREATE TRIGGER tasks_project_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON tasks
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_project_data_version('project_id');
+
+DROP TRIGGER IF EXISTS subtasks_project_data_version ON subtasks;
+
+CREATE TRIGGER subtasks_project_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON subtasks
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_project_data_version('parent_task_id');
+
+DROP TRIGGER IF EXISTS task_dependencies_project_data_version ON task_dependencies;
+
+CREATE TRIGGER task_dependencies_project_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON task_dependencies
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_project_data_version('task_id');
+
+DROP TRIGGER IF EXISTS file_attachments_project_data_version ON file_attachments;
+
+CREATE TRIGGER file_attachments_project_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON file_attachments
+    FOR EACH ROW
+    EXECUTE FUNCTION bump_project_data_version('task_id');
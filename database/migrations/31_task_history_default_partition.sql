@@ -0,0 +1,51 @@
+-- Create monthly task_history partitions, first moving any rows that landed
+-- in task_history_default for that month (a month's partition cannot be
+-- created while the DEFAULT partition holds rows in its range)
+CREATE OR REPLACE FUNCTION ensure_task_history_partitions(start_date DATE, months_ahead INTEGER)
+RETURNS INTEGER AS $$
+DECLARE
+    month_start DATE := date_trunc('month', start_date)::date;
+    month_end DATE;
+    last_month DATE := (date_trunc('month', CURRENT_DATE) + make_interval(months => months_ahead))::date;
+    partition_name TEXT;
+    has_default BOOLEAN := to_regclass('task_history_default') IS NOT NULL;
+    created INTEGER := 0;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        month_end := (month_start + INTERVAL '1 month')::date;
+        partition_name := format('task_history_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+        IF to_regclass(partition_name) IS NULL THEN
+            IF has_default AND EXISTS (
+                SELECT 1 FROM task_history_default
+                WHERE changed_at >= month_start AND changed_at < month_end
+            ) THEN
+                EXECUTE format(
+                    'CREATE TABLE %I (LIKE task_history INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+                    partition_name
+                );
+                EXECUTE format(
+                    'WITH moved AS (
+                        DELETE FROM task_history_default
+                        WHERE changed_at >= %L AND changed_at < %L
+                        RETURNING *
+                    )
+                    INSERT INTO %I SELECT * FROM moved',
+                    month_start, month_end, partition_name
+                );
+                EXECUTE format(
+                    'ALTER TABLE task_history ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            ELSE
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF task_history FOR VALUES FROM (%L) TO (%L)',
+                    partition_name, month_start, month_end
+                );
+            END IF;
+            created := created + 1;
+        END IF;
+        month_start := month_end;
+    END LOOP;
+    RETURN created;
+END;
+$$ language 'plpgsql';
@@ -0,0 +1,36 @@
+-- Keep the permission version in a single row instead of a sequence:
+-- nextval is visible to other sessions before the changing transaction
+-- commits, while a row update only becomes visible with the change itself
+CREATE TABLE IF NOT EXISTS permission_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO permission_version (id, version) VALUES (TRUE, 0)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_permission_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE permission_version SET version = version + 1;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS user_roles_permission_version ON user_roles;
+
+CREATE TRIGGER user_roles_permission_version
+    AFTER INSERT OR UPDATE OR DELETE ON user_roles
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_permission_version();
+
+DROP TRIGGER IF EXISTS project_members_permission_version ON project_members;
+
+CREATE TRIGGER project_members_permission_version
+    AFTER INSERT OR UPDATE OR DELETE ON project_members
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_permission_version();
+
+CREATE INDEX IF NOT EXISTS idx_project_members_user ON project_members(user_id);
+
+DROP SEQUENCE IF EXISTS permission_version_seq;
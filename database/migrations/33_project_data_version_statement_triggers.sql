@@ -0,0 +1,126 @@
+-- Bump project data versions once per statement instead of once per row:
+-- row triggers ran an UPDATE projects for every changed row, leaving a dead
+-- projects tuple each time
+-- TG_ARGV[0] names the column referencing the project ('project_id') or the
+-- task ('task_id', 'parent_task_id') of the changed rows
+CREATE OR REPLACE FUNCTION bump_project_data_versions()
+RETURNS TRIGGER AS $$
+DECLARE
+    refs INTEGER[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT (to_jsonb(n) ->> TG_ARGV[0])::INTEGER) INTO refs FROM new_rows n;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT (to_jsonb(o) ->> TG_ARGV[0])::INTEGER) INTO refs FROM old_rows o;
+    ELSE
+        SELECT array_agg(DISTINCT ref) INTO refs FROM (
+            SELECT (to_jsonb(n) ->> TG_ARGV[0])::INTEGER as ref FROM new_rows n
+            UNION
+            SELECT (to_jsonb(o) ->> TG_ARGV[0])::INTEGER FROM old_rows o
+        ) r;
+    END IF;
+    IF refs IS NULL THEN
+        RETURN NULL;
+    END IF;
+    IF TG_ARGV[0] <> 'project_id' THEN
+        SELECT array_agg(DISTINCT project_id) INTO refs FROM tasks WHERE id = ANY(refs);
+    END IF;
+    UPDATE projects SET data_version = nextval('project_data_version_seq')
+    WHERE id = ANY(refs);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS tasks_project_data_version ON tasks;
+DROP TRIGGER IF EXISTS tasks_project_data_version_insert ON tasks;
+DROP TRIGGER IF EXISTS tasks_project_data_version_update ON tasks;
+DROP TRIGGER IF EXISTS tasks_project_data_version_delete ON tasks;
+
+CREATE TRIGGER tasks_project_data_version_insert
+    AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('project_id');
+
+CREATE TRIGGER tasks_project_data_version_update
+    AFTER UPDATE ON tasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('project_id');
+
+CREATE TRIGGER tasks_project_data_version_delete
+    AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('project_id');
+
+DROP TRIGGER IF EXISTS subtasks_project_data_version ON subtasks;
+DROP TRIGGER IF EXISTS subtasks_project_data_version_insert ON subtasks;
+DROP TRIGGER IF EXISTS subtasks_project_data_version_update ON subtasks;
+DROP TRIGGER IF EXISTS subtasks_project_data_version_delete ON subtasks;
+
+CREATE TRIGGER subtasks_project_data_version_insert
+    AFTER INSERT ON subtasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('parent_task_id');
+
+CREATE TRIGGER subtasks_project_data_version_update
+    AFTER UPDATE ON subtasks
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('parent_task_id');
+
+CREATE TRIGGER subtasks_project_data_version_delete
+    AFTER DELETE ON subtasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('parent_task_id');
+
+DROP TRIGGER IF EXISTS task_dependencies_project_data_version ON task_dependencies;
+DROP TRIGGER IF EXISTS task_dependencies_project_data_version_insert ON task_dependencies;
+DROP TRIGGER IF EXISTS task_dependencies_project_data_version_update ON task_dependencies;
+DROP TRIGGER IF EXISTS task_dependencies_project_data_version_delete ON task_dependencies;
+
+CREATE TRIGGER task_dependencies_project_data_version_insert
+    AFTER INSERT ON task_dependencies
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+CREATE TRIGGER task_dependencies_project_data_version_update
+    AFTER UPDATE ON task_dependencies
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+CREATE TRIGGER task_dependencies_project_data_version_delete
+    AFTER DELETE ON task_dependencies
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+DROP TRIGGER IF EXISTS file_attachments_project_data_version ON file_attachments;
+DROP TRIGGER IF EXISTS file_attachments_project_data_version_insert ON file_attachments;
+DROP TRIGGER IF EXISTS file_attachments_project_data_version_update ON file_attachments;
+DROP TRIGGER IF EXISTS file_attachments_project_data_version_delete ON file_attachments;
+
+CREATE TRIGGER file_attachments_project_data_version_insert
+    AFTER INSERT ON file_attachments
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+CREATE TRIGGER file_attachments_project_data_version_update
+    AFTER UPDATE ON file_attachments
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+CREATE TRIGGER file_attachments_project_data_version_delete
+    AFTER DELETE ON file_attachments
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION bump_project_data_versions('task_id');
+
+DROP FUNCTION IF EXISTS bump_project_data_version();
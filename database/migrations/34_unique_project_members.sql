@@ -0,0 +1,9 @@
+-- Keep one membership per project and user (the first one) before enforcing it
+DELETE FROM project_members a
+USING project_members b
+WHERE a.project_id = b.project_id
+AND a.user_id = b.user_id
+AND a.ctid > b.ctid;
+
+-- Anti-join lookups and bulk inserts (ON CONFLICT) against project_members
+CREATE UNIQUE INDEX IF NOT EXISTS idx_project_members_project_user ON project_members(project_id, user_id);
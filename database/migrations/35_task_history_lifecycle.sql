@@ -0,0 +1,53 @@
+-- Keep task history after a task is deleted so past boards can still show it
+ALTER TABLE task_history
+    DROP CONSTRAINT IF EXISTS task_history_task_id_fkey;
+
+-- Record task creation as a diff from nothing to the full row, marked with
+-- _created so reconstruction can start from it instead of the live row.
+-- Stamped at created_at so backdated imports line up with their history
+CREATE OR REPLACE FUNCTION save_task_history_insert()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO task_history (task_id, changes, changed_at)
+    SELECT n.id, d.changes, COALESCE(n.created_at, CURRENT_TIMESTAMP)
+    FROM new_rows n
+    CROSS JOIN LATERAL (
+        SELECT jsonb_object_agg(nv.key, jsonb_build_array(NULL::jsonb, nv.value))
+               || jsonb_build_object('_created', jsonb_build_array(false, true)) as changes
+        FROM jsonb_each(to_jsonb(n)) nv
+        WHERE nv.key <> 'updated_at'
+    ) d;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Record task deletion as a _deleted marker diff
+CREATE OR REPLACE FUNCTION save_task_history_delete()
+RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO task_history (task_id, changes, changed_at)
+    SELECT o.id, jsonb_build_object('_deleted', jsonb_build_array(false, true)), CURRENT_TIMESTAMP
+    FROM old_rows o;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS task_history_insert_trigger ON tasks;
+DROP TRIGGER IF EXISTS task_history_delete_trigger ON tasks;
+
+CREATE TRIGGER task_history_insert_trigger
+    AFTER INSERT ON tasks
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION save_task_history_insert();
+
+CREATE TRIGGER task_history_delete_trigger
+    AFTER DELETE ON tasks
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION save_task_history_delete();
+
+-- Finds the tasks a project gained since a checkpoint, including deleted ones
+CREATE INDEX IF NOT EXISTS idx_task_history_created_project
+    ON task_history (((changes -> 'project_id' ->> 1)::int), changed_at)
+    WHERE changes ? '_created';
@@ -0,0 +1,7 @@
+-- Projects each user pinned to the top of the sidebar
+CREATE TABLE IF NOT EXISTS pinned_projects (
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    pinned_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, project_id)
+);
@@ -0,0 +1,39 @@
+from database.connection import execute_query
+import logging
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def repair_project_counters():
+    """Recompute projects.total_tasks/completed_tasks where they drifted"""
+    try:
+        result = execute_query("""
+            UPDATE projects p
+            SET total_tasks = COALESCE(c.total_tasks, 0),
+                completed_tasks = COALESCE(c.completed_tasks, 0)
+            FROM projects p2
+            LEFT JOIN (
+                SELECT project_id,
+                       COUNT(*) as total_tasks,
+                       COUNT(*) FILTER (WHERE status = 'Done') as completed_tasks
+                FROM tasks
+                GROUP BY project_id
+            ) c ON c.project_id = p2.id
+            WHERE p.id = p2.id
+            AND (p.total_tasks IS DISTINCT FROM COALESCE(c.total_tasks, 0)
+                 OR p.completed_tasks IS DISTINCT FROM COALESCE(c.completed_tasks, 0))
+            RETURNING p.id
+        """)
+        
+        repaired = [row['id'] for row in result or []]
+        if repaired:
+            logger.warning(f"Repaired task counters for projects: {repaired}")
+        else:
+            logger.info("Project task counters are consistent")
+        return repaired
+    except Exception as e:
+        logger.error(f"Counter repair failed: {str(e)}")
+        return None
+
+if __name__ == "__main__":
+    repair_project_counters()
@@ -1,119 +1,309 @@
 from database.connection import execute_query
 import logging
 import os
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Schema setup runs once per process; DDL takes locks that would block every reader
+_initialized = False
+_init_lock = threading.Lock()
+# Whether the history migrations the point-in-time board needs are in place
+_history_ready = False
+
+def _schema_objects():
+    """Tables, columns ("table.column"), triggers and indexes present in the current schema"""
+    result = execute_query("""
+        SELECT 'table' as kind, table_name as name
+        FROM information_schema.tables WHERE table_schema = current_schema()
+        UNION ALL
+        SELECT 'column', table_name || '.' || column_name
+        FROM information_schema.columns WHERE table_schema = current_schema()
+        UNION ALL
+        SELECT 'trigger', tgname FROM pg_trigger WHERE NOT tgisinternal
+        UNION ALL
+        SELECT 'index', indexname FROM pg_indexes WHERE schemaname = current_schema()
+    """, use_cache=False)
+    if result is None:
+        raise RuntimeError("Could not read the database schema")
+    objects = {'table': set(), 'column': set(), 'trigger': set(), 'index': set()}
+    for row in result:
+        objects[row['kind']].add(row['name'])
+    return objects
+
 def init_database():
+    global _initialized
+    if _initialized:
+        return True
+    with _init_lock:
+        if _initialized:
+            return True
+        _initialized = _init_database()
+        return _initialized
+
+def history_ready():
+    """True once init_database found task diffs, lifecycle triggers and checkpoints"""
+    return _history_ready
+
+def _init_database():
+    global _history_ready
     try:
+        existing = _schema_objects()
+        tables, columns, triggers, indexes = (
+            existing['table'], existing['column'], existing['trigger'], existing['index']
+        )
+        
         # Create projects table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS projects (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100) NOT NULL,
-                description TEXT,
-                deadline DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                deleted_at TIMESTAMP
-            )
-        ''')
+        if 'projects' not in tables:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS projects (
+                    id SERIAL PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL,
+                    description TEXT,
+                    deadline DATE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    deleted_at TIMESTAMP
+                )
+            ''')
         
         # Add deleted_at column to projects table if it doesn't exist
-        execute_query('''
-            ALTER TABLE projects 
-            ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
-        ''')
+        if 'projects.deleted_at' not in columns:
+            execute_query('''
+                ALTER TABLE projects 
+                ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+            ''')
         
         # Create tasks table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS tasks (
-                id SERIAL PRIMARY KEY,
-                project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
-                title VARCHAR(100) NOT NULL,
-                description TEXT,
-                status VARCHAR(50) DEFAULT 'To Do',
-                priority VARCHAR(50) DEFAULT 'Medium',
-                due_date DATE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        if 'tasks' not in tables:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS tasks (
+                    id SERIAL PRIMARY KEY,
+                    project_id INTEGER REFERENCES projects(id) ON DELETE CASCADE,
+                    title VARCHAR(100) NOT NULL,
+                    description TEXT,
+                    status VARCHAR(50) DEFAULT 'To Do',
+                    priority VARCHAR(50) DEFAULT 'Medium',
+                    due_date DATE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
         # Create task_dependencies table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS task_dependencies (
-                id SERIAL PRIMARY KEY,
-                task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
-                depends_on_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(task_id, depends_on_id),
-                CHECK (task_id != depends_on_id)
-            )
-        ''')
+        if 'task_dependencies' not in tables:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS task_dependencies (
+                    id SERIAL PRIMARY KEY,
+                    task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
+                    depends_on_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(task_id, depends_on_id),
+                    CHECK (task_id != depends_on_id)
+                )
+            ''')
         
         # Create subtasks table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS subtasks (
-                id SERIAL PRIMARY KEY,
-                parent_task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                status VARCHAR(50) DEFAULT 'To Do',
-                completed BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        if 'subtasks' not in tables:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS subtasks (
+                    id SERIAL PRIMARY KEY,
+                    parent_task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
+                    title VARCHAR(255) NOT NULL,
+                    description TEXT,
+                    status VARCHAR(50) DEFAULT 'To Do',
+                    completed BOOLEAN DEFAULT FALSE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
         
         # Create trigger for updating subtasks timestamp
-        execute_query('''
-            CREATE OR REPLACE FUNCTION update_subtask_timestamp()
-            RETURNS TRIGGER AS $$
-            BEGIN
-                NEW.updated_at = CURRENT_TIMESTAMP;
-                RETURN NEW;
-            END;
-            $$ language 'plpgsql';
-
-            DROP TRIGGER IF EXISTS update_subtask_timestamp ON subtasks;
+        if 'update_subtask_timestamp' not in triggers:
+            execute_query('''
+                CREATE OR REPLACE FUNCTION update_subtask_timestamp()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    NEW.updated_at = CURRENT_TIMESTAMP;
+                    RETURN NEW;
+                END;
+                $$ language 'plpgsql';
+
+                DROP TRIGGER IF EXISTS update_subtask_timestamp ON subtasks;
             
-            CREATE TRIGGER update_subtask_timestamp
-                BEFORE UPDATE ON subtasks
-                FOR EACH ROW
-                EXECUTE FUNCTION update_subtask_timestamp();
-        ''')
+                CREATE TRIGGER update_subtask_timestamp
+                    BEFORE UPDATE ON subtasks
+                    FOR EACH ROW
+                    EXECUTE FUNCTION update_subtask_timestamp();
+            ''')
         
         # Create file_attachments table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS file_attachments (
-                id SERIAL PRIMARY KEY,
-                task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
-                filename VARCHAR(255) NOT NULL,
-                file_path VARCHAR(255) NOT NULL,
-                file_type VARCHAR(100),
-                file_size INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        if 'file_attachments' not in tables:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS file_attachments (
+                    id SERIAL PRIMARY KEY,
+                    task_id INTEGER REFERENCES tasks(id) ON DELETE CASCADE,
+                    filename VARCHAR(255) NOT NULL,
+                    file_path VARCHAR(255) NOT NULL,
+                    file_type VARCHAR(100),
+                    file_size INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+        
+        # Create content-addressed attachment_blobs table and link attachments to it
+        if ('attachment_blobs' not in tables or 'file_attachments.content_hash' not in columns
+                or 'idx_attachment_blobs_unreferenced' not in indexes):
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS attachment_blobs (
+                    content_hash CHAR(64) PRIMARY KEY,
+                    file_path VARCHAR(255) NOT NULL,
+                    file_size BIGINT,
+                    ref_count INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
 
+                ALTER TABLE file_attachments
+                    ADD COLUMN IF NOT EXISTS content_hash CHAR(64) REFERENCES attachment_blobs(content_hash);
+
+                CREATE INDEX IF NOT EXISTS idx_file_attachments_content_hash ON file_attachments(content_hash);
+                CREATE INDEX IF NOT EXISTS idx_file_attachments_task_created ON file_attachments(task_id, created_at DESC);
+                CREATE INDEX IF NOT EXISTS idx_attachment_blobs_unreferenced ON attachment_blobs(content_hash) WHERE ref_count <= 0;
+            ''')
+        
+        # Create trigger keeping attachment_blobs.ref_count in sync
+        if 'attachment_ref_count_trigger' not in triggers:
+            execute_query('''
+                CREATE OR REPLACE FUNCTION update_attachment_ref_count()
+                RETURNS TRIGGER AS $$
+                BEGIN
+                    IF TG_OP = 'INSERT' AND NEW.content_hash IS NOT NULL THEN
+                        UPDATE attachment_blobs SET ref_count = ref_count + 1
+                        WHERE content_hash = NEW.content_hash;
+                    ELSIF TG_OP = 'DELETE' AND OLD.content_hash IS NOT NULL THEN
+                        UPDATE attachment_blobs SET ref_count = ref_count - 1
+                        WHERE content_hash = OLD.content_hash;
+                    END IF;
+                    RETURN NULL;
+                END;
+                $$ language 'plpgsql';
+
+                DROP TRIGGER IF EXISTS attachment_ref_count_trigger ON file_attachments;
+
+                CREATE TRIGGER attachment_ref_count_trigger
+                    AFTER INSERT OR DELETE ON file_attachments
+                    FOR EACH ROW
+                    EXECUTE FUNCTION update_attachment_ref_count();
+            ''')
+        
         # Create board_templates table
-        execute_query('''
-            CREATE TABLE IF NOT EXISTS board_templates (
-                id SERIAL PRIMARY KEY,
-                name VARCHAR(100) NOT NULL UNIQUE,
-                columns JSONB NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
+        if 'board_templates' not in tables or 'projects.board_template_id' not in columns:
+            execute_query('''
+                CREATE TABLE IF NOT EXISTS board_templates (
+                    id SERIAL PRIMARY KEY,
+                    name VARCHAR(100) NOT NULL UNIQUE,
+                    columns JSONB NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+            
+                -- Insert default template if it doesn't exist
+                INSERT INTO board_templates (name, columns) VALUES
+                    ('Basic Kanban', '["To Do", "In Progress", "Done"]')
+                ON CONFLICT (name) DO NOTHING;
             
-            -- Insert default template if it doesn't exist
-            INSERT INTO board_templates (name, columns) VALUES
-                ('Basic Kanban', '["To Do", "In Progress", "Done"]')
-            ON CONFLICT (name) DO NOTHING;
-        ''')
+                -- Board template applied to each project
+                ALTER TABLE projects
+                    ADD COLUMN IF NOT EXISTS board_template_id INTEGER REFERENCES board_templates(id) ON DELETE SET NULL;
+            ''')
+        
+        # Add denormalized task counters to projects (migrated and backfilled once)
+        if 'projects.total_tasks' not in columns:
+            with open('database/migrations/24_add_project_task_counters.sql', 'r') as f:
+                execute_query(f.read())
         
+        # Create slow_queries table for slow statement capture
+        if 'slow_queries' not in tables:
+            with open('database/migrations/29_add_slow_queries.sql', 'r') as f:
+                execute_query(f.read())
+        
+        # Add per-project data versions used to revalidate cached views (migrated once)
+        if 'projects.data_version' not in columns:
+            with open('database/migrations/30_add_project_data_version.sql', 'r') as f:
+                execute_query(f.read())
+        
+        # Bump data versions once per statement rather than per row (migrated once)
+        if 'projects.data_version' not in columns or 'tasks_project_data_version_insert' not in triggers:
+            with open('database/migrations/33_project_data_version_statement_triggers.sql', 'r') as f:
+                execute_query(f.read())
+        
+        # Create the legacy task_history table that migration 26 converts
+        if 'task_history' not in tables:
+            with open('database/migrations/14_add_task_history.sql', 'r') as f:
+                execute_query(f.read())
+
+        # Store task history as diffs in monthly partitions (migrated once)
+        if 'task_history.changes' not in columns:
+            with open('database/migrations/26_task_history_diffs.sql', 'r') as f:
+                execute_query(f.read())
+            tables.add('task_history_default')
+
+        # Create task checkpoints used by the point-in-time board (migrated once)
+        if 'task_checkpoints' not in tables or 'task_checkpoint_states' not in tables:
+            with open('database/migrations/27_add_task_checkpoints.sql', 'r') as f:
+                execute_query(f.read())
+
+        # Record task creation and deletion so deleted tasks stay reconstructable (migrated once)
+        if 'task_history_delete_trigger' not in triggers:
+            with open('database/migrations/35_task_history_lifecycle.sql', 'r') as f:
+                execute_query(f.read())
+
+        # Let partition maintenance move rows out of task_history_default (migrated once)
+        if 'task_history_default' in tables:
+            moves_default_rows = execute_query("""
+                SELECT 1 FROM pg_proc
+                WHERE proname = 'ensure_task_history_partitions'
+                AND prosrc LIKE '%task_history_default%'
+            """, use_cache=False)
+            if not moves_default_rows:
+                with open('database/migrations/31_task_history_default_partition.sql', 'r') as f:
+                    execute_query(f.read())
+        
+        # Track permission changes transactionally for the permission cache (migrated once)
+        if ('permission_version' not in tables
+                and 'user_roles' in tables and 'project_members' in tables):
+            with open('database/migrations/32_permission_version_row.sql', 'r') as f:
+                execute_query(f.read())
+        
+        # One membership per project and user, needed by bulk member adds (migrated once)
+        if 'project_members' in tables and 'idx_project_members_project_user' not in indexes:
+            with open('database/migrations/34_unique_project_members.sql', 'r') as f:
+                execute_query(f.read())
+        
+        # Trigram indexes for member search; needs pg_trgm, so kept apart from 34 (migrated once)
+        if 'users' in tables and 'idx_users_email_trgm' not in indexes:
+            with open('database/migrations/23_add_user_search_indexes.sql', 'r') as f:
+                execute_query(f.read())
+
+        # Keyset pagination and name search indexes for the sidebar (migrated once)
+        if 'idx_projects_active_created_id' not in indexes or 'idx_projects_name_trgm' not in indexes:
+            with open('database/migrations/25_add_project_search_indexes.sql', 'r') as f:
+                execute_query(f.read())
+
+        # Per-user pinned projects (migrated once)
+        if 'users' in tables and 'pinned_projects' not in tables:
+            with open('database/migrations/36_add_pinned_projects.sql', 'r') as f:
+                execute_query(f.read())
+
         # Create uploads directory if it doesn't exist
         os.makedirs('uploads', exist_ok=True)
         
+        # Migrations above report failures without raising, so check what exists now
+        existing = _schema_objects()
+        _history_ready = (
+            'task_history.changes' in existing['column']
+            and 'task_checkpoint_states' in existing['table']
+            and 'task_history_delete_trigger' in existing['trigger']
+        )
+        
         logger.info("Database schema initialized successfully")
         return True
         
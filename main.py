@@ -1,16 +1,27 @@
 import streamlit as st
 import logging
+import time
 from database.schema import init_database
-from database.connection import get_connection
+from database.connection import statement_timeout, begin_degraded_tracking, get_degraded_results
 from components.project_form import create_project_form, list_projects
-from components.task_form import create_task_form
 from components.board_view import render_board
-from components.analytics import render_analytics
+from utils.attachment_reconciler import start_reconciler
+from database.maintain_task_history import start_history_maintenance
+from utils.attachment_server import start_attachment_server
+from utils.profiling import start_profile, render_profile_panel, is_profiling_requested
+from utils.metrics import start_metrics_server, observe_rerun
+from utils.tracing import start_rerun_span, end_rerun_span
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Reads slower than this are canceled; the view falls back to its last cached result
+VIEW_STATEMENT_TIMEOUTS_MS = {
+    'Board': 5000,
+    'Analytics': 15000,
+}
+
 # Page config
 st.set_page_config(
     page_title="Project Management Tool",
@@ -18,6 +29,15 @@ st.set_page_config(
     layout="wide"
 )
 
+rerun_started = time.perf_counter()
+
+# Opt-in developer overlay (PROFILING_ENABLED or ?profile=1)
+start_profile()
+# Root tracing span of this rerun (TRACING_ENABLED)
+start_rerun_span(st.session_state)
+# Note reads answered from stale cache because their query failed or timed out
+begin_degraded_tracking()
+
 # Initialize session states
 if 'current_view' not in st.session_state:
     st.session_state.current_view = 'Board'
@@ -28,6 +48,14 @@ if 'selected_project' not in st.session_state:
 try:
     # Initialize database
     init_database()
+    # Reconcile attachment storage with the database in the background
+    start_reconciler()
+    # Task history partitions, retention, compaction and checkpoints
+    start_history_maintenance()
+    # Serve attachment downloads with range and ETag support
+    start_attachment_server()
+    # Expose Prometheus metrics for this process
+    start_metrics_server()
 except Exception as e:
     logger.error(f"Database initialization error: {str(e)}")
     st.error("Failed to initialize database. Please check the configuration.")
@@ -41,6 +69,17 @@ with st.sidebar:
         st.session_state.current_view = 'create_project'
         st.rerun()
 
+    # Developer report, shown alongside the profiling overlay
+    if is_profiling_requested() and st.button("🐢 Slow queries"):
+        st.session_state.current_view = 'slow_queries'
+        st.rerun()
+
+    # Revokes the remembered token so it cannot be replayed after logout
+    if st.session_state.get('user_id') and st.button("Log out"):
+        from auth.auth_handler import logout_user
+        logout_user()
+        st.rerun()
+
     st.write("---")
     st.write("## Select Project")
     selected_project = list_projects()
@@ -57,19 +96,36 @@ with st.sidebar:
             st.rerun()
 
 # Main content
+degraded_banner = st.empty()
 try:
     if st.session_state.current_view == 'create_project':
         if create_project_form():
             st.session_state.current_view = 'Board'
             st.rerun()
 
+    elif st.session_state.current_view == 'slow_queries':
+        from components.slow_queries import render_slow_query_report
+        render_slow_query_report()
+
     elif st.session_state.selected_project:
-        if st.session_state.current_view == 'Analytics':
-            render_analytics(st.session_state.selected_project)
-        else:  # Board view
-            render_board(st.session_state.selected_project)
+        view = 'Analytics' if st.session_state.current_view == 'Analytics' else 'Board'
+        with statement_timeout(VIEW_STATEMENT_TIMEOUTS_MS[view]):
+            if view == 'Analytics':
+                # Imported on demand: pulls in plotly and pandas
+                from components.analytics import render_analytics
+                render_analytics(st.session_state.selected_project)
+            else:  # Board view
+                render_board(st.session_state.selected_project)
     else:
         st.info("Please select or create a project to get started!")
 except Exception as e:
     logger.error(f"Application error: {str(e)}")
-    st.error("An error occurred. Please try again.")
\ No newline at end of file
+    st.error("An error occurred. Please try again.")
+
+if get_degraded_results():
+    degraded_banner.warning("Some data is taking too long to load; showing the last available results.")
+
+render_profile_panel()
+current_view = st.session_state.current_view if st.session_state.selected_project else 'none'
+observe_rerun(current_view, time.perf_counter() - rerun_started)
+end_rerun_span(st.session_state, view=current_view, project_id=st.session_state.selected_project)
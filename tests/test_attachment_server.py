@@ -0,0 +1,104 @@
+import http.client
+import threading
+from http.server import ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from utils import attachment_server
+from utils.attachment_server import parse_range
+
+CONTENT = bytes(range(256)) * 4
+CONTENT_HASH = 'ab' * 32
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-99', (0, 99)),
+    ('bytes=100-', (100, 1023)),
+    ('bytes=-24', (1000, 1023)),
+    ('bytes=-5000', (0, 1023)),
+    ('bytes=1000-5000', (1000, 1023)),
+    (' bytes=5-5 ', (5, 5)),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1024) == expected
+
+@pytest.mark.parametrize('header', ['bytes=-', 'bytes=0-1,5-9', 'items=0-1', 'garbage'])
+def test_parse_range_serves_whole_file_for_unsupported_headers(header):
+    assert parse_range(header, 1024) is None
+
+@pytest.mark.parametrize('header', ['bytes=1024-', 'bytes=10-5', 'bytes=-0'])
+def test_parse_range_rejects_unsatisfiable_ranges(header):
+    with pytest.raises(ValueError):
+        parse_range(header, 1024)
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """Attachment server on an ephemeral port serving one file"""
+    path = tmp_path / 'blob'
+    path.write_bytes(CONTENT)
+    row = {
+        'id': 1, 'filename': 'report final.bin', 'file_path': str(path),
+        'file_type': 'application/octet-stream', 'content_hash': CONTENT_HASH,
+    }
+    monkeypatch.setattr(attachment_server, 'execute_query',
+                        lambda query, params=None, **kwargs: [dict(row)] if params == (1,) else [])
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), attachment_server.AttachmentRequestHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def _get(server, path, headers=None, method='GET'):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    try:
+        conn.request(method, path, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), response.read()
+    finally:
+        conn.close()
+
+def _url(attachment_id=1):
+    url = urlparse(attachment_server.get_download_url(attachment_id))
+    return f"{url.path}?{url.query}"
+
+def test_full_download_carries_etag_and_accepts_ranges(server):
+    status, headers, body = _get(server, _url())
+    assert status == 200
+    assert body == CONTENT
+    assert headers['ETag'] == f'"{CONTENT_HASH}"'
+    assert headers['Accept-Ranges'] == 'bytes'
+    assert 'immutable' in headers['Cache-Control']
+    assert headers['Content-Disposition'] == "inline; filename*=UTF-8''report%20final.bin"
+
+def test_head_sends_headers_only(server):
+    status, headers, body = _get(server, _url(), method='HEAD')
+    assert status == 200
+    assert headers['Content-Length'] == str(len(CONTENT))
+    assert body == b''
+
+def test_matching_if_none_match_is_not_modified(server):
+    status, headers, body = _get(server, _url(), {'If-None-Match': f'"other", "{CONTENT_HASH}"'})
+    assert status == 304
+    assert body == b''
+    assert headers['ETag'] == f'"{CONTENT_HASH}"'
+
+def test_range_returns_partial_content(server):
+    status, headers, body = _get(server, _url(), {'Range': 'bytes=10-19'})
+    assert status == 206
+    assert body == CONTENT[10:20]
+    assert headers['Content-Range'] == f"bytes 10-19/{len(CONTENT)}"
+
+def test_stale_if_range_gets_the_whole_file(server):
+    status, _, body = _get(server, _url(), {'Range': 'bytes=10-19', 'If-Range': '"stale"'})
+    assert status == 200
+    assert body == CONTENT
+
+def test_unsatisfiable_range(server):
+    status, headers, _ = _get(server, _url(), {'Range': f'bytes={len(CONTENT)}-'})
+    assert status == 416
+    assert headers['Content-Range'] == f"bytes */{len(CONTENT)}"
+
+def test_bad_signature_and_unknown_attachment_are_not_found(server):
+    assert _get(server, _url().replace('signature=', 'signature=0'))[0] == 404
+    assert _get(server, _url(2))[0] == 404
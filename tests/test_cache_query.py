@@ -0,0 +1,183 @@
+import threading
+import time
+import types
+
+import pytest
+
+from database import connection
+from database.connection import cache_query
+
+class SessionState(dict):
+    """Attribute-style dict standing in for st.session_state"""
+    __getattr__ = dict.__getitem__
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+@pytest.fixture(autouse=True)
+def session(monkeypatch):
+    state = SessionState()
+    monkeypatch.setattr(connection, 'st', types.SimpleNamespace(session_state=state))
+    return state
+
+class Source:
+    """Query stand-in counting calls; returns one row tagged with the call number"""
+
+    def __init__(self):
+        self.calls = 0
+        self.version = 1
+        self.version_reads = 0
+        self.fail = False
+
+    def query(self, key):
+        if self.fail:
+            return None
+        self.calls += 1
+        return [{'key': key, 'call': self.calls}]
+
+    def read_version(self, key):
+        self.version_reads += 1
+        return self.version
+
+def _expire(session, age):
+    for entry in session.query_cache.values():
+        entry['timestamp'] -= age
+
+def _wait_for_refresh(session):
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        if all('refreshed' in e or not e.get('refreshing') for e in session.query_cache.values()):
+            return
+        time.sleep(0.01)
+    raise AssertionError("background refresh did not finish")
+
+def test_results_are_cached_within_ttl():
+    source = Source()
+    cached = cache_query(ttl_seconds=60)(source.query)
+    assert cached('a') == [{'key': 'a', 'call': 1}]
+    assert cached('a') == [{'key': 'a', 'call': 1}]
+    assert cached('b')[0]['call'] == 2
+    assert source.calls == 2
+
+def test_expired_entry_is_served_stale_and_refreshed_for_the_next_call(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=600)(source.query)
+    cached('a')
+    _expire(session, 120)
+    assert cached('a')[0]['call'] == 1
+    _wait_for_refresh(session)
+    assert cached('a')[0]['call'] == 2
+
+def test_entry_past_the_stale_window_is_recomputed_inline(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=600)(source.query)
+    cached('a')
+    _expire(session, 1000)
+    assert cached('a')[0]['call'] == 2
+
+def test_failed_query_serves_the_last_good_result(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=0)(source.query)
+    cached('a')
+    _expire(session, 120)
+    source.fail = True
+    connection.begin_degraded_tracking()
+    assert cached('a')[0]['call'] == 1
+    assert connection.get_degraded_results()
+
+def test_unchanged_version_renews_the_entry_without_querying(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=0, version=source.read_version)(source.query)
+    cached('a')
+    _expire(session, 120)
+    assert cached('a')[0]['call'] == 1
+    assert source.calls == 1
+    # Renewed, so the next call is a plain hit
+    reads = source.version_reads
+    cached('a')
+    assert source.version_reads == reads
+
+def test_changed_version_reruns_the_query(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=0, version=source.read_version)(source.query)
+    cached('a')
+    _expire(session, 120)
+    source.version = 2
+    assert cached('a')[0]['call'] == 2
+    assert next(iter(session.query_cache.values()))['etag'] == 2
+
+def test_result_version_skips_the_version_read_on_a_cold_miss(session):
+    source = Source()
+    cached = cache_query(
+        ttl_seconds=60, stale_seconds=0, version=source.read_version,
+        result_version=lambda rows: rows[0]['call'] * 10
+    )(source.query)
+    cached('a')
+    assert source.version_reads == 0
+    assert next(iter(session.query_cache.values()))['etag'] == 10
+
+def test_cleared_cache_drops_a_background_refresh(session):
+    source = Source()
+    cached = cache_query(ttl_seconds=60, stale_seconds=600)(source.query)
+    cached('a')
+    _expire(session, 120)
+    cached('a')
+    _wait_for_refresh(session)
+    # A write clears the session cache; the pre-write refresh must not come back
+    session.query_cache.clear()
+    assert cached('a')[0]['call'] == 3
+
+def test_concurrent_callers_share_one_computation_but_not_its_rows():
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return [{'value': 1}]
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(connection._single_flight('k', compute)))
+    leader.start()
+    started.wait(5)
+    waiter = threading.Thread(target=lambda: results.append(connection._single_flight('k', compute)))
+    waiter.start()
+    # Let the waiter join the flight before the leader finishes
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        with connection._in_flight_lock:
+            flight = next((f for k, f in connection._in_flight.items() if k.startswith('k#')), None)
+            if flight and flight.waiters:
+                break
+        time.sleep(0.01)
+    release.set()
+    leader.join(5)
+    waiter.join(5)
+
+    assert len(calls) == 1
+    assert sorted(ran for _, ran in results) == [False, True]
+    rows = [result for result, _ in results]
+    assert rows[0] == rows[1]
+    rows[0][0]['value'] = 2
+    assert rows[1][0]['value'] == 1
+
+def test_reads_after_a_write_do_not_join_an_earlier_flight():
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return ['before write']
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(connection._single_flight('w', slow)))
+    leader.start()
+    started.wait(5)
+    connection._bump_write_generation()
+    result, ran = connection._single_flight('w', lambda: ['after write'])
+    release.set()
+    leader.join(5)
+    assert (result, ran) == (['after write'], True)
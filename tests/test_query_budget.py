@@ -0,0 +1,22 @@
+import os
+
+import pytest
+
+pytest.importorskip('streamlit')
+pytest.importorskip('psycopg2')
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get('PGHOST'),
+    reason="query budgets render views against a seeded PostgreSQL database"
+)
+
+def test_views_stay_within_query_budgets():
+    from benchmarks.query_budget import check_query_budgets
+
+    report = check_query_budgets()
+    failures = {
+        view: result['failures']
+        for view, result in report['views'].items()
+        if result['failures']
+    }
+    assert report['passed'], failures
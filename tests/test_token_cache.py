@@ -0,0 +1,62 @@
+import types
+
+import pytest
+
+from auth import token_cache
+
+SECRET = 'test-secret'
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Frozen clock for the cache, advanced by tests"""
+    now = types.SimpleNamespace(value=1_000_000.0)
+    monkeypatch.setattr(token_cache, 'time', types.SimpleNamespace(time=lambda: now.value))
+    token_cache._verified.clear()
+    token_cache._revoked.clear()
+    yield now
+    token_cache._verified.clear()
+    token_cache._revoked.clear()
+
+def test_verified_token_is_served_from_cache():
+    token_cache.cache_verified_token('token-a', SECRET, {'user_id': 7, 'exp': 1_000_600})
+    assert token_cache.get_verified_user('token-a', SECRET) == 7
+
+def test_cache_is_scoped_to_the_signing_secret():
+    token_cache.cache_verified_token('token-a', SECRET, {'user_id': 7, 'exp': 1_000_600})
+    assert token_cache.get_verified_user('token-a', 'other-secret') is None
+
+def test_entry_expires_at_token_exp(clock):
+    token_cache.cache_verified_token('token-a', SECRET, {'user_id': 7, 'exp': 1_000_600})
+    clock.value = 1_000_600
+    assert token_cache.get_verified_user('token-a', SECRET) is None
+    assert not token_cache._verified
+
+def test_token_without_exp_is_reverified_after_ttl(clock):
+    token_cache.cache_verified_token('token-a', SECRET, {'user_id': 7})
+    clock.value += token_cache.NO_EXP_TTL_SECONDS - 1
+    assert token_cache.get_verified_user('token-a', SECRET) == 7
+    clock.value += 1
+    assert token_cache.get_verified_user('token-a', SECRET) is None
+
+def test_revocation_applies_immediately():
+    token_cache.cache_verified_token('token-a', SECRET, {'user_id': 7, 'exp': 1_000_600})
+    token_cache.revoke_token('token-a')
+    assert token_cache.is_revoked('token-a')
+    assert token_cache.get_verified_user('token-a', SECRET) is None
+    assert not token_cache.is_revoked('token-b')
+
+def test_revocation_expires_with_the_token(clock):
+    token_cache.revoke_token('token-a', exp=1_000_600)
+    clock.value = 1_000_600
+    assert not token_cache.is_revoked('token-a')
+
+def test_cache_is_bounded_least_recently_used_first(monkeypatch):
+    monkeypatch.setattr(token_cache, 'MAX_CACHED_TOKENS', 2)
+    for name in ('token-a', 'token-b'):
+        token_cache.cache_verified_token(name, SECRET, {'user_id': name, 'exp': 1_000_600})
+    # Touch token-a so token-b becomes the oldest entry
+    assert token_cache.get_verified_user('token-a', SECRET) == 'token-a'
+    token_cache.cache_verified_token('token-c', SECRET, {'user_id': 'token-c', 'exp': 1_000_600})
+    assert token_cache.get_verified_user('token-b', SECRET) is None
+    assert token_cache.get_verified_user('token-a', SECRET) == 'token-a'
+    assert token_cache.get_verified_user('token-c', SECRET) == 'token-c'
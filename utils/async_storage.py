@@ -0,0 +1,77 @@
+import os
+import uuid
+import asyncio
+import logging
+import threading
+import aiofiles
+import aiofiles.os
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on attachment file operations in flight across all sessions
+MAX_CONCURRENT_IO = int(os.environ.get('ATTACHMENT_IO_CONCURRENCY', 8))
+
+_loop = None
+_semaphore = None
+_loop_lock = threading.Lock()
+
+def _get_loop():
+    """Return the storage event loop, starting its thread on first use"""
+    global _loop, _semaphore
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="attachment-io", daemon=True).start()
+            ready.wait()
+            _semaphore = asyncio.run_coroutine_threadsafe(_create_semaphore(), loop).result()
+            _loop = loop
+        return _loop
+
+async def _create_semaphore():
+    return asyncio.Semaphore(MAX_CONCURRENT_IO)
+
+def run_sync(coro, timeout=None):
+    """Run a storage coroutine on the storage loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
+
+async def save_file(path, data):
+    """Atomically write data to path; returns False if path already exists"""
+    async with _semaphore:
+        if await aiofiles.os.path.exists(path):
+            return False
+        await aiofiles.os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Write to a temporary name first so readers never see a partial file
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        try:
+            async with aiofiles.open(tmp_path, 'wb') as f:
+                await f.write(data)
+            await aiofiles.os.replace(tmp_path, path)
+        finally:
+            if await aiofiles.os.path.exists(tmp_path):
+                await aiofiles.os.remove(tmp_path)
+        return True
+
+async def delete_file(path):
+    """Delete a file; returns False if it was already gone"""
+    async with _semaphore:
+        try:
+            await aiofiles.os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+async def delete_files(paths):
+    """Delete many files concurrently, bounded by the shared semaphore"""
+    results = await asyncio.gather(*(delete_file(p) for p in paths), return_exceptions=True)
+    for path, result in zip(paths, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not delete {path}: {str(result)}")
+    return sum(1 for r in results if r is True)
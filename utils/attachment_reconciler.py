@@ -0,0 +1,159 @@
+import os
+import time
+import threading
+import logging
+from database.connection import execute_query, batch_execute
+from utils.file_handler import UPLOAD_DIR, OBJECTS_DIR, collect_garbage
+
+logger = logging.getLogger(__name__)
+
+# Files and rows younger than this may belong to an upload still in progress
+ORPHAN_GRACE_SECONDS = int(os.environ.get('ATTACHMENT_ORPHAN_GRACE_SECONDS', 3600))
+RECONCILE_INTERVAL_SECONDS = int(os.environ.get('ATTACHMENT_RECONCILE_INTERVAL_SECONDS', 3600))
+BATCH_SIZE = 500
+
+_reconciler_thread = None
+_reconciler_lock = threading.Lock()
+_last_report = None
+
+def _chunks(items, size):
+    """Yield successive fixed-size chunks from a list"""
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def scan_storage():
+    """Return {path: (size, mtime)} for every stored file, legacy and content-addressed"""
+    files = {}
+    for root, dirs, names in os.walk(UPLOAD_DIR):
+        # Thumbnails and other derived data are not attachment storage
+        if root == UPLOAD_DIR:
+            dirs[:] = [d for d in dirs if os.path.join(root, d) == OBJECTS_DIR]
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files[path] = (stat.st_size, stat.st_mtime)
+    return files
+
+def reconcile_attachments(batch_size=BATCH_SIZE):
+    """Remove attachment rows without files and files without rows, in bulk.
+
+    Returns a report dict describing what was scanned and removed.
+    """
+    started = time.time()
+    report = {
+        'scanned_files': 0,
+        'scanned_blobs': 0,
+        'scanned_legacy_attachments': 0,
+        'missing_blobs': 0,
+        'missing_legacy_attachments': 0,
+        'orphan_files_removed': 0,
+        'bytes_reclaimed': 0,
+        'errors': 0,
+    }
+    try:
+        # Read the rows before walking the disk: an upload writes its file
+        # before committing its row, so every row read here already has its
+        # file on disk by the time of the walk
+        blobs = execute_query("""
+            SELECT content_hash, file_path,
+                   created_at < CURRENT_TIMESTAMP - make_interval(secs => %s) as settled
+            FROM attachment_blobs
+        """, (ORPHAN_GRACE_SECONDS,), use_cache=False)
+        legacy = execute_query("""
+            SELECT id, file_path,
+                   created_at < CURRENT_TIMESTAMP - make_interval(secs => %s) as settled
+            FROM file_attachments
+            WHERE content_hash IS NULL
+        """, (ORPHAN_GRACE_SECONDS,), use_cache=False)
+        if blobs is None or legacy is None:
+            raise RuntimeError("Could not read attachment rows")
+        report['scanned_blobs'] = len(blobs)
+        report['scanned_legacy_attachments'] = len(legacy)
+
+        files = scan_storage()
+        report['scanned_files'] = len(files)
+
+        def missing(row):
+            # Re-checked right before deleting, and never for recent rows
+            return row['settled'] and row['file_path'] not in files and not os.path.exists(row['file_path'])
+
+        # Rows pointing at files that no longer exist
+        missing_hashes = [b['content_hash'] for b in blobs if missing(b)]
+        missing_ids = [a['id'] for a in legacy if missing(a)]
+
+        for chunk in _chunks(missing_hashes, batch_size):
+            if batch_execute([
+                ("DELETE FROM file_attachments WHERE content_hash = ANY(%s)", (chunk,)),
+                ("DELETE FROM attachment_blobs WHERE content_hash = ANY(%s)", (chunk,)),
+            ]):
+                report['missing_blobs'] += len(chunk)
+            else:
+                report['errors'] += 1
+
+        for chunk in _chunks(missing_ids, batch_size):
+            if batch_execute([
+                ("DELETE FROM file_attachments WHERE id = ANY(%s)", (chunk,)),
+            ]):
+                report['missing_legacy_attachments'] += len(chunk)
+            else:
+                report['errors'] += 1
+
+        # Files on disk that no row references
+        referenced = {b['file_path'] for b in blobs} | {a['file_path'] for a in legacy}
+        cutoff = started - ORPHAN_GRACE_SECONDS
+        for path, (size, mtime) in files.items():
+            if path in referenced or mtime > cutoff:
+                continue
+            try:
+                os.remove(path)
+                report['orphan_files_removed'] += 1
+                report['bytes_reclaimed'] += size
+            except OSError as e:
+                logger.warning(f"Could not remove orphan file {path}: {str(e)}")
+                report['errors'] += 1
+
+        # Blobs released by the deletes above
+        collect_garbage()
+
+    except Exception as e:
+        logger.error(f"Attachment reconciliation failed: {str(e)}")
+        report['errors'] += 1
+
+    report['duration_seconds'] = round(time.time() - started, 3)
+    logger.info(f"Attachment reconciliation report: {report}")
+
+    global _last_report
+    _last_report = report
+    return report
+
+def get_last_report():
+    """Return the report of the most recent reconciliation run, if any"""
+    return _last_report
+
+def _run_forever(interval_seconds):
+    while True:
+        reconcile_attachments()
+        time.sleep(interval_seconds)
+
+def start_reconciler(interval_seconds=RECONCILE_INTERVAL_SECONDS):
+    """Start the background reconciliation thread once per process"""
+    global _reconciler_thread
+    with _reconciler_lock:
+        if _reconciler_thread and _reconciler_thread.is_alive():
+            return _reconciler_thread
+        _reconciler_thread = threading.Thread(
+            target=_run_forever,
+            args=(interval_seconds,),
+            name="attachment-reconciler",
+            daemon=True
+        )
+        _reconciler_thread.start()
+        logger.info(f"Attachment reconciler started (every {interval_seconds}s)")
+        return _reconciler_thread
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    reconcile_attachments()
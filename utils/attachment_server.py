@@ -0,0 +1,208 @@
+import os
+import re
+import hmac
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from urllib.parse import urlparse, parse_qs, quote
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database.connection import execute_query
+
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_SERVER_PORT = int(os.environ.get('ATTACHMENT_SERVER_PORT', 5001))
+ATTACHMENT_BASE_URL = os.environ.get('ATTACHMENT_BASE_URL', f"http://localhost:{ATTACHMENT_SERVER_PORT}")
+# Links are valid for one to two windows; keeping the URL stable within a
+# window lets browsers revalidate with If-None-Match instead of refetching
+LINK_WINDOW_SECONDS = 3600
+CHUNK_SIZE = 1024 * 1024
+
+_server = None
+# Set after a failed bind so later reruns don't retry and log again
+_server_failed = False
+_server_lock = threading.Lock()
+
+def _signature(attachment_id, expires):
+    secret = os.environ.get('JWT_SECRET', 'your-secret-key').encode('utf-8')
+    message = f"{attachment_id}:{expires}".encode('utf-8')
+    return hmac.new(secret, message, hashlib.sha256).hexdigest()
+
+def get_download_url(attachment_id):
+    """Return a signed download URL for an attachment"""
+    expires = (int(time.time()) // LINK_WINDOW_SECONDS + 2) * LINK_WINDOW_SECONDS
+    return (f"{ATTACHMENT_BASE_URL}/attachments/{attachment_id}"
+            f"?expires={expires}&signature={_signature(attachment_id, expires)}")
+
+def parse_range(header, file_size):
+    """Parse a single-range Range header.
+
+    Returns (start, end) inclusive, None to serve the full file, or
+    raises ValueError when the range cannot be satisfied.
+    """
+    match = re.fullmatch(r'bytes=(\d*)-(\d*)', header.strip())
+    if not match:
+        # Multiple or malformed ranges: serving the whole file is allowed
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        suffix = int(end)
+        if suffix == 0:
+            raise ValueError("Empty suffix range")
+        return max(file_size - suffix, 0), file_size - 1
+    start = int(start)
+    end = min(int(end), file_size - 1) if end else file_size - 1
+    if start >= file_size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+class AttachmentRequestHandler(BaseHTTPRequestHandler):
+    """Serve attachments with ETag revalidation and byte ranges"""
+
+    def log_message(self, format, *args):
+        logger.info(f"Attachment server: {format % args}")
+
+    def do_HEAD(self):
+        self._serve(send_body=False)
+
+    def do_GET(self):
+        self._serve(send_body=True)
+
+    def _load_attachment(self):
+        url = urlparse(self.path)
+        match = re.fullmatch(r'/attachments/(\d+)', url.path)
+        if not match:
+            return None
+        attachment_id = int(match.group(1))
+
+        query = parse_qs(url.query)
+        try:
+            expires = int(query.get('expires', ['0'])[0])
+        except ValueError:
+            return None
+        signature = query.get('signature', [''])[0]
+        if expires < time.time() or not hmac.compare_digest(signature, _signature(attachment_id, expires)):
+            return None
+
+        result = execute_query("""
+            SELECT id, filename, file_path, file_type, content_hash
+            FROM file_attachments
+            WHERE id = %s
+        """, (attachment_id,), use_cache=False)
+        return result[0] if result else None
+
+    def _serve(self, send_body):
+        attachment = self._load_attachment()
+        if not attachment:
+            self.send_error(404, "Attachment not found")
+            return
+
+        try:
+            f = open(attachment['file_path'], 'rb')
+        except FileNotFoundError:
+            self.send_error(404, "Attachment file missing")
+            return
+
+        with f:
+            stat = os.fstat(f.fileno())
+            file_size = stat.st_size
+            if attachment['content_hash']:
+                etag = f'"{attachment["content_hash"].strip()}"'
+                cache_control = "private, max-age=31536000, immutable"
+            else:
+                etag = f'"{attachment["id"]}-{file_size}-{int(stat.st_mtime)}"'
+                cache_control = "private, no-cache"
+
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match and (if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]):
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Cache-Control', cache_control)
+                self.end_headers()
+                return
+
+            byte_range = None
+            range_header = self.headers.get('Range')
+            if_range = self.headers.get('If-Range')
+            if range_header and (not if_range or if_range.strip() == etag):
+                try:
+                    byte_range = parse_range(range_header, file_size)
+                except ValueError:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{file_size}")
+                    self.end_headers()
+                    return
+
+            start, end = byte_range if byte_range else (0, file_size - 1)
+            length = end - start + 1 if file_size else 0
+
+            self.send_response(206 if byte_range else 200)
+            if byte_range:
+                self.send_header('Content-Range', f"bytes {start}-{end}/{file_size}")
+            self.send_header('Content-Type', attachment['file_type'] or 'application/octet-stream')
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', cache_control)
+            self.send_header('Content-Disposition', f"inline; filename*=UTF-8''{quote(attachment['filename'])}")
+            self.end_headers()
+
+            if send_body and length:
+                try:
+                    self._send_file(f, start, length)
+                except (BrokenPipeError, ConnectionResetError):
+                    logger.info("Client closed attachment download early")
+
+    def _send_file(self, f, offset, length):
+        """Copy file bytes to the socket without buffering them in Python"""
+        try:
+            out_fd = self.connection.fileno()
+            while length > 0:
+                sent = os.sendfile(out_fd, f.fileno(), offset, min(length, CHUNK_SIZE))
+                if sent == 0:
+                    break
+                offset += sent
+                length -= sent
+        except (AttributeError, OSError) as e:
+            if isinstance(e, (BrokenPipeError, ConnectionResetError)):
+                raise
+            # sendfile unavailable: stream from a memory map instead
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    while length > 0:
+                        chunk = min(length, CHUNK_SIZE)
+                        self.wfile.write(view[offset:offset + chunk])
+                        offset += chunk
+                        length -= chunk
+                finally:
+                    view.release()
+
+def start_attachment_server(port=ATTACHMENT_SERVER_PORT):
+    """Start the attachment download server once per process"""
+    global _server, _server_failed
+    with _server_lock:
+        if _server or _server_failed:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(('0.0.0.0', port), AttachmentRequestHandler)
+        except OSError as e:
+            logger.error(f"Could not start attachment server on port {port}: {str(e)}")
+            _server_failed = True
+            return None
+        _server.daemon_threads = True
+        threading.Thread(
+            target=_server.serve_forever,
+            name="attachment-server",
+            daemon=True
+        ).start()
+        logger.info(f"Attachment server listening on port {port}")
+        return _server
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_attachment_server()
+    threading.Event().wait()
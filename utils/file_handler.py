@@ -1,79 +1,143 @@
 import os
-import uuid
+import hashlib
 import streamlit as st
-from database.connection import execute_query
+from database.connection import execute_query, transaction
 import logging
 import mimetypes
+from utils.async_storage import run_sync, save_file, delete_file, delete_files
+from utils.thumbnails import is_thumbnailable, schedule_thumbnails, remove_thumbnails
+from utils.metrics import ATTACHMENT_BYTES_WRITTEN, ATTACHMENT_BYTES_DEDUPLICATED
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_DIR = "uploads"
+OBJECTS_DIR = os.path.join(UPLOAD_DIR, "objects")
+
+def get_content_path(content_hash):
+    """Return the sharded storage path for a SHA-256 content hash."""
+    return os.path.join(OBJECTS_DIR, content_hash[:2], content_hash[2:4], content_hash)
+
 def save_uploaded_file(uploaded_file, task_id):
     """Save an uploaded file and create a database record."""
     try:
         if uploaded_file is None:
             return None
             
-        # Create uploads directory if it doesn't exist
-        upload_dir = "uploads"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        # Generate unique filename while preserving extension
-        file_extension = os.path.splitext(uploaded_file.name)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
+        # Address the file by its content so identical uploads share one blob
+        data = uploaded_file.getbuffer()
+        content_hash = hashlib.sha256(data).hexdigest()
+        file_path = get_content_path(content_hash)
         
         # Get MIME type
         file_type = uploaded_file.type
         if not file_type:
             file_type = mimetypes.guess_type(uploaded_file.name)[0]
         
-        # Save file to disk
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-            
-        # Create database record
+        # Register the blob and create the attachment in one statement before
+        # touching storage; the ref_count trigger counts the new reference, so
+        # garbage collection can no longer release the blob. A collection
+        # already deleting it holds the row until its files are gone, and
+        # this insert waits for it.
         result = execute_query(
             """
+            WITH blob AS (
+                INSERT INTO attachment_blobs (content_hash, file_path, file_size)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (content_hash) DO UPDATE SET file_path = EXCLUDED.file_path
+                RETURNING content_hash, file_path
+            )
             INSERT INTO file_attachments 
-                (task_id, filename, file_path, file_type, file_size) 
-            VALUES (%s, %s, %s, %s, %s) 
+                (task_id, filename, file_path, file_type, file_size, content_hash) 
+            SELECT %s, %s, blob.file_path, %s, %s, blob.content_hash
+            FROM blob
             RETURNING id
             """,
-            (task_id, uploaded_file.name, file_path, file_type, uploaded_file.size)
+            (content_hash, file_path, uploaded_file.size,
+             task_id, uploaded_file.name, file_type, uploaded_file.size)
         )
         
-        if result:
-            logger.info(f"File saved successfully: {file_path}")
-            return result[0]['id']
-        return None
+        if not result:
+            return None
+        
+        # Save blob to disk off the request thread (no-op when already stored)
+        try:
+            if run_sync(save_file(file_path, data)):
+                ATTACHMENT_BYTES_WRITTEN.inc(len(data))
+                logger.info(f"Stored new blob: {file_path}")
+            else:
+                # Refresh the mtime so the reconciler's orphan grace period covers it
+                os.utime(file_path)
+                ATTACHMENT_BYTES_DEDUPLICATED.inc(len(data))
+        except Exception:
+            delete_attachment(result[0]['id'])
+            raise
+        
+        logger.info(f"File saved successfully: {file_path}")
+        if is_thumbnailable(file_type):
+            schedule_thumbnails(content_hash, file_path)
+        return result[0]['id']
         
     except Exception as e:
         logger.error(f"Error saving file: {str(e)}")
-        # Cleanup on failure
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
         return None
 
+def collect_garbage():
+    """Remove blobs whose last attachment reference has been deleted."""
+    try:
+        # Files are deleted before the rows are committed, so an upload of
+        # the same content blocks on the row and then writes a fresh file
+        with transaction() as cur:
+            cur.execute("""
+                DELETE FROM attachment_blobs
+                WHERE ref_count <= 0
+                RETURNING content_hash, file_path
+            """)
+            released = cur.fetchall()
+            removed = run_sync(delete_files([blob['file_path'] for blob in released])) if released else 0
+        for blob in released:
+            remove_thumbnails(blob['content_hash'])
+        
+        if removed:
+            logger.info(f"Garbage collected {removed} unreferenced blobs")
+        return removed
+    except Exception as e:
+        logger.error(f"Error collecting attachment garbage: {str(e)}")
+        return 0
+
+def delete_attachment(attachment_id):
+    """Delete an attachment and release its blob if no longer referenced."""
+    try:
+        result = execute_query(
+            "DELETE FROM file_attachments WHERE id = %s RETURNING id, file_path, content_hash",
+            (attachment_id,)
+        )
+        if not result:
+            return False
+        
+        # Attachments stored before content addressing own their file outright
+        if result[0]['content_hash'] is None:
+            run_sync(delete_file(result[0]['file_path']))
+        
+        collect_garbage()
+        return True
+    except Exception as e:
+        logger.error(f"Error deleting attachment: {str(e)}")
+        return False
+
 def get_task_attachments(task_id):
-    """Get all attachments for a task."""
+    """Get all attachments for a task.
+
+    File existence is reconciled in bulk by utils.attachment_reconciler,
+    so listing is a single indexed read with no filesystem calls.
+    """
     try:
         attachments = execute_query("""
-            SELECT id, filename, file_path, file_type, file_size, created_at
+            SELECT id, filename, file_path, file_type, file_size, content_hash, created_at
             FROM file_attachments
             WHERE task_id = %s
             ORDER BY created_at DESC
         """, (task_id,))
-        
-        # Verify file existence and update list accordingly
-        valid_attachments = []
-        for attachment in attachments:
-            if os.path.exists(attachment['file_path']):
-                valid_attachments.append(attachment)
-            else:
-                logger.warning(f"File not found: {attachment['file_path']}")
-                execute_query("DELETE FROM file_attachments WHERE id = %s", (attachment['id'],))
-        
-        return valid_attachments
+        return attachments if attachments else []
     except Exception as e:
         logger.error(f"Error fetching attachments: {str(e)}")
         return []
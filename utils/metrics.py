@@ -0,0 +1,257 @@
+import os
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database.connection import register_query_listener, fingerprint_query
+
+logger = logging.getLogger(__name__)
+
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9464))
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Session caches not updated for this long are no longer counted in the size gauge
+CACHE_SIZE_STALE_SECONDS = 1800
+
+_registry = []
+_registry_lock = threading.Lock()
+_server = None
+# A failed bind (port taken, e.g. by another worker) is not retried
+_server_failed = False
+_server_lock = threading.Lock()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base for metrics keyed by label values; callback metrics are read at scrape time"""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._values = {}
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def samples(self):
+        """[(suffix, label values, extra labels, value)] for the text format"""
+        if self.callback:
+            try:
+                value = self.callback()
+            except Exception as e:
+                logger.warning(f"Metric callback for {self.name} failed: {str(e)}")
+                return []
+            if isinstance(value, dict):
+                return [('', key if isinstance(key, tuple) else (key,), (), v) for key, v in value.items()]
+            return [('', (), (), value)]
+        with self._lock:
+            return [('', key, (), value) for key, value in self._values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labelnames, key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry['counts'][i] += 1
+                    break
+            entry['sum'] += value
+            entry['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            values = {key: {'counts': list(e['counts']), 'sum': e['sum'], 'count': e['count']}
+                      for key, e in self._values.items()}
+        samples = []
+        for key, entry in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry['counts']):
+                cumulative += count
+                samples.append(('_bucket', key, (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_sum', key, (), entry['sum']))
+            samples.append(('_count', key, (), entry['count']))
+        return samples
+
+def render_metrics():
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Database
+QUERY_DURATION = Histogram(
+    'app_db_query_duration_seconds', "Statement execution time by fingerprint", ('fingerprint', 'operation'))
+QUERY_ERRORS = Counter(
+    'app_db_query_errors_total', "Statements that failed, by fingerprint", ('fingerprint', 'operation'))
+STATEMENTS = Gauge(
+    'app_db_statement_info', "Normalized statement text for each fingerprint", ('fingerprint', 'statement'))
+CONNECTIONS_OPENED = Counter('app_db_connections_opened_total', "Database connections opened")
+CONNECTIONS_OPEN = Gauge('app_db_connections_open', "Database connections currently open")
+
+# Query cache
+CACHE_REQUESTS = Counter('app_query_cache_requests_total', "query_cache lookups by result", ('result',))
+_cache_sizes = {}
+_cache_sizes_lock = threading.Lock()
+
+def _cache_entries():
+    cutoff = time.time() - CACHE_SIZE_STALE_SECONDS
+    with _cache_sizes_lock:
+        for cache_id in [k for k, (_, updated) in _cache_sizes.items() if updated < cutoff]:
+            del _cache_sizes[cache_id]
+        return sum(entries for entries, _ in _cache_sizes.values())
+
+CACHE_ENTRIES = Gauge(
+    'app_query_cache_entries', "Entries across recently active session query caches", callback=_cache_entries)
+
+# Reruns and storage
+RERUN_DURATION = Histogram('app_rerun_duration_seconds', "Script rerun duration by view", ('view',))
+ATTACHMENT_BYTES_WRITTEN = Counter('app_attachment_bytes_written_total', "Attachment bytes written to storage")
+ATTACHMENT_BYTES_DEDUPLICATED = Counter(
+    'app_attachment_bytes_deduplicated_total', "Uploaded attachment bytes already in storage")
+
+def _hasher_stats(field):
+    def read():
+        from auth.password_hasher import get_hasher_stats
+        return get_hasher_stats()[field]
+    return read
+
+BCRYPT_QUEUE_DEPTH = Gauge('app_bcrypt_queue_depth', "Password hashing jobs waiting for a worker",
+                           callback=_hasher_stats('queued'))
+BCRYPT_RUNNING = Gauge('app_bcrypt_running', "Password hashing jobs running", callback=_hasher_stats('running'))
+BCRYPT_REJECTED = Counter('app_bcrypt_rejected_total', "Password hashing jobs rejected with a full queue",
+                          callback=_hasher_stats('rejected'))
+
+def _operation(normalized):
+    return normalized.split(' ', 1)[0].upper() if normalized else ''
+
+def _on_query_event(event, details):
+    if event == 'query':
+        fingerprint, normalized = fingerprint_query(details['query'])
+        operation = _operation(normalized)
+        QUERY_DURATION.observe(details['duration'], fingerprint=fingerprint, operation=operation)
+        STATEMENTS.set(1, fingerprint=fingerprint, statement=normalized[:200])
+        if details.get('rows') is None:
+            QUERY_ERRORS.inc(fingerprint=fingerprint, operation=operation)
+    elif event == 'connect':
+        CONNECTIONS_OPENED.inc()
+        CONNECTIONS_OPEN.inc()
+    elif event == 'close':
+        CONNECTIONS_OPEN.dec()
+    elif event == 'cache_hit':
+        CACHE_REQUESTS.inc(result='revalidate' if details.get('revalidating') else 'hit')
+    elif event == 'cache_miss':
+        CACHE_REQUESTS.inc(result='miss')
+    elif event == 'cache_revalidated':
+        CACHE_REQUESTS.inc(result='not_modified')
+    elif event == 'cache_coalesced':
+        CACHE_REQUESTS.inc(result='coalesced')
+    elif event == 'cache_stale':
+        CACHE_REQUESTS.inc(result='stale')
+    elif event == 'cache_store':
+        with _cache_sizes_lock:
+            _cache_sizes[details['cache_id']] = (details['entries'], time.time())
+
+register_query_listener(_on_query_event)
+
+def observe_rerun(view, seconds):
+    """Record how long a script rerun took for a view"""
+    RERUN_DURATION.observe(seconds, view=view)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} - {format % args}")
+
+def start_metrics_server(port=METRICS_PORT):
+    """Serve /metrics once per process"""
+    global _server, _server_failed
+    with _server_lock:
+        if _server or _server_failed:
+            return _server
+        try:
+            _server = ThreadingHTTPServer(('0.0.0.0', port), MetricsRequestHandler)
+        except OSError as e:
+            logger.error(f"Could not start metrics server on port {port}: {str(e)}")
+            _server_failed = True
+            return None
+        _server.daemon_threads = True
+        threading.Thread(
+            target=_server.serve_forever,
+            name="metrics-server",
+            daemon=True
+        ).start()
+        logger.info(f"Metrics server listening on port {port}")
+        return _server
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    start_metrics_server()
+    threading.Event().wait()
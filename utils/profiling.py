@@ -0,0 +1,216 @@
+import streamlit as st
+from database.connection import register_query_listener
+from utils.tracing import is_tracing_enabled, start_span
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+# Enable for every session, or per session with ?profile=1
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() in ('1', 'true', 'yes')
+MAX_STATEMENT_CHARS = 160
+
+_current_profile = ContextVar('current_profile', default=None)
+
+class RerunProfile:
+    """Component timings, SQL statements and bytes sent during one rerun"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.components = []
+        self.statements = []
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        self.depth = 0
+        self._pending_miss = False
+
+    def on_query_event(self, event, details):
+        if event == 'cache_hit':
+            args = details.get('args') or ()
+            self.statements.append({
+                'statement': args[0] if args and isinstance(args[0], str) else details.get('key'),
+                'duration': 0.0,
+                'rows': None,
+                'cache': 'stale' if details.get('revalidating') else 'hit',
+            })
+        elif event == 'cache_miss':
+            self._pending_miss = True
+        elif event == 'cache_coalesced':
+            # Another caller ran the statement; this one only waited for it
+            args = details.get('args') or ()
+            self.statements.append({
+                'statement': args[0] if args and isinstance(args[0], str) else details.get('key'),
+                'duration': 0.0,
+                'rows': None,
+                'cache': 'shared',
+            })
+            self._pending_miss = False
+        elif event == 'query':
+            self.statements.append({
+                'statement': details['query'],
+                'duration': details['duration'],
+                'rows': details.get('rows'),
+                'cache': 'miss' if self._pending_miss else 'none',
+            })
+            self._pending_miss = False
+
+def _dispatch(event, details):
+    profile = _current_profile.get()
+    if profile is not None:
+        profile.on_query_event(event, details)
+
+register_query_listener(_dispatch)
+
+def get_current_profile():
+    """The profile of the running rerun, or None when profiling is off"""
+    return _current_profile.get()
+
+def is_profiling_requested():
+    """Profiling is on via PROFILING_ENABLED or the ?profile=1 query parameter"""
+    if PROFILING_ENABLED:
+        return True
+    try:
+        return st.query_params.get('profile') in ('1', 'true')
+    except Exception:
+        return False
+
+def _count_sent_bytes():
+    """Wrap the script run context's enqueue to count bytes sent to the browser"""
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+    except Exception:
+        ctx = None
+    if ctx is None or getattr(ctx, '_profiling_wrapped', False):
+        return
+
+    attribute = '_enqueue' if hasattr(ctx, '_enqueue') else 'enqueue'
+    original = getattr(ctx, attribute)
+
+    def enqueue(msg):
+        profile = _current_profile.get()
+        if profile is not None:
+            try:
+                profile.bytes_sent += msg.ByteSize()
+                profile.messages_sent += 1
+            except Exception:
+                pass
+        return original(msg)
+
+    setattr(ctx, attribute, enqueue)
+    ctx._profiling_wrapped = True
+
+def start_profile():
+    """Begin profiling this rerun when requested; returns the profile or None"""
+    if not is_profiling_requested():
+        _current_profile.set(None)
+        return None
+    profile = RerunProfile()
+    _current_profile.set(profile)
+    _count_sent_bytes()
+    return profile
+
+@contextmanager
+def profile_component(name):
+    """Time a block as a component of the current rerun"""
+    profile = _current_profile.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    profile.depth += 1
+    try:
+        yield
+    finally:
+        profile.depth -= 1
+        profile.components.append({
+            'name': name,
+            'duration': time.perf_counter() - started,
+            'depth': profile.depth,
+        })
+
+def profiled(name=None, attributes=None):
+    """Decorator timing a render function as a component of the current rerun.
+
+    When tracing is on the call also gets its own span; attributes(*args,
+    **kwargs) may return span attributes such as the project id.
+    """
+    def decorator(func):
+        component = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            tracing = is_tracing_enabled()
+            if _current_profile.get() is None and not tracing:
+                return func(*args, **kwargs)
+            span_attributes = {}
+            if tracing and attributes:
+                try:
+                    span_attributes = attributes(*args, **kwargs)
+                except Exception as e:
+                    logger.warning(f"Span attributes for {component} failed: {str(e)}")
+            with start_span(component, **span_attributes), profile_component(component):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def _summarize_components(components):
+    """Aggregate repeated components (e.g. one per task card) by name"""
+    summary = {}
+    for component in components:
+        entry = summary.setdefault(component['name'], {'calls': 0, 'total': 0.0, 'max': 0.0, 'depth': component['depth']})
+        entry['calls'] += 1
+        entry['total'] += component['duration']
+        entry['max'] = max(entry['max'], component['duration'])
+        entry['depth'] = min(entry['depth'], component['depth'])
+    return sorted(summary.items(), key=lambda item: item[1]['total'], reverse=True)
+
+def _escape_cell(text):
+    return str(text).replace('|', '\\|').replace('\n', ' ')
+
+def render_profile_panel():
+    """Render the profiling overlay for the current rerun, if profiling is on"""
+    profile = _current_profile.get()
+    if profile is None:
+        return
+
+    # Read totals before the panel itself adds to them
+    elapsed = time.perf_counter() - profile.started
+    bytes_sent = profile.bytes_sent
+    statements = list(profile.statements)
+    components = _summarize_components(profile.components)
+    sql_time = sum(s['duration'] for s in statements)
+    hits = sum(1 for s in statements if s['cache'] == 'hit')
+
+    with st.sidebar.expander("⏱️ Rerun profile", expanded=True):
+        st.markdown(
+            f"**Rerun:** {elapsed * 1000:.1f} ms · **SQL:** {len(statements)} statements, "
+            f"{sql_time * 1000:.1f} ms, {hits} cache hits · **Sent:** {bytes_sent / 1024:.1f} KiB "
+            f"in {profile.messages_sent} messages"
+        )
+
+        if components:
+            rows = ["| Component | Calls | Total ms | Max ms |", "|---|---:|---:|---:|"]
+            for component, entry in components:
+                indent = "&nbsp;&nbsp;" * entry['depth']
+                rows.append(
+                    f"| {indent}{_escape_cell(component)} | {entry['calls']} | "
+                    f"{entry['total'] * 1000:.1f} | {entry['max'] * 1000:.1f} |"
+                )
+            st.markdown("\n".join(rows), unsafe_allow_html=True)
+
+        if statements:
+            rows = ["| # | Statement | ms | Rows | Cache |", "|---:|---|---:|---:|---|"]
+            for i, statement in enumerate(statements, 1):
+                text = " ".join(str(statement['statement']).split())
+                if len(text) > MAX_STATEMENT_CHARS:
+                    text = text[:MAX_STATEMENT_CHARS] + "…"
+                rows.append(
+                    f"| {i} | `{_escape_cell(text)}` | {statement['duration'] * 1000:.1f} | "
+                    f"{'' if statement['rows'] is None else statement['rows']} | {statement['cache']} |"
+                )
+            st.markdown("\n".join(rows))
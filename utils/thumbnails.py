@@ -0,0 +1,139 @@
+import os
+import glob
+import uuid
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_DIR = os.path.join("uploads", "thumbnails")
+THUMBNAIL_SIZES = {
+    'card': (240, 240),
+    'detail': (800, 800),
+}
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+# Cap on queued + running jobs so upload bursts cannot pile up unbounded work
+MAX_PENDING_THUMBNAILS = THUMBNAIL_WORKERS * 4
+THUMBNAIL_TYPES = ('image/png', 'image/jpeg', 'image/jpg')
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(MAX_PENDING_THUMBNAILS)
+# Jobs by target path, so reruns wait on a running job instead of adding another
+_in_progress = {}
+_in_progress_lock = threading.Lock()
+
+def is_thumbnailable(file_type):
+    """Return True for attachment types that get thumbnails"""
+    return bool(file_type) and file_type.lower() in THUMBNAIL_TYPES
+
+def get_thumbnail_path(content_hash, size='card'):
+    """Return the cache path for a thumbnail, keyed by content hash and size"""
+    width, height = THUMBNAIL_SIZES[size]
+    return os.path.join(THUMBNAIL_DIR, content_hash[:2], f"{content_hash}_{width}x{height}.png")
+
+def render_thumbnail(source_path, target_path, max_size):
+    """Render a thumbnail with Pillow. Runs inside the process pool."""
+    from PIL import Image, ImageOps
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    tmp_path = f"{target_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with Image.open(source_path) as image:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail(max_size)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA')
+            image.save(tmp_path, format='PNG', optimize=True)
+        os.replace(tmp_path, target_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return target_path
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Spawned workers avoid forking the multi-threaded Streamlit server
+            _executor = ProcessPoolExecutor(
+                max_workers=THUMBNAIL_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return _executor
+
+def _job_done(target_path):
+    def done(future):
+        with _in_progress_lock:
+            _in_progress.pop(target_path, None)
+        _pending.release()
+    return done
+
+def _submit(content_hash, source_path, size):
+    """Submit a thumbnail job, or return None when the pool is saturated"""
+    target_path = get_thumbnail_path(content_hash, size)
+    with _in_progress_lock:
+        future = _in_progress.get(target_path)
+        if future is not None:
+            return future
+        if not _pending.acquire(blocking=False):
+            logger.warning(f"Thumbnail pool saturated, deferring {content_hash}")
+            return None
+        try:
+            future = _get_executor().submit(
+                render_thumbnail,
+                source_path,
+                target_path,
+                THUMBNAIL_SIZES[size]
+            )
+        except Exception:
+            _pending.release()
+            raise
+        _in_progress[target_path] = future
+    future.add_done_callback(_job_done(target_path))
+    return future
+
+def schedule_thumbnails(content_hash, source_path):
+    """Pre-generate all thumbnail sizes at upload time without waiting"""
+    try:
+        for size in THUMBNAIL_SIZES:
+            if not os.path.exists(get_thumbnail_path(content_hash, size)):
+                _submit(content_hash, source_path, size)
+    except Exception as e:
+        logger.error(f"Error scheduling thumbnails: {str(e)}")
+
+def get_thumbnail(attachment, size='card', timeout=10, wait=True):
+    """Return a cached thumbnail path for an attachment, generating it lazily.
+
+    Returns None when the attachment is not an image or generation fails,
+    so callers never fall back to sending the original. With wait=False a
+    missing thumbnail is only scheduled and None is returned right away.
+    """
+    try:
+        if not attachment.get('content_hash') or not is_thumbnailable(attachment.get('file_type')):
+            return None
+
+        thumbnail_path = get_thumbnail_path(attachment['content_hash'], size)
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+
+        future = _submit(attachment['content_hash'], attachment['file_path'], size)
+        if future is None or not wait:
+            return None
+        return future.result(timeout=timeout)
+    except TimeoutError:
+        logger.warning(f"Thumbnail generation timed out for {attachment.get('content_hash')}")
+        return None
+    except Exception as e:
+        logger.error(f"Error generating thumbnail: {str(e)}")
+        return None
+
+def remove_thumbnails(content_hash):
+    """Delete every cached thumbnail of a blob"""
+    for path in glob.glob(os.path.join(THUMBNAIL_DIR, content_hash[:2], f"{content_hash}_*.png")):
+        try:
+            os.remove(path)
+        except OSError as e:
+            logger.warning(f"Could not remove thumbnail {path}: {str(e)}")
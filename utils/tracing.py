@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import queue
+import logging
+import secrets
+import threading
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from database.connection import register_query_listener, fingerprint_query
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.environ.get('TRACING_ENABLED', '').lower() in ('1', 'true', 'yes')
+# Finished spans are appended here as one OTLP-style JSON object per line
+TRACE_FILE = os.environ.get('TRACE_FILE', 'traces.jsonl')
+# Optional OTLP/HTTP JSON collector, e.g. http://localhost:4318/v1/traces
+OTLP_ENDPOINT = os.environ.get('TRACING_OTLP_ENDPOINT')
+SERVICE_NAME = os.environ.get('TRACING_SERVICE_NAME', 'project-management-tool')
+EXPORT_BATCH_SIZE = 512
+EXPORT_INTERVAL_SECONDS = 1.0
+MAX_QUEUED_SPANS = 10000
+
+_current_span = ContextVar('current_span', default=None)
+_pending_cache = ContextVar('pending_cache', default=None)
+_batch_spans = ContextVar('batch_spans', default=None)
+_queue = queue.Queue(maxsize=MAX_QUEUED_SPANS)
+_exporter = None
+_exporter_lock = threading.Lock()
+
+class Span:
+    """One timed operation; children share the trace id and point at their parent"""
+
+    def __init__(self, name, parent=None, attributes=None, start_ns=None):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def end(self, end_ns=None, error=None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        if error:
+            self.error = str(error)
+        _export(self)
+
+    def to_otlp(self):
+        """OTLP JSON span representation"""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [_otlp_attribute(k, v) for k, v in self.attributes.items() if v is not None],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+def _otlp_attribute(key, value):
+    if isinstance(value, bool):
+        typed = {'boolValue': value}
+    elif isinstance(value, int):
+        typed = {'intValue': str(value)}
+    elif isinstance(value, float):
+        typed = {'doubleValue': value}
+    else:
+        typed = {'stringValue': str(value)}
+    return {'key': key, 'value': typed}
+
+def _export(span):
+    _start_exporter()
+    try:
+        _queue.put_nowait(span.to_otlp())
+    except queue.Full:
+        # Never block a rerun on tracing
+        pass
+
+def _write_batch(spans):
+    if TRACE_FILE:
+        try:
+            with open(TRACE_FILE, 'a') as f:
+                for span in spans:
+                    f.write(json.dumps(span) + "\n")
+        except OSError as e:
+            logger.warning(f"Could not write spans to {TRACE_FILE}: {str(e)}")
+    if OTLP_ENDPOINT:
+        body = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': [_otlp_attribute('service.name', SERVICE_NAME)]},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': spans}],
+        }]}).encode('utf-8')
+        request = urllib.request.Request(
+            OTLP_ENDPOINT, data=body, headers={'Content-Type': 'application/json'}, method='POST'
+        )
+        try:
+            urllib.request.urlopen(request, timeout=5).close()
+        except Exception as e:
+            logger.warning(f"Could not export spans to {OTLP_ENDPOINT}: {str(e)}")
+
+def _export_loop():
+    while True:
+        spans = [_queue.get()]
+        deadline = time.time() + EXPORT_INTERVAL_SECONDS
+        while len(spans) < EXPORT_BATCH_SIZE:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                spans.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_batch(spans)
+
+def _start_exporter():
+    global _exporter
+    if _exporter:
+        return
+    with _exporter_lock:
+        if not _exporter:
+            _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+            _exporter.start()
+
+def is_tracing_enabled():
+    return TRACING_ENABLED
+
+def get_current_span():
+    return _current_span.get()
+
+def begin_span(name, **attributes):
+    """Start a span as a child of the current one and make it current; returns (span, token)"""
+    span = Span(name, parent=_current_span.get(), attributes=attributes)
+    return span, _current_span.set(span)
+
+def finish_span(span, token, error=None):
+    """End a span from begin_span and restore the previous current span"""
+    span.end(error=error)
+    _current_span.reset(token)
+
+@contextmanager
+def start_span(name, **attributes):
+    """Trace a block; yields the span, or None when tracing is off"""
+    if not TRACING_ENABLED:
+        yield None
+        return
+    span, token = begin_span(name, **attributes)
+    try:
+        yield span
+    except Exception as e:
+        finish_span(span, token, error=e)
+        raise
+    finish_span(span, token)
+
+def start_rerun_span(session_state, **attributes):
+    """Open the root span of a rerun.
+
+    Reruns cut short by st.rerun() or st.stop() never reach end_rerun_span,
+    so an unfinished span left in the session is closed here first.
+    """
+    if not TRACING_ENABLED:
+        return None
+    previous = session_state.get('_rerun_span')
+    if previous:
+        previous.set_attribute('rerun.interrupted', True)
+        previous.end()
+    # Each rerun is its own trace
+    _current_span.set(None)
+    span, _ = begin_span('rerun', **attributes)
+    session_state['_rerun_span'] = span
+    return span
+
+def end_rerun_span(session_state, **attributes):
+    """Close the rerun span opened by start_rerun_span"""
+    span = session_state.pop('_rerun_span', None)
+    if span:
+        for key, value in attributes.items():
+            span.set_attribute(key, value)
+        span.end()
+    _current_span.set(None)
+
+def _on_query_event(event, details):
+    if event == 'cache_miss':
+        _pending_cache.set('miss')
+    elif event == 'cache_coalesced':
+        _pending_cache.set(None)
+    elif event == 'cache_hit':
+        args = details.get('args') or ()
+        cache = 'stale' if details.get('revalidating') else 'hit'
+        span = Span('db.cache_hit', parent=_current_span.get(), attributes={'db.cache': cache})
+        if args and isinstance(args[0], str):
+            fingerprint, normalized = fingerprint_query(args[0])
+            span.set_attribute('db.fingerprint', fingerprint)
+            span.set_attribute('db.statement', normalized)
+        span.end()
+    elif event == 'batch_start':
+        spans = list(_batch_spans.get() or [])
+        spans.append(begin_span('db.batch_execute', **{'db.statements': details.get('statements')}))
+        _batch_spans.set(spans)
+    elif event == 'batch_end':
+        spans = list(_batch_spans.get() or [])
+        if spans:
+            span, token = spans.pop()
+            _batch_spans.set(spans)
+            finish_span(span, token, error=None if details.get('ok') else 'batch failed')
+    elif event == 'query':
+        # Reported after the statement ran, so the span is placed retroactively
+        fingerprint, normalized = fingerprint_query(details['query'])
+        end_ns = time.time_ns()
+        span = Span('db.query', parent=_current_span.get(), start_ns=end_ns - int(details['duration'] * 1e9),
+                    attributes={
+                        'db.fingerprint': fingerprint,
+                        'db.statement': normalized,
+                        'db.rows': details.get('rows'),
+                        'db.cache': _pending_cache.get() or 'none',
+                    })
+        _pending_cache.set(None)
+        span.end(end_ns, error='statement failed' if details.get('rows') is None else None)
+
+if TRACING_ENABLED:
+    register_query_listener(_on_query_event)